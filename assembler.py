@@ -0,0 +1,385 @@
+"""Ассемблер и дизассемблер без графического интерфейса
+
+Исходный текст разбивается на лексемы один раз, после чего метки
+собираются и команды кодируются по таблицам. Результат ассемблирования
+кэшируется по хэшу исходного текста, поэтому повторная загрузка
+неизмененной программы ничего не стоит.
+
+Операнды, не помещающиеся в 10 бит (адреса больших памятей, длинные
+константы), кодируются автоматически с префиксами EXT.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+from cpu import NUM_REGISTERS, OP_EXT, OPERAND_BITS
+
+# Имена регистров общего назначения
+REGISTER_NAMES = [f"R{i}" for i in range(1, NUM_REGISTERS + 1)]
+REGISTER_NUMBERS = {name: i for i, name in enumerate(REGISTER_NAMES, 1)}
+
+# Таблица опкодов
+OPCODES = {
+    "NOP": 0x0,
+    "HALT": 0xF,
+    "LOAD": 0x1,
+    "STORE": 0x2,
+    "ADD": 0x3,
+    "SUB": 0x4,
+    "MUL": 0x5,
+    "CMP": 0x6,
+    "JMP": 0x7,
+    "JZ": 0x8,
+    "JN": 0x9,
+    "INC": 0xA,
+    "DEC": 0xB
+}
+
+# Таблица мнемоник
+MNEMONICS = {code: name for name, code in OPCODES.items()}
+
+# Команды без операнда и команды переходов
+NO_OPERAND = {"NOP", "HALT"}
+JUMPS = {"JMP", "JZ", "JN"}
+
+# Типы адресации
+IMMEDIATE, DIRECT, REGISTER, INDIRECT = 0b00, 0b01, 0b10, 0b11
+
+# Наибольшее число префиксов EXT перед командой
+MAX_EXT = 2
+
+# Размер кэша результатов ассемблирования (число программ)
+CACHE_SIZE = 128
+
+
+class AssemblyError(ValueError):
+    """Ошибка ассемблирования программы"""
+
+
+class AssemblyResult:
+    """Результат ассемблирования
+
+    machine_code - кортеж слов команд, symbols - таблица меток
+    (имя -> адрес), errors - список пар (номер строки, сообщение),
+    line_map - номер исходной строки для каждого адреса команды.
+    """
+
+    __slots__ = ("machine_code", "symbols", "errors", "line_map")
+
+    def __init__(self, machine_code, symbols, errors, line_map):
+        self.machine_code = machine_code
+        self.symbols = symbols
+        self.errors = errors
+        self.line_map = line_map
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def format_errors(self, limit=None):
+        """Текст ошибок вида 'Строка N: сообщение'"""
+        errors = self.errors if limit is None else self.errors[:limit]
+        lines = [f"Строка {line}: {message}" for line, message in errors]
+        if limit is not None and len(self.errors) > limit:
+            lines.append(f"... и еще {len(self.errors) - limit}")
+        return "\n".join(lines)
+
+
+def parse_operand(operand_str):
+    """Парсинг операнда и определение типа адресации
+
+    Возвращает (значение, тип адресации); для меток значение - строка.
+    """
+    if not operand_str:
+        return 0, IMMEDIATE  # Нет операнда
+
+    operand_str = operand_str.strip()
+    first = operand_str[0]
+
+    # Непосредственная адресация (#число)
+    if first == '#':
+        try:
+            return int(operand_str[1:]), IMMEDIATE
+        except ValueError:
+            return operand_str, IMMEDIATE
+
+    # Косвенно-регистровая адресация ([Rx])
+    if first == '[' and operand_str.endswith(']'):
+        reg_num = REGISTER_NUMBERS.get(operand_str[1:-1].strip())
+        if reg_num is not None:
+            return reg_num, INDIRECT
+        return operand_str, INDIRECT
+
+    # Регистровая адресация (Rx)
+    reg_num = REGISTER_NUMBERS.get(operand_str)
+    if reg_num is not None:
+        return reg_num, REGISTER
+
+    # Прямая адресация (число) или метка
+    try:
+        return int(operand_str), DIRECT
+    except ValueError:
+        return operand_str, DIRECT
+
+
+def encode_instruction(opcode, operand_value, addr_type):
+    """Кодирование инструкции в 16-битное слово"""
+    # Формат: [15:12] - opcode, [11:10] - тип адресации, [9:0] - операнд
+    operand = operand_value & 0x3FF
+    return (opcode << 12) | (addr_type << 10) | operand
+
+
+def ext_count(value, addr_type):
+    """Число префиксов EXT, нужных для операнда (None - не помещается)"""
+    if (-0x200 <= value <= 0x1FF) if addr_type == IMMEDIATE else (0 <= value <= 0x3FF):
+        return 0
+    for count in range(MAX_EXT + 1):
+        bits = OPERAND_BITS * (count + 1)
+        if addr_type == IMMEDIATE:
+            if -(1 << (bits - 1)) <= value < 1 << (bits - 1):
+                return count
+        elif 0 <= value < 1 << bits:
+            return count
+    return None
+
+
+def encode_extended(opcode, operand_value, addr_type, count):
+    """Кодирование команды с count префиксами EXT (список слов)"""
+    words = []
+    for shift in range(count, 0, -1):
+        chunk = (operand_value >> (OPERAND_BITS * shift)) & 0x3FF
+        words.append((OP_EXT << 12) | chunk)
+    words.append(encode_instruction(opcode, operand_value, addr_type))
+    return words
+
+
+def disassemble(instruction):
+    """Дизассемблирование машинного кода в ассемблерную инструкцию"""
+    opcode = (instruction >> 12) & 0xF
+    addr_type = (instruction >> 10) & 0x3
+    operand = instruction & 0x3FF
+
+    if instruction == 0:
+        return "NOP"
+
+    if opcode == OP_EXT:
+        return f"EXT #{operand}"
+
+    if opcode not in MNEMONICS or opcode == 0:
+        return f"UNKNOWN 0x{instruction:04X}"
+
+    mnemonic = MNEMONICS[opcode]
+
+    # Формирование строки операнда
+    if mnemonic == "HALT":
+        return "HALT"
+
+    # Определение типа адресации
+    if addr_type == IMMEDIATE:
+        return f"{mnemonic} #{operand}"
+    elif addr_type == DIRECT:
+        return f"{mnemonic} {operand}"
+    elif addr_type == REGISTER:
+        if 1 <= operand <= NUM_REGISTERS:
+            return f"{mnemonic} R{operand}"
+        else:
+            return f"{mnemonic} 0x{operand:X}"
+    elif addr_type == INDIRECT:
+        if 1 <= operand <= NUM_REGISTERS:
+            return f"{mnemonic} [R{operand}]"
+        else:
+            return f"{mnemonic} 0x{operand:X}"
+
+    return f"{mnemonic} 0x{operand:X}"
+
+
+def tokenize(asm_code):
+    """Разбиение текста на лексемы
+
+    Возвращает список (номер строки, метка или None, мнемоника или None,
+    строка операнда). Метка может стоять на одной строке с командой.
+    """
+    tokens = []
+    for line_no, line in enumerate(asm_code.split('\n'), 1):
+        # Удаление комментариев
+        line = line.partition(';')[0].strip()
+        if not line:
+            continue
+
+        # Метка - отдельной строкой или перед командой ("LOOP: LOAD R2")
+        label = None
+        if line.endswith(':'):
+            tokens.append((line_no, line[:-1].strip(), None, ""))
+            continue
+        head, sep, rest = line.partition(':')
+        if sep and head and ' ' not in head:
+            label = head
+            line = rest.strip()
+            if not line:
+                tokens.append((line_no, label, None, ""))
+                continue
+
+        # Разделение на мнемонику и операнд
+        parts = line.split(None, 1)
+        tokens.append((line_no, label, parts[0].upper(),
+                       parts[1].strip() if len(parts) > 1 else ""))
+    return tokens
+
+
+def _jump_target(operand_str, symbols):
+    """Адрес перехода - метка или число (None, если не определен)"""
+    if operand_str in symbols:
+        return symbols[operand_str]
+    try:
+        return int(operand_str)
+    except ValueError:
+        return None
+
+
+def _layout(tokens, errors):
+    """Первый проход: размеры команд (с префиксами EXT) и адреса меток
+
+    Возвращает (размеры, метки, разобранные операнды) по индексам лексем.
+
+    Размер перехода на метку зависит от адреса метки, а тот - от размеров
+    предыдущих команд, поэтому разметка повторяется до устойчивости.
+    Размеры только растут, так что процесс конечен; обычно хватает
+    одного прохода.
+    """
+    sizes = {}
+    operands = {}
+    jumps = []
+    for index, (_, _, mnemonic, operand_str) in enumerate(tokens):
+        if mnemonic is None or mnemonic in NO_OPERAND or mnemonic not in OPCODES:
+            continue
+        if mnemonic in JUMPS:
+            sizes[index] = 1
+            jumps.append(index)
+            continue
+        value, addr_type = operands[index] = parse_operand(operand_str)
+        if not isinstance(value, str):
+            sizes[index] = 1 + (ext_count(value, addr_type) or 0)
+
+    while True:
+        symbols = {}
+        addr = 0
+        for index, (line_no, label, mnemonic, _) in enumerate(tokens):
+            if label is not None and label not in symbols:
+                symbols[label] = addr
+            if mnemonic is not None:
+                addr += sizes.get(index, 1)
+
+        changed = False
+        for index in jumps:
+            value = _jump_target(tokens[index][3], symbols)
+            count = ext_count(value, IMMEDIATE) if value is not None else 0
+            size = 1 + (count or 0)
+            if size > sizes[index]:
+                sizes[index] = size
+                changed = True
+        if not changed:
+            break
+
+    seen = set()
+    for line_no, label, _, _ in tokens:
+        if label is not None:
+            if label in seen:
+                errors.append((line_no, f"Повторное определение метки '{label}'"))
+            seen.add(label)
+    return sizes, symbols, operands
+
+
+def _assemble(asm_code):
+    tokens = tokenize(asm_code)
+    errors = []
+    sizes, symbols, operands = _layout(tokens, errors)
+
+    # Второй проход: кодирование
+    machine_code = []
+    line_map = []
+    for index, (line_no, _, mnemonic, operand_str) in enumerate(tokens):
+        if mnemonic is None:
+            continue
+
+        opcode = OPCODES.get(mnemonic)
+        if opcode is None:
+            errors.append((line_no, f"Неизвестная команда '{mnemonic}'"))
+            machine_code.append(0)
+            line_map.append(line_no)
+            continue
+
+        if mnemonic in NO_OPERAND:
+            if operand_str:
+                errors.append((line_no, f"Команда {mnemonic} не имеет операнда"))
+            machine_code.append(opcode << 12)
+            line_map.append(line_no)
+            continue
+
+        if mnemonic in JUMPS:
+            # Адрес перехода - метка или число, непосредственная адресация
+            value = _jump_target(operand_str, symbols)
+            if value is None:
+                errors.append((line_no, f"Неизвестная метка '{operand_str}'"))
+                value = 0
+            elif value < 0:
+                errors.append((line_no, f"Адрес перехода {value} отрицателен"))
+            addr_type = IMMEDIATE
+        else:
+            value, addr_type = operands[index]
+            if isinstance(value, str) or not operand_str:
+                errors.append((line_no, f"Неверный операнд '{operand_str}' для команды {mnemonic}"))
+                machine_code.append(0)
+                line_map.append(line_no)
+                continue
+
+        size = sizes[index]
+        if ext_count(value, addr_type) is None:
+            bits = OPERAND_BITS * (MAX_EXT + 1)
+            if addr_type == IMMEDIATE:
+                low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+            else:
+                low, high = 0, (1 << bits) - 1
+            errors.append((line_no, f"Операнд {value} вне диапазона {low}..{high}"))
+
+        if size == 1:
+            machine_code.append(encode_instruction(opcode, value, addr_type))
+            line_map.append(line_no)
+        else:
+            machine_code.extend(encode_extended(opcode, value, addr_type, size - 1))
+            line_map.extend([line_no] * size)
+
+    return AssemblyResult(tuple(machine_code), symbols, errors, tuple(line_map))
+
+
+_cache = OrderedDict()
+
+
+def assemble(asm_code, use_cache=True):
+    """Ассемблирование программы в структурированный результат
+
+    Ошибки не возбуждаются, а возвращаются в ``errors`` с номерами
+    строк. Результаты кэшируются по хэшу исходного текста и не должны
+    изменяться вызывающей стороной.
+    """
+    if not use_cache:
+        return _assemble(asm_code)
+    key = hashlib.sha1(asm_code.encode("utf-8")).digest()
+    result = _cache.get(key)
+    if result is not None:
+        _cache.move_to_end(key)
+        return result
+    result = _cache[key] = _assemble(asm_code)
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+
+def assemble_program(asm_code):
+    """Ассемблирование программы из текста в список слов
+
+    При ошибках возбуждает AssemblyError с их перечнем.
+    """
+    result = assemble(asm_code)
+    if result.errors:
+        raise AssemblyError(result.format_errors(limit=10))
+    return list(result.machine_code)
@@ -0,0 +1,337 @@
+"""Пакетный запуск программ на пуле процессов
+
+Файл заданий - JSONL, по одному заданию в строке::
+
+    {"id": "t1", "program": "sum.asm", "data": "10 1 2 3 4 5 6 7 8 9 10"}
+
+Необязательное поле ``max_steps`` переопределяет бюджет шагов задания;
+``data_file`` задает файл начальных данных вместо ``data``, а
+``dump_file`` - файл, в который выгружается итоговая память данных
+(форматы dataio.py, пути - относительно файла заданий). Программа может
+быть готовым образом (image.py, .emi): он загружается без
+ассемблирования, а его образ данных используется, если в задании нет
+ни ``data``, ни ``data_file``.
+Если программа не остановилась за первые LOOP_CHECK_AFTER шагов, дальше
+она выполняется с периодическим поиском повторяющегося состояния
+(``SliceLoopDetector`` из loopdetect.py), и бесконечный цикл
+останавливается с причиной "loop", не расходуя весь бюджет (отключается
+``--no-loop-check``).
+Размеры памяти команд и данных задаются для всего пакета (``--code-size``,
+``--data-size``). С ``--optimize`` программы после ассемблирования
+проходят оптимизатор (optimizer.py).
+Ошибка в отдельном задании (нет программы, некорректные поля или строка
+JSON) попадает в его результат как ``error`` и не прерывает пакет.
+Каждая различная программа ассемблируется один раз в главном процессе,
+задания раздаются пулу ``concurrent.futures`` пачками, а результаты
+(ACC, регистры, число шагов, причина останова) пишутся потоком в JSONL
+в порядке заданий.
+
+Использование::
+
+    python batch.py jobs.jsonl -o results.jsonl --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from assembler import assemble
+from cpu import CPU, CODE_SIZE, DATA_SIZE
+from dataio import dump_data_file, load_data_file
+from image import ProgramImage, is_image, load_image
+from loopdetect import SliceLoopDetector
+from optimizer import optimize
+from translator import translate
+
+DEFAULT_MAX_STEPS = 100000
+DEFAULT_CHUNKSIZE = 256
+LOOP_CHECK_AFTER = 10000  # Шагов основного движка до включения поиска циклов
+SLICE_STEPS = 65536  # Шагов между проверками времени при ограничении по времени
+
+# Состояние рабочего процесса: прогретый процессор и программы
+_worker = None
+
+
+class _Worker:
+    """Прогретый процессор рабочего процесса"""
+
+    def __init__(self, programs, engine, code_size=CODE_SIZE, data_size=DATA_SIZE,
+                 loop_check=True, base_dir="."):
+        self.programs = programs
+        self.engine = engine
+        self.cpu = CPU(code_size, data_size)
+        self.loop_check = loop_check
+        self.base_dir = base_dir
+        self.loaded = None
+        self.translated = None
+
+    def load(self, name):
+        """Загрузка программы, если она отличается от уже загруженной"""
+        if name != self.loaded:
+            machine_code = self.programs[name]
+            if isinstance(machine_code, ProgramImage):
+                machine_code = machine_code.code
+            self.cpu.reset()
+            self.cpu.load_code(machine_code)
+            if self.engine == "translate":
+                self.translated = translate(machine_code, len(self.cpu.code_memory),
+                                            len(self.cpu.data_memory))
+            else:
+                self.translated = None
+            self.loaded = name
+
+    def _execute(self, max_steps):
+        """Выполнение основным движком"""
+        if self.translated is not None:
+            return self.translated.run(self.cpu, max_steps)
+        return self.cpu.run(max_steps)
+
+    def _run_until(self, run, max_steps, deadline):
+        """Выполнение ``run(шаги)`` порциями до момента deadline (time.monotonic)
+
+        Возвращает (число шагов, истекло ли время).
+        """
+        if deadline is None:
+            return run(max_steps), False
+        steps = 0
+        while True:
+            steps += run(min(SLICE_STEPS, max_steps - steps))
+            if self.cpu.halt_reason != "max_steps" or steps >= max_steps:
+                return steps, False
+            if time.monotonic() >= deadline:
+                return steps, True
+
+    def run(self, job, default_max_steps, deadline=None, tracer=None):
+        """Выполнение задания; результат - словарь для JSONL
+
+        deadline - момент (time.monotonic), после которого выполнение
+        прерывается с причиной "timeout"; tracer - трассировщик
+        (tracer.py), через который идет выполнение (без поиска циклов).
+        """
+        result = {"id": job.get("id") if isinstance(job, dict) else None}
+        error = job_error(job, self.programs)
+        if error is not None:
+            result["error"] = error
+            return result
+        name = job["program"]
+        program = self.programs[name]
+        if isinstance(program, str):
+            result["error"] = program
+            return result
+
+        cpu = self.cpu
+        data_file = job.get("data_file")
+        try:
+            if data_file:
+                values = []
+            elif "data" not in job and isinstance(program, ProgramImage):
+                values = program.data
+            elif isinstance(job.get("data"), list):
+                values = job["data"]
+            else:
+                values = list(map(int, str(job.get("data", "")).split()))
+            # Образ памяти данных полного размера
+            image = cpu.make_data_image(values)
+        except (TypeError, ValueError) as e:
+            result["error"] = f"Некорректные данные: {e}"
+            return result
+
+        self.load(name)
+        cpu.restart(image)
+        if data_file:
+            try:
+                load_data_file(cpu, os.path.join(self.base_dir, data_file))
+            except (OSError, ValueError) as e:
+                result["error"] = f"Некорректные данные: {e}"
+                return result
+        max_steps = job.get("max_steps", default_max_steps)
+        loop_check = self.loop_check and tracer is None
+        budget = min(max_steps, LOOP_CHECK_AFTER) if loop_check else max_steps
+        engine = self._execute if tracer is None else tracer.run
+        steps, expired = self._run_until(engine, budget, deadline)
+        loop = None
+        if not expired and cpu.halt_reason == "max_steps" and steps < max_steps:
+            # Долгая программа: дальше тем же движком с периодическим
+            # поиском повторяющегося состояния
+            detector = SliceLoopDetector(cpu, self._execute)
+            detector.start()
+            done, expired = self._run_until(detector.run, max_steps - steps, deadline)
+            steps += done
+            loop = detector.loop
+
+        result.update(
+            acc=cpu.ACC,
+            registers={f"R{i}": cpu.registers[i] for i in range(1, len(cpu.registers))},
+            steps=steps,
+            halt_reason="timeout" if expired else cpu.halt_reason,
+        )
+        if loop is not None:
+            result["loop_pc"], result["loop_period"] = loop
+        if job.get("dump_file"):
+            try:
+                dump_data_file(cpu, os.path.join(self.base_dir, job["dump_file"]))
+            except (OSError, ValueError) as e:
+                result["error"] = f"Ошибка выгрузки данных: {e}"
+        return result
+
+
+class InvalidJob:
+    """Строка файла заданий, которая не разбирается как JSON"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def job_error(job, programs):
+    """Текст ошибки в полях задания или None, если задание корректно"""
+    if isinstance(job, InvalidJob):
+        return job.message
+    if not isinstance(job, dict):
+        return "Задание должно быть JSON-объектом"
+    name = job.get("program")
+    if not isinstance(name, str):
+        return "Нет поля program с именем программы"
+    if name not in programs:
+        return f"Неизвестная программа '{name}'"
+    max_steps = job.get("max_steps", 0)
+    if isinstance(max_steps, bool) or not isinstance(max_steps, int) or max_steps < 0:
+        return "Поле max_steps должно быть неотрицательным целым числом"
+    data = job.get("data", "")
+    if not isinstance(data, (str, int, list)) or isinstance(data, list) and not all(
+            isinstance(value, int) and not isinstance(value, bool) for value in data):
+        return "Поле data должно быть строкой или списком целых чисел"
+    for field in ("data_file", "dump_file"):
+        if field in job and not isinstance(job[field], str):
+            return f"Поле {field} должно быть путем к файлу"
+    return None
+
+
+def _init_worker(programs, engine, code_size, data_size, loop_check, base_dir):
+    global _worker
+    _worker = _Worker(programs, engine, code_size, data_size, loop_check, base_dir)
+
+
+def _run_chunk(jobs, max_steps):
+    return [_worker.run(job, max_steps) for job in jobs]
+
+
+def read_jobs(path):
+    """Чтение заданий из JSONL (пустые строки пропускаются)
+
+    Строка, которая не разбирается как JSON, выдается как InvalidJob и
+    получает в результатах ошибку, не прерывая остальные задания.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield InvalidJob(f"Строка {number}: некорректный JSON ({e})")
+
+
+def assemble_programs(jobs, base_dir=".", optimized=False):
+    """Ассемблирование всех различных программ из заданий
+
+    Возвращает словарь имя -> машинный код, образ (ProgramImage) или
+    строка с ошибкой. Образы .emi читаются без ассемблирования.
+    """
+    programs = {}
+    for job in jobs:
+        name = job.get("program") if isinstance(job, dict) else None
+        if not isinstance(name, str) or name in programs:
+            continue
+        if is_image(name):
+            try:
+                programs[name] = load_image(os.path.join(base_dir, name))
+            except (OSError, ValueError) as e:
+                programs[name] = str(e)
+            continue
+        try:
+            with open(os.path.join(base_dir, name), encoding="utf-8") as f:
+                result = assemble(f.read())
+        except OSError as e:
+            programs[name] = str(e)
+            continue
+        if result.errors:
+            programs[name] = result.format_errors()
+        elif optimized:
+            programs[name] = optimize(result.machine_code).machine_code
+        else:
+            programs[name] = result.machine_code
+    return programs
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(jobs_path, workers=None, chunksize=DEFAULT_CHUNKSIZE,
+              max_steps=DEFAULT_MAX_STEPS, engine="interp",
+              code_size=CODE_SIZE, data_size=DATA_SIZE, loop_check=True,
+              optimized=False):
+    """Выполнение всех заданий; генератор результатов в порядке заданий"""
+    base_dir = os.path.dirname(os.path.abspath(jobs_path))
+    programs = assemble_programs(read_jobs(jobs_path), base_dir, optimized)
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(programs, engine, code_size, data_size,
+                                       loop_check, base_dir)) as pool:
+        # Не больше двух пачек на процесс в очереди: файл заданий
+        # читается потоком и не держится в памяти целиком
+        pending = deque()
+        for chunk in _chunks(read_jobs(jobs_path), chunksize):
+            pending.append(pool.submit(_run_chunk, chunk, max_steps))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный запуск программ эмулятора")
+    parser.add_argument("jobs", help="файл заданий JSONL")
+    parser.add_argument("-o", "--output", help="файл результатов JSONL (по умолчанию stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="заданий в одной пачке")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS,
+                        help="бюджет шагов на задание")
+    parser.add_argument("--engine", choices=("interp", "translate"), default="interp",
+                        help="движок исполнения")
+    parser.add_argument("--code-size", type=int, default=CODE_SIZE,
+                        help="размер памяти команд (слов)")
+    parser.add_argument("--data-size", type=int, default=DATA_SIZE,
+                        help="размер памяти данных (слов)")
+    parser.add_argument("--no-loop-check", action="store_true",
+                        help="не искать бесконечные циклы (расходовать весь бюджет)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="оптимизировать машинный код программ")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for result in run_batch(args.jobs, args.workers, args.chunksize,
+                                args.max_steps, args.engine,
+                                args.code_size, args.data_size,
+                                not args.no_loop_check, args.optimize):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""Набор тестов производительности эмулятора
+
+Прогоняет примеры sum.asm и convolution.asm и синтетические нагрузки
+(длинный цикл, большая память данных, большой исходный текст) через
+ассемблер и все движки исполнения без GUI. Для каждой пары нагрузка/движок
+измеряются команды в секунду и пиковая память (tracemalloc), для
+ассемблера - строки в секунду. Результаты сохраняются в JSON; с
+``--compare`` сравниваются с прошлым прогоном, и замедление больше
+допуска считается регрессией (код возврата 1).
+
+Использование::
+
+    python bench.py -o bench.json
+    python bench.py --quick --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from assembler import assemble
+from cpu import CPU, CODE_SIZE, DATA_SIZE
+from journal import Journal
+from profiler import Profiler
+from tracer import Tracer
+from translator import translate
+
+try:
+    import vector
+except ImportError:  # NumPy не установлен
+    vector = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Нагрузка: исходный текст, образ данных, размеры памяти, число прогонов
+# и число дорожек векторного движка (0 - нагрузка для него не подходит:
+# одна длинная последовательная программа)
+Workload = namedtuple("Workload", "name source data code_size data_size rounds lanes")
+
+ENGINES = ("interp", "translate", "vector", "journal", "trace", "profile")
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.15
+MAX_STEPS = 10 ** 9
+
+
+def _read(name):
+    with open(os.path.join(BASE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def long_loop_source(iterations):
+    """Программа со счетным циклом из iterations итераций"""
+    return f"""
+    LOAD #{iterations}
+    STORE R2
+    LOAD #0
+    STORE R1
+LOOP:
+    LOAD R2
+    JZ END
+    LOAD R1
+    ADD #3
+    STORE R1
+    DEC R2
+    JMP LOOP
+END:
+    LOAD R1
+    HALT
+"""
+
+
+def big_source(lines, seed=0):
+    """Большой сгенерированный исходный текст (для ассемблера)"""
+    rng = random.Random(seed)
+    choices = ["LOAD #5", "ADD R1 ; комментарий", "STORE [R3]", "INC R2", "CMP 7",
+               "MUL #-3", "LOAD 70000", "SUB R4"]
+    out = []
+    for i in range(lines):
+        if i % 16 == 0:
+            out.append(f"L{i}:")
+        if i % 16 == 15:
+            out.append(f"    JN L{rng.randrange(0, i + 1) // 16 * 16}")
+        else:
+            out.append("    " + rng.choice(choices))
+    out.append("    HALT")
+    return "\n".join(out)
+
+
+def workloads(quick=False):
+    """Нагрузки для движков исполнения"""
+    scale = 10 if quick else 1
+    rng = random.Random(1)
+    n = 250
+    sum_data = [n] + [rng.randrange(-100, 100) for _ in range(n)]
+    m = 127
+    conv_data = [m] + [rng.randrange(-50, 50) for _ in range(2 * m)]
+    big = 65535 // scale
+    big_data = [big] + [rng.randrange(-1000, 1000) for _ in range(big)]
+    return [
+        Workload("sum", _read("sum.asm"), sum_data, CODE_SIZE, DATA_SIZE, 200 // scale,
+                 1000 // scale),
+        Workload("convolution", _read("convolution.asm"), conv_data, CODE_SIZE, DATA_SIZE,
+                 200 // scale, 1000 // scale),
+        Workload("long_loop", long_loop_source(300000 // scale), [], CODE_SIZE, DATA_SIZE, 1, 0),
+        Workload("large_data", _read("sum.asm"), big_data, CODE_SIZE, 65536, 1, 0),
+    ]
+
+
+# ----- движки -----
+
+def _run_vector(workload, machine_code):
+    # Все прогоны нагрузки - дорожки одного запуска
+    vcpu = vector.VectorCPU(machine_code, [workload.data] * workload.lanes,
+                            workload.code_size, workload.data_size)
+    return int(vcpu.run(MAX_STEPS).sum())
+
+
+def run_engine(workload, machine_code, engine):
+    """Выполнение всех прогонов нагрузки движком; возвращает число команд
+
+    Для векторного движка - сумма команд по всем ``workload.lanes`` дорожкам.
+    """
+    if engine == "vector":
+        return _run_vector(workload, machine_code)
+
+    cpu = CPU(workload.code_size, workload.data_size)
+    cpu.load_code(machine_code)
+    image = cpu.make_data_image(workload.data)
+    close = None
+    if engine == "interp":
+        run = cpu.run
+    elif engine == "translate":
+        program = translate(machine_code, workload.code_size, workload.data_size)
+        run = lambda max_steps: program.run(cpu, max_steps)
+    elif engine == "journal":
+        run = Journal(cpu).run
+    elif engine == "trace":
+        tracer = Tracer(cpu, open(os.devnull, "wb"))
+        run, close = tracer.run, tracer.file.close
+    elif engine == "profile":
+        run = Profiler(cpu).run
+    else:
+        raise ValueError(f"Неизвестный движок '{engine}'")
+
+    steps = 0
+    try:
+        for _ in range(workload.rounds):
+            cpu.restart(image)
+            steps += run(MAX_STEPS)
+    finally:
+        if close is not None:
+            close()
+    return steps
+
+
+def available_engines():
+    """Движки, доступные в этом окружении"""
+    return [e for e in ENGINES if e != "vector" or vector is not None]
+
+
+# ----- измерения -----
+
+def _best_time(func, repeat):
+    """Лучшее время из repeat вызовов и результат последнего"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _peak_memory(func):
+    """Пиковая память Python-объектов за вызов, байт"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_execution(workload, engine, repeat):
+    result = assemble(workload.source)
+    if result.errors:
+        raise ValueError(f"{workload.name}: {result.format_errors(limit=3)}")
+    machine_code = result.machine_code
+
+    def func():
+        return run_engine(workload, machine_code, engine)
+
+    func()  # Прогрев: трансляция, кэши, предекодирование
+    seconds, steps = _best_time(func, repeat)
+    return {
+        "kind": "execute",
+        "workload": workload.name,
+        "engine": engine,
+        "steps": steps,
+        "seconds": round(seconds, 6),
+        "ips": round(steps / seconds) if seconds else None,
+        "peak_kb": round(_peak_memory(func) / 1024),
+    }
+
+
+def bench_assembler(name, source, repeat):
+    lines = source.count("\n") + 1
+
+    def func():
+        return assemble(source, use_cache=False)
+
+    seconds, result = _best_time(func, repeat)
+    return {
+        "kind": "assemble",
+        "workload": name,
+        "engine": "assembler",
+        "lines": lines,
+        "words": len(result.machine_code),
+        "seconds": round(seconds, 6),
+        "lines_per_second": round(lines / seconds) if seconds else None,
+        "peak_kb": round(_peak_memory(func) / 1024),
+    }
+
+
+def run_suite(quick=False, engines=None, repeat=DEFAULT_REPEAT, log=None):
+    """Прогон всего набора; возвращает словарь для сохранения в JSON"""
+    engines = engines or available_engines()
+    results = []
+
+    def add(entry):
+        results.append(entry)
+        if log is not None:
+            log(format_entry(entry))
+
+    add(bench_assembler("sum.asm", _read("sum.asm"), repeat))
+    add(bench_assembler("convolution.asm", _read("convolution.asm"), repeat))
+    add(bench_assembler("big_source", big_source(5000 if quick else 50000), repeat))
+    for workload in workloads(quick):
+        for engine in engines:
+            if engine == "vector" and not workload.lanes:
+                continue
+            add(bench_execution(workload, engine, repeat))
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+# ----- вывод и сравнение -----
+
+def _key(entry):
+    return entry["kind"], entry["workload"], entry["engine"]
+
+
+def _rate(entry):
+    return entry.get("ips") or entry.get("lines_per_second")
+
+
+def format_entry(entry):
+    if entry["kind"] == "assemble":
+        rate = f"{entry['lines_per_second']:>12,} строк/с"
+    else:
+        rate = f"{entry['ips']:>12,} команд/с"
+    return (f"{entry['workload']:<16} {entry['engine']:<10} {rate}"
+            f"  {entry['seconds']:9.4f} с  {entry['peak_kb']:>8} КБ")
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Сравнение с прошлым прогоном
+
+    Возвращает список (ключ, старая скорость, новая скорость, отношение)
+    и список регрессий - записей, замедлившихся больше чем на tolerance.
+    """
+    old = {_key(entry): entry for entry in baseline["results"]}
+    rows = []
+    regressions = []
+    for entry in current["results"]:
+        previous = old.get(_key(entry))
+        if previous is None or not _rate(previous) or not _rate(entry):
+            continue
+        ratio = _rate(entry) / _rate(previous)
+        row = (_key(entry), _rate(previous), _rate(entry), ratio)
+        rows.append(row)
+        if ratio < 1 - tolerance:
+            regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Тесты производительности эмулятора")
+    parser.add_argument("-o", "--output", help="файл результатов JSON")
+    parser.add_argument("--quick", action="store_true", help="уменьшенные нагрузки")
+    parser.add_argument("--engines", help=f"движки через запятую (по умолчанию все: "
+                                          f"{', '.join(ENGINES)})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="повторов каждого измерения (берется лучшее)")
+    parser.add_argument("--compare", metavar="JSON", help="прошлые результаты для сравнения")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="допустимое замедление при сравнении (доля)")
+    args = parser.parse_args(argv)
+
+    engines = args.engines.split(",") if args.engines else None
+    for engine in engines or ():
+        if engine not in available_engines():
+            parser.error(f"движок '{engine}' недоступен")
+
+    current = run_suite(args.quick, engines, args.repeat, log=print)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows, regressions = compare(current, baseline, args.tolerance)
+    print()
+    for (kind, workload, engine), old, new, ratio in rows:
+        mark = "  РЕГРЕССИЯ" if ratio < 1 - args.tolerance else ""
+        print(f"{workload:<16} {engine:<10} {old:>12,} -> {new:>12,}  x{ratio:.2f}{mark}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,882 @@
+"""Ядро процессора без графического интерфейса
+
+Состояние машины и выполнение команд вынесены из GUI, чтобы программы
+можно было запускать в пакетных задачах и тестах без дисплея.
+
+Память команд и данных - буферы ``array`` настраиваемого размера (до
+64K слов). Операнды, не помещающиеся в 10-битное поле, кодируются с
+префиксами расширения EXT: каждый EXT, стоящий непосредственно перед
+командой, добавляет к ее операнду 10 старших бит. Сам EXT выполняется
+как пустая команда.
+"""
+
+from array import array
+
+# Коды операций
+OP_HALT = 0xF
+OP_LOAD = 0x1
+OP_STORE = 0x2
+OP_ADD = 0x3
+OP_SUB = 0x4
+OP_MUL = 0x5
+OP_CMP = 0x6
+OP_JMP = 0x7
+OP_JZ = 0x8
+OP_JN = 0x9
+OP_INC = 0xA
+OP_DEC = 0xB
+OP_EXT = 0xC  # Префикс расширения операнда
+
+# Типы адресации
+ADDR_IMMEDIATE = 0b00
+ADDR_DIRECT = 0b01
+ADDR_REGISTER = 0b10
+ADDR_INDIRECT = 0b11
+
+# Размеры памяти по умолчанию
+CODE_SIZE = 256
+DATA_SIZE = 256
+MAX_MEMORY_SIZE = 65536
+NUM_REGISTERS = 8
+
+# Ширина поля операнда в одном слове
+OPERAND_BITS = 10
+
+# Тип элементов памяти команд (16-битные слова) и данных по умолчанию
+CODE_TYPE = "H"
+WORD_TYPE = "i"
+
+# Вид записи, передаваемый наблюдателям записи
+WRITE_REGISTER = "R"
+WRITE_MEMORY = "M"
+
+# Ячеек памяти данных в блоке сравнения ChangeTracker
+CHANGE_BLOCK = 64
+
+
+def decode_word(word, ext=0, ext_bits=0):
+    """Разбор слова на (код операции, тип адресации, операнд)
+
+    ext и ext_bits - значение и ширина, накопленные префиксами EXT.
+    Непосредственный операнд возвращается со знаком.
+    """
+    opcode = (word >> 12) & 0xF
+    addr_type = (word >> 10) & 0x3
+    operand = (ext << OPERAND_BITS) | (word & 0x3FF)
+    if addr_type == ADDR_IMMEDIATE:
+        bits = ext_bits + OPERAND_BITS
+        if operand >> (bits - 1):
+            operand -= 1 << bits
+    return opcode, addr_type, operand
+
+
+def decode_program(code):
+    """Декодирование памяти команд с учетом префиксов EXT
+
+    Возвращает список (код операции, тип адресации, операнд) по адресам.
+    """
+    decoded = []
+    ext = ext_bits = 0
+    for word in code:
+        entry = decode_word(word, ext, ext_bits)
+        decoded.append(entry)
+        if entry[0] == OP_EXT:
+            ext = (ext << OPERAND_BITS) | (word & 0x3FF)
+            ext_bits += OPERAND_BITS
+        else:
+            ext = ext_bits = 0
+    return decoded
+
+
+def wrap_value(memory, value):
+    """Значение, усеченное до разрядности ячейки памяти (дополнительный код)"""
+    bits = memory.itemsize * 8
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def zeros(typecode, size):
+    """Буфер array из size нулей"""
+    return array(typecode, [0]) * size
+
+
+# ===== Обработчики команд =====
+#
+# Каждый обработчик получает процессор, адрес команды и пару функций
+# доступа к операнду (чтение и запись), подготовленных при предекодировании.
+# Возвращает адрес следующей команды либо None, если процессор остановился
+# (в этом случае PC и halt_reason уже выставлены обработчиком).
+#
+# За концом таблицы стоят два стража: [len] - выход за пределы памяти
+# команд при последовательном выполнении, [len + 1] - после перехода за
+# пределы памяти (PC к этому моменту уже содержит адрес перехода).
+
+def _op_nop(cpu, pc, get, put):
+    return pc + 1
+
+
+def _op_halt(cpu, pc, get, put):
+    cpu.PC = pc + 1
+    cpu.halt_reason = "halt"
+    return None
+
+
+def _op_end(cpu, pc, get, put):
+    # Выход за пределы памяти команд
+    cpu.PC = pc
+    cpu.halt_reason = "end"
+    return None
+
+
+def _op_jumped_out(cpu, pc, get, put):
+    cpu.halt_reason = "end"
+    return None
+
+
+def _op_load(cpu, pc, get, put):
+    acc = cpu.ACC = get()
+    cpu.Z = 1 if acc == 0 else 0
+    cpu.N = 1 if acc < 0 else 0
+    return pc + 1
+
+
+def _op_store(cpu, pc, get, put):
+    put(cpu.ACC)
+    return pc + 1
+
+
+def _op_add(cpu, pc, get, put):
+    acc = cpu.ACC = cpu.ACC + get()
+    cpu.Z = 1 if acc == 0 else 0
+    cpu.N = 1 if acc < 0 else 0
+    return pc + 1
+
+
+def _op_sub(cpu, pc, get, put):
+    acc = cpu.ACC = cpu.ACC - get()
+    cpu.Z = 1 if acc == 0 else 0
+    cpu.N = 1 if acc < 0 else 0
+    return pc + 1
+
+
+def _op_mul(cpu, pc, get, put):
+    acc = cpu.ACC = cpu.ACC * get()
+    cpu.Z = 1 if acc == 0 else 0
+    cpu.N = 1 if acc < 0 else 0
+    return pc + 1
+
+
+def _op_cmp(cpu, pc, get, put):
+    result = cpu.ACC - get()
+    cpu.Z = 1 if result == 0 else 0
+    cpu.N = 1 if result < 0 else 0
+    return pc + 1
+
+
+def _jump(cpu, target):
+    size = len(cpu.code_memory)
+    if 0 <= target < size:
+        return target
+    cpu.PC = target
+    return size + 1
+
+
+def _op_jmp(cpu, pc, get, put):
+    return _jump(cpu, get())
+
+
+def _op_jz(cpu, pc, get, put):
+    if cpu.Z:
+        return _jump(cpu, get())
+    return pc + 1
+
+
+def _op_jn(cpu, pc, get, put):
+    if cpu.N:
+        return _jump(cpu, get())
+    return pc + 1
+
+
+def _op_inc(cpu, pc, get, put):
+    put(get() + 1)
+    return pc + 1
+
+
+def _op_dec(cpu, pc, get, put):
+    put(get() - 1)
+    return pc + 1
+
+
+# Таблица диспетчеризации по коду операции (неизвестные коды - как NOP)
+HANDLERS = [_op_nop] * 16
+HANDLERS[OP_HALT] = _op_halt
+HANDLERS[OP_LOAD] = _op_load
+HANDLERS[OP_STORE] = _op_store
+HANDLERS[OP_ADD] = _op_add
+HANDLERS[OP_SUB] = _op_sub
+HANDLERS[OP_MUL] = _op_mul
+HANDLERS[OP_CMP] = _op_cmp
+HANDLERS[OP_JMP] = _op_jmp
+HANDLERS[OP_JZ] = _op_jz
+HANDLERS[OP_JN] = _op_jn
+HANDLERS[OP_INC] = _op_inc
+HANDLERS[OP_DEC] = _op_dec
+
+
+# ===== Суперкоманды =====
+#
+# Линейные участки тел циклов (без HALT, возможно с переходом в конце)
+# сливаются в один обработчик, сгенерированный как исходный текст Python:
+# ACC держится в локальной переменной, непосредственные операнды и
+# регистры подставляются напрямую, а флаги вычисляются один раз по
+# последней команде, которая их выставляет (до перехода их никто не
+# читает). Запись в таблице суперкоманд - (обработчик, чтение, запись,
+# число команд); ``CPU.run`` прибавляет к шагам число слитых команд.
+
+MAX_FUSED = 16  # Наибольшая длина суперкоманды (в словах)
+
+_JUMP_OPS = (OP_JMP, OP_JZ, OP_JN)
+_FLAG_OPS = (OP_LOAD, OP_ADD, OP_SUB, OP_MUL, OP_CMP)
+_ARITHMETIC = {OP_ADD: "+", OP_SUB: "-", OP_MUL: "*"}
+
+# Кэш скомпилированных фабрик суперкоманд по исходному тексту
+_fused_factories = {}
+
+
+def _hot_blocks(program):
+    """Линейные участки внутри циклов: список (начало, длина)
+
+    Цикл - диапазон от цели обратного перехода до самого перехода.
+    """
+    size = len(program)
+    leaders = set()
+    loops = []
+    for addr, (opcode, addr_type, operand) in enumerate(program):
+        if opcode in _JUMP_OPS or opcode == OP_HALT:
+            leaders.add(addr + 1)
+            if opcode in _JUMP_OPS and addr_type == ADDR_IMMEDIATE and 0 <= operand < size:
+                leaders.add(operand)
+                if operand <= addr:
+                    loops.append((operand, addr))
+    if not loops:
+        return []
+    hot = set()
+    for start, end in loops:
+        hot.update(range(start, end + 1))
+
+    blocks = []
+    addr = 0
+    while addr < size:
+        if addr not in hot or program[addr][0] == OP_HALT:
+            addr += 1
+            continue
+        start = addr
+        while addr < size and addr - start < MAX_FUSED and addr in hot:
+            opcode = program[addr][0]
+            if opcode == OP_HALT or (addr > start and addr in leaders):
+                break
+            addr += 1
+            if opcode in _JUMP_OPS:
+                break
+        if addr - start >= 2:
+            blocks.append((start, addr - start))
+        elif addr == start:
+            addr += 1
+    return blocks
+
+
+def _fused_source(instructions, size, code_size):
+    """Текст фабрики суперкоманды и список нужных ей функций доступа
+
+    instructions - [(код, тип адресации, операнд)] подряд идущих слов,
+    size и code_size - размеры памяти данных и команд.
+    """
+    args = []
+    lines = []
+
+    def read(i, addr_type, operand):
+        if addr_type == ADDR_IMMEDIATE:
+            return repr(operand)
+        if addr_type == ADDR_REGISTER and 1 <= operand <= NUM_REGISTERS:
+            return f"regs[{operand}]"
+        if addr_type == ADDR_DIRECT:
+            return f"mem[{operand}]" if operand < size else "0"
+        if addr_type == ADDR_INDIRECT and 1 <= operand <= NUM_REGISTERS:
+            return f"(mem[a] if 0 <= (a := regs[{operand}]) < {size} else 0)"
+        args.append(f"g{i}")
+        return f"g{i}()"
+
+    def write(i, addr_type, operand, value):
+        if addr_type == ADDR_REGISTER and 1 <= operand <= NUM_REGISTERS:
+            return f"regs[{operand}] = {value}"
+        if addr_type == ADDR_IMMEDIATE or (addr_type == ADDR_REGISTER):
+            return None
+        args.append(f"p{i}")
+        return f"p{i}({value})"
+
+    last_flags = max((i for i, (opcode, _, _) in enumerate(instructions)
+                      if opcode in _FLAG_OPS), default=None)
+    acc_changed = False
+    acc_loaded = False
+    tail = None
+    for i, (opcode, addr_type, operand) in enumerate(instructions):
+        if not acc_changed and opcode in _FLAG_OPS + (OP_STORE,) and opcode != OP_LOAD:
+            acc_loaded = True
+        if opcode == OP_LOAD:
+            lines.append(f"acc = {read(i, addr_type, operand)}")
+            acc_changed = True
+        elif opcode in _ARITHMETIC:
+            lines.append(f"acc = acc {_ARITHMETIC[opcode]} {read(i, addr_type, operand)}")
+            acc_changed = True
+        elif opcode == OP_CMP:
+            if i == last_flags:
+                lines.append(f"flags = acc - {read(i, addr_type, operand)}")
+        elif opcode == OP_STORE:
+            line = write(i, addr_type, operand, "acc")
+            if line:
+                lines.append(line)
+        elif opcode in (OP_INC, OP_DEC):
+            delta = "+ 1" if opcode == OP_INC else "- 1"
+            if addr_type == ADDR_IMMEDIATE:
+                continue
+            value = f"{read(i, addr_type, operand)} {delta}"
+            line = write(i, addr_type, operand, value)
+            if line:
+                lines.append(line)
+        elif opcode in _JUMP_OPS:
+            if addr_type == ADDR_IMMEDIATE and 0 <= operand < code_size:
+                tail = (i, opcode, None, repr(operand))
+            else:
+                tail = (i, opcode, read(i, addr_type, operand), None)
+        if i == last_flags and opcode != OP_CMP:
+            lines.append("flags = acc")
+
+    if acc_changed:
+        lines.append("cpu.ACC = acc")
+    if last_flags is not None:
+        lines.append("z = cpu.Z = 1 if flags == 0 else 0")
+        lines.append("n = cpu.N = 1 if flags < 0 else 0")
+    count = len(instructions)
+    if tail is None:
+        lines.append(f"return pc + {count}")
+    else:
+        i, opcode, target, constant = tail
+        # Переход внутри памяти команд по константе - без проверки адреса
+        jump = f"return {constant}" if constant else f"return _jump(cpu, {target})"
+        if opcode == OP_JMP:
+            lines.append(jump)
+        else:
+            flag = "Z" if opcode == OP_JZ else "N"
+            local = flag.lower() if last_flags is not None else f"cpu.{flag}"
+            lines.append(f"if {local}:")
+            lines.append(f"    {jump}")
+            lines.append(f"return pc + {count}")
+
+    if acc_loaded:
+        lines.insert(0, "acc = cpu.ACC")
+    body = "\n".join("        " + line for line in lines)
+    source = (f"def make(regs, mem, {', '.join(args + [''])}_jump=_jump):\n"
+              f"    def fused(cpu, pc, get, put):\n"
+              f"{body}\n"
+              f"    return fused\n")
+    return source, args
+
+
+def _op_idiom(cpu, pc, get, put):
+    # Начало распознанного цикла (idioms.py): его выполняет CPU.run
+    return None
+
+
+def _make_fused(cpu, decoded, instructions, start):
+    """Обработчик суперкоманды для слов с адреса start"""
+    source, args = _fused_source(instructions, len(cpu.data_memory), len(cpu.code_memory))
+    factory = _fused_factories.get(source)
+    if factory is None:
+        namespace = {"_jump": _jump}
+        exec(compile(source, "<fused>", "exec"), namespace)
+        factory = _fused_factories[source] = namespace["make"]
+    accessors = []
+    for name in args:
+        entry = decoded[start + int(name[1:])]
+        accessors.append(entry[1] if name[0] == "g" else entry[2])
+    return factory(cpu.registers, cpu.data_memory, *accessors)
+
+
+_ZERO_REGISTERS = (0,) * (NUM_REGISTERS + 1)
+
+
+def _no_put(value):
+    pass
+
+
+def _zero():
+    return 0
+
+
+class CPU:
+    """Состояние процессора и исполнение команд
+
+    Регистры общего назначения хранятся в списке ``registers``,
+    индекс совпадает с номером регистра (``registers[0]`` не используется).
+
+    Размеры памяти команд и данных задаются при создании; ячейки данных
+    имеют тип ``word_type`` модуля array ('h' - 16 бит, 'i' - 32 бита,
+    'q' - 64 бита). Записываемые значения усекаются до разрядности ячейки.
+
+    Память команд предекодируется один раз: каждое слово превращается в
+    запись (обработчик, чтение операнда, запись операнда). Кэш сбрасывается
+    при загрузке кода через ``load_code`` или ``reset``; при записи в
+    ``code_memory`` напрямую нужно вызвать ``invalidate``.
+
+    Наблюдатели записи (``add_write_hook``) вызываются как
+    ``hook(kind, index, old, new)`` при каждой записи в регистр
+    (WRITE_REGISTER) или ячейку памяти данных (WRITE_MEMORY). Без
+    наблюдателей функции записи не содержат никаких проверок.
+
+    Правка таблицы диспетчеризации (``set_dispatch_patch``) вызывается
+    как ``patch(decoded, program)`` после каждого предекодирования и
+    может заменить записи отдельных адресов (так ставятся точки
+    останова); без нее таблица не содержит ничего лишнего.
+
+    Порты ввода-вывода (``set_ports``, см. ports.py) перехватывают
+    чтение и запись своих ячеек памяти данных в функциях доступа к
+    операндам; без портов проверок адресов на порты нет.
+
+    ``run`` без наблюдателей и правок выполняет линейные участки циклов
+    суперкомандами (``fused_table``); состояние и счет шагов те же, что
+    при выполнении по одной команде.
+    """
+
+    __slots__ = ("ACC", "PC", "IR", "Z", "N", "registers",
+                 "code_memory", "data_memory", "halt_reason", "_decoded",
+                 "_write_hooks", "_write_hook", "_patch", "_fused", "fusion", "idioms",
+                 "ports", "code_version")
+
+    def __init__(self, code_size=CODE_SIZE, data_size=DATA_SIZE, word_type=WORD_TYPE):
+        for size in (code_size, data_size):
+            if not 0 < size <= MAX_MEMORY_SIZE:
+                raise ValueError(f"Размер памяти должен быть от 1 до {MAX_MEMORY_SIZE}")
+        self.code_memory = zeros(CODE_TYPE, code_size)
+        self.data_memory = zeros(word_type, data_size)
+        self.registers = [0] * (NUM_REGISTERS + 1)
+        self._write_hooks = []
+        self._write_hook = None
+        self._patch = None
+        self._fused = None
+        self.ports = None  # Порты ввода-вывода (ports.IOPorts)
+        self.fusion = True  # Суперкоманды в CPU.run
+        self.idioms = True  # Циклы-редукции через NumPy в CPU.run
+        self.code_version = 0  # Растет при каждом изменении памяти команд
+        self.reset()
+
+    def reset(self):
+        """Сброс регистров, флагов и обеих памятей"""
+        self.ACC = 0  # Аккумулятор
+        self.PC = 0   # Счетчик команд
+        self.IR = 0   # Регистр команд
+        self.Z = 0    # Флаг нуля
+        self.N = 0    # Флаг отрицательного числа
+        self.registers[:] = _ZERO_REGISTERS
+        self.code_memory[:] = zeros(CODE_TYPE, len(self.code_memory))
+        self.data_memory[:] = zeros(self.data_memory.typecode, len(self.data_memory))
+        # Причина останова: None, "halt", "end", "max_steps",
+        # "break" или "watch" (точка останова или наблюдения)
+        self.halt_reason = None
+        self._decoded = None
+        self.code_version += 1
+
+    def invalidate(self):
+        """Сброс кэша предекодированных команд (после записи в память команд)"""
+        self._decoded = None
+        self.code_version += 1
+
+    def add_write_hook(self, hook):
+        """Подключение наблюдателя записи в регистры и память данных"""
+        self._write_hooks.append(hook)
+        self._update_write_hook()
+
+    def remove_write_hook(self, hook):
+        """Отключение наблюдателя записи"""
+        self._write_hooks.remove(hook)
+        self._update_write_hook()
+
+    def _update_write_hook(self):
+        hooks = tuple(self._write_hooks)
+        if not hooks:
+            self._write_hook = None
+        elif len(hooks) == 1:
+            self._write_hook = hooks[0]
+        else:
+            def fan_out(kind, index, old, new):
+                for hook in hooks:
+                    hook(kind, index, old, new)
+            self._write_hook = fan_out
+        # Функции записи строятся с учетом наблюдателей
+        self._decoded = None
+
+    def set_dispatch_patch(self, patch):
+        """Установка (None - снятие) правки таблицы диспетчеризации"""
+        self._patch = patch
+        self._decoded = None
+
+    def set_ports(self, ports):
+        """Подключение (None - отключение) портов ввода-вывода"""
+        self.ports = ports
+        self._decoded = None
+
+    def write(self, kind, index, value):
+        """Запись в регистр (WRITE_REGISTER) или ячейку памяти данных
+        (WRITE_MEMORY) с уведомлением наблюдателей записи"""
+        target = self.registers if kind == WRITE_REGISTER else self.data_memory
+        old = target[index]
+        target[index] = value
+        if self._write_hook is not None:
+            self._write_hook(kind, index, old, value)
+
+    def load_code(self, machine_code):
+        """Загрузка машинного кода в память команд с адреса 0"""
+        n = min(len(machine_code), len(self.code_memory))
+        self.code_memory[:n] = array(CODE_TYPE, machine_code[:n])
+        self._decoded = None
+        self.code_version += 1
+
+    def make_data_image(self, values):
+        """Образ памяти данных полного размера из начальных значений
+
+        Возбуждает ValueError, если значение не помещается в ячейку.
+        """
+        memory = self.data_memory
+        values = values[:len(memory)]
+        try:
+            image = array(memory.typecode, values)
+        except OverflowError:
+            raise ValueError(f"Значение не помещается в ячейку типа '{memory.typecode}'")
+        image.extend(zeros(memory.typecode, len(memory) - len(image)))
+        return image
+
+    def load_data(self, values):
+        """Загрузка данных в память данных с адреса 0 (остальное обнуляется)"""
+        self.data_memory[:] = self.make_data_image(values)
+
+    def restart(self, data_image):
+        """Быстрый перезапуск загруженной программы с новым образом данных
+
+        В отличие от ``reset`` память команд и кэш предекодирования
+        сохраняются, а образ данных (array полного размера памяти данных,
+        см. ``make_data_image``) копируется в существующий буфер без
+        перевыделения.
+        """
+        self.ACC = 0
+        self.PC = 0
+        self.IR = 0
+        self.Z = 0
+        self.N = 0
+        self.registers[:] = _ZERO_REGISTERS
+        if not isinstance(data_image, array):
+            data_image = self.make_data_image(data_image)
+        self.data_memory[:] = data_image
+        self.halt_reason = None
+
+    def operand_accessors(self, addr_type, operand):
+        """Функции чтения и записи операнда для заданного типа адресации
+
+        operand - декодированный операнд (см. ``decode_word``).
+        Запись, не помещающаяся в ячейку памяти, усекается.
+        """
+        regs = self.registers
+        memory = self.data_memory
+        size = len(memory)
+        hook = self._write_hook
+        ports = self.ports
+
+        if addr_type == ADDR_IMMEDIATE:
+            return (lambda: operand), _no_put
+
+        if addr_type == ADDR_DIRECT:
+            if ports is not None and operand in ports:
+                return ports.accessors(operand)
+            if operand >= size:
+                return _zero, _no_put
+
+            def get():
+                return memory[operand]
+
+            if hook is None:
+                def put(value):
+                    try:
+                        memory[operand] = value
+                    except OverflowError:
+                        memory[operand] = wrap_value(memory, value)
+            else:
+                def put(value):
+                    old = memory[operand]
+                    try:
+                        memory[operand] = value
+                    except OverflowError:
+                        value = memory[operand] = wrap_value(memory, value)
+                    hook(WRITE_MEMORY, operand, old, value)
+
+            return get, put
+
+        if not 1 <= operand <= NUM_REGISTERS:
+            return _zero, _no_put
+
+        if addr_type == ADDR_REGISTER:
+            def get():
+                return regs[operand]
+
+            if hook is None:
+                def put(value):
+                    regs[operand] = value
+            else:
+                def put(value):
+                    old = regs[operand]
+                    regs[operand] = value
+                    hook(WRITE_REGISTER, operand, old, value)
+
+            return get, put
+
+        # Косвенно-регистровая адресация
+        def get():
+            addr = regs[operand]
+            if 0 <= addr < size:
+                return memory[addr]
+            return 0
+
+        if hook is None:
+            def put(value):
+                addr = regs[operand]
+                if 0 <= addr < size:
+                    try:
+                        memory[addr] = value
+                    except OverflowError:
+                        memory[addr] = wrap_value(memory, value)
+        else:
+            def put(value):
+                addr = regs[operand]
+                if 0 <= addr < size:
+                    old = memory[addr]
+                    try:
+                        memory[addr] = value
+                    except OverflowError:
+                        value = memory[addr] = wrap_value(memory, value)
+                    hook(WRITE_MEMORY, addr, old, value)
+
+        if ports is not None:
+            return ports.wrap_indirect(regs, operand, get, put)
+        return get, put
+
+    def predecode(self):
+        """Предекодирование памяти команд в таблицу диспетчеризации"""
+        cache = {}
+        decoded = []
+        program = decode_program(self.code_memory)
+        for key in program:
+            entry = cache.get(key)
+            if entry is None:
+                opcode, addr_type, operand = key
+                get, put = self.operand_accessors(addr_type, operand)
+                entry = cache[key] = (HANDLERS[opcode], get, put)
+            decoded.append(entry)
+        if self._patch is not None:
+            self._patch(decoded, program)
+        # Стражи за концом памяти команд
+        decoded.append((_op_end, _zero, _no_put))
+        decoded.append((_op_jumped_out, _zero, _no_put))
+        self._decoded = decoded
+        return decoded
+
+    def dispatch_table(self):
+        """Таблица диспетчеризации (предекодируется при необходимости)
+
+        Элемент по адресу pc - (обработчик, чтение, запись); обработчик
+        вызывается как ``handler(cpu, pc, get, put)`` и возвращает адрес
+        следующей команды или None при останове. За концом памяти команд
+        стоят два стража (конец программы и переход за ее пределы).
+        """
+        return self._decoded or self.predecode()
+
+    def fused_table(self):
+        """Таблица суперкоманд для ``run`` или None
+
+        Строится по таблице диспетчеризации; не используется, если
+        суперкоманды отключены (``fusion``) или подключены наблюдатели
+        записи, правка таблицы или порты: им нужна каждая команда по
+        отдельности.
+        """
+        fused = self._fused_tables()
+        return fused[0] if fused is not None else None
+
+    def _fused_tables(self):
+        """(таблица суперкоманд, распознанные циклы по адресам) или None"""
+        if (not self.fusion or self._write_hook is not None or self._patch is not None
+                or self.ports is not None):
+            return None
+        decoded = self._decoded or self.predecode()
+        fused = self._fused
+        if fused is not None and fused[0] is decoded and fused[3] == self.idioms:
+            return fused[1], fused[2]
+        program = decode_program(self.code_memory)
+        table = [entry + (1,) for entry in decoded]
+        for start, count in _hot_blocks(program):
+            handler = _make_fused(self, decoded, program[start:start + count], start)
+            table[start] = (handler, _zero, _no_put, count)
+        loops = {}
+        if self.idioms:
+            import idioms  # NumPy загружается только при необходимости
+            loops = idioms.find_reductions(program, self.code_memory)
+            for header, loop in loops.items():
+                # Если оборот целиком не выполнить, выполняется обычная запись
+                loop.fallback = table[header]
+                table[header] = (_op_idiom, _zero, _no_put, 1)
+        self._fused = (decoded, table, loops, self.idioms)
+        return table, loops
+
+    def get_operand_value(self, instruction):
+        """Получение фактического значения операнда (одно слово, без EXT)"""
+        _, addr_type, operand = decode_word(instruction)
+        get, _ = self.operand_accessors(addr_type, operand)
+        return get()
+
+    def set_operand_value(self, instruction, value):
+        """Установка значения по адресу операнда (одно слово, без EXT)"""
+        _, addr_type, operand = decode_word(instruction)
+        _, put = self.operand_accessors(addr_type, operand)
+        put(value)
+
+    def execute_instruction(self):
+        """Выполнение одной инструкции
+
+        Возвращает False, если процессор остановился (HALT или выход
+        за пределы памяти команд).
+        """
+        decoded = self._decoded or self.predecode()
+        pc = self.PC
+        if not 0 <= pc < len(self.code_memory):
+            self.halt_reason = "end"
+            return False
+
+        # Загрузка инструкции
+        self.IR = self.code_memory[pc]
+        handler, get, put = decoded[pc]
+        next_pc = handler(self, pc, get, put)
+        if next_pc is None:
+            return False
+        if next_pc <= len(self.code_memory):
+            self.PC = next_pc
+        return True
+
+    def run(self, max_steps):
+        """Выполнение до останова, но не более max_steps команд
+
+        Возвращает количество выполненных шагов (HALT не считается,
+        как и в GUI). Причина останова сохраняется в ``halt_reason``.
+        """
+        self.halt_reason = None
+        decoded = self._decoded or self.predecode()
+        pc = self.PC
+        if not 0 <= pc < len(self.code_memory):
+            self.halt_reason = "end"
+            return 0
+
+        steps = 0
+        last = pc
+        fused = self._fused_tables() if max_steps > MAX_FUSED else None
+        if fused is not None:
+            fused, loops = fused
+            # Пока в бюджете есть место для самой длинной суперкоманды
+            limit = max_steps - MAX_FUSED
+            while steps < limit:
+                handler, get, put, count = fused[pc]
+                next_pc = handler(self, pc, get, put)
+                if next_pc is None:
+                    loop = loops.get(pc)
+                    if loop is None:
+                        code = self.code_memory
+                        self.IR = code[pc] if pc < len(code) else code[last]
+                        return steps
+                    # Начало цикла-редукции: полные обороты сразу
+                    done = loop.execute(self, max_steps - steps)
+                    if done:
+                        steps += done
+                        last = loop.jump
+                        continue
+                    handler, get, put, count = loop.fallback
+                    next_pc = handler(self, pc, get, put)
+                last = pc + count - 1
+                pc = next_pc
+                steps += count
+
+        while steps < max_steps:
+            handler, get, put = decoded[pc]
+            next_pc = handler(self, pc, get, put)
+            if next_pc is None:
+                code = self.code_memory
+                self.IR = code[pc] if pc < len(code) else code[last]
+                return steps
+            last = pc
+            pc = next_pc
+            steps += 1
+
+        if steps:
+            self.IR = self.code_memory[last]
+        if pc <= len(self.code_memory):
+            self.PC = pc
+        self.halt_reason = "max_steps"
+        return steps
+
+
+class ChangeTracker:
+    """Учет изменений состояния процессора между перерисовками
+
+    Все состояние сравнивается с предыдущим снимком: ACC, PC, IR, флаги
+    и регистры - по значениям, память данных - блоками по
+    ``CHANGE_BLOCK`` ячеек (сравнение срезов array идет в C), и только
+    несовпавшие блоки - по ячейкам. Наблюдатель записи не нужен, так
+    что ``CPU.run`` сохраняет суперкоманды, а изменения за квант
+    выполнения собираются одним сравнением на перерисовку.
+    """
+
+    SCALARS = ("ACC", "PC", "IR", "Z", "N")
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.last = None
+        self.registers = None
+        self.memory = None
+
+    def _changed_cells(self, memory):
+        old = self.memory
+        if old is None or len(old) != len(memory) or old == memory:
+            return set()
+        cells = set()
+        for start in range(0, len(memory), CHANGE_BLOCK):
+            end = start + CHANGE_BLOCK
+            if memory[start:end] != old[start:end]:
+                cells.update(index for index in range(start, min(end, len(memory)))
+                             if memory[index] != old[index])
+        return cells
+
+    def collect(self):
+        """Изменения с прошлого вызова: (скаляры, регистры, ячейки памяти)"""
+        cpu = self.cpu
+        current = (cpu.ACC, cpu.PC, cpu.IR, cpu.Z, cpu.N)
+        if self.last is None:
+            scalars = set(self.SCALARS)
+            registers = set()
+        else:
+            scalars = {name for name, old, new in zip(self.SCALARS, self.last, current)
+                       if old != new}
+            registers = {index for index, (old, new)
+                         in enumerate(zip(self.registers, cpu.registers)) if old != new}
+        cells = self._changed_cells(cpu.data_memory)
+        self.last = current
+        self.registers = list(cpu.registers)
+        self.memory = cpu.data_memory[:]
+        return scalars, registers, cells
+
+    def clear(self):
+        """Сброс накопленных изменений (после полной перерисовки)"""
+        self.last = None
+        self.memory = None
+        self.collect()
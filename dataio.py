@@ -0,0 +1,188 @@
+"""Пакетная загрузка и выгрузка памяти данных
+
+Форматы файлов:
+
+- ``int16``, ``int32`` - двоичные little-endian числа без заголовка
+  (расширения .i16 и .i32);
+- ``npy`` - одномерный целочисленный массив NumPy (.npy, требуется NumPy);
+- ``csv`` - десятичные числа через запятые, точки с запятой или
+  пробельные символы (.csv, .txt).
+
+Двоичные файлы и .npy отображаются в память (mmap) и копируются прямо в
+буфер памяти данных: при совпадении разрядности файла и ячейки - одним
+копированием байтов, иначе - преобразованием NumPy (без NumPy двоичный
+файл читается через array). Значения за пределами размера памяти
+отбрасываются, остаток памяти обнуляется, как в ``CPU.load_data``.
+"""
+
+import json
+import mmap
+import os
+import re
+import sys
+from array import array
+
+from cpu import NUM_REGISTERS, zeros
+
+try:
+    import numpy as np
+except ImportError:  # NumPy не установлен
+    np = None
+
+# Формат -> (код типа array, тип NumPy little-endian)
+RAW_TYPES = {"int16": ("h", "<i2"), "int32": ("i", "<i4")}
+FORMATS = ("int16", "int32", "npy", "csv")
+EXTENSIONS = {".i16": "int16", ".i32": "int32", ".npy": "npy", ".csv": "csv", ".txt": "csv"}
+
+_LITTLE = sys.byteorder == "little"
+
+
+def file_format(path, fmt=None):
+    """Формат файла: заданный явно или по расширению"""
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+        if fmt is None:
+            raise ValueError(f"Неизвестный формат файла '{path}' "
+                             f"(укажите один из: {', '.join(FORMATS)})")
+    elif fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат '{fmt}'")
+    return fmt
+
+
+def _require_numpy(fmt):
+    if np is None:
+        raise ValueError(f"Для формата {fmt} требуется NumPy")
+
+
+def _overflow(memory):
+    return ValueError(f"Значение не помещается в ячейку типа '{memory.typecode}'")
+
+
+def _copy_into(memory, source, count):
+    """Копирование count значений из массива NumPy в начало памяти"""
+    target = np.frombuffer(memory, dtype=memory.typecode)
+    source = source[:count]
+    if count and source.dtype.kind in "iu":
+        info = np.iinfo(target.dtype)
+        if source.min() < info.min or source.max() > info.max:
+            raise _overflow(memory)
+    elif count:
+        raise ValueError("Файл должен содержать целые числа")
+    target[:count] = source
+
+
+def _load_raw(memory, path, fmt):
+    typecode, dtype = RAW_TYPES[fmt]
+    itemsize = array(typecode).itemsize
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size % itemsize:
+            raise ValueError(f"Размер файла '{path}' не кратен {itemsize} байтам")
+        count = min(size // itemsize, len(memory))
+        if not count:
+            return 0
+        size = count * itemsize
+        if memory.typecode == typecode and _LITTLE:
+            # Та же разрядность: одно копирование байтов из отображения файла
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as source, memoryview(memory) as view, \
+                    view.cast("B") as target:
+                target[:size] = source
+            return count
+        if np is None:
+            values = array(typecode)
+            values.fromfile(f, count)
+            if not _LITTLE:
+                values.byteswap()
+            try:
+                memory[:count] = array(memory.typecode, values)
+            except OverflowError:
+                raise _overflow(memory)
+            return count
+    _copy_into(memory, np.memmap(path, dtype=dtype, mode="r", shape=(count,)), count)
+    return count
+
+
+def _load_npy(memory, path):
+    _require_numpy("npy")
+    source = np.load(path, mmap_mode="r", allow_pickle=False)
+    if source.ndim != 1:
+        raise ValueError(f"Массив в '{path}' должен быть одномерным")
+    count = min(len(source), len(memory))
+    _copy_into(memory, source, count)
+    return count
+
+
+def _load_csv(memory, path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    items = re.split(r"[\s,;]+", text) if text else []
+    count = min(len(items), len(memory))
+    try:
+        values = array(memory.typecode, map(int, items[:count]))
+    except OverflowError:
+        raise _overflow(memory)
+    memory[:count] = values
+    return count
+
+
+def load_data_file(cpu, path, fmt=None):
+    """Загрузка файла в память данных с адреса 0 (остальное обнуляется)
+
+    Возвращает число загруженных значений. Возбуждает ValueError при
+    неизвестном формате, некорректном содержимом или значении, которое
+    не помещается в ячейку; OSError - при ошибке чтения.
+    """
+    fmt = file_format(path, fmt)
+    memory = cpu.data_memory
+    if fmt in RAW_TYPES:
+        count = _load_raw(memory, path, fmt)
+    elif fmt == "npy":
+        count = _load_npy(memory, path)
+    else:
+        count = _load_csv(memory, path)
+    memory[count:] = zeros(memory.typecode, len(memory) - count)
+    return count
+
+
+def dump_data_file(cpu, path, fmt=None, count=None):
+    """Выгрузка первых count ячеек памяти данных (по умолчанию всех)"""
+    fmt = file_format(path, fmt)
+    memory = cpu.data_memory
+    count = len(memory) if count is None else min(count, len(memory))
+    if fmt in RAW_TYPES:
+        typecode = RAW_TYPES[fmt][0]
+        if memory.typecode == typecode and _LITTLE:
+            with open(path, "wb") as f, memoryview(memory) as view:
+                f.write(view[:count])
+            return
+        try:
+            values = array(typecode, memory[:count])
+        except OverflowError:
+            raise ValueError(f"Значение не помещается в формат {fmt}")
+        if not _LITTLE:
+            values.byteswap()
+        with open(path, "wb") as f:
+            values.tofile(f)
+    elif fmt == "npy":
+        _require_numpy("npy")
+        np.save(path, np.frombuffer(memory, dtype=memory.typecode, count=count))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(map(str, memory[:count])))
+            f.write("\n")
+
+
+def cpu_state(cpu):
+    """Регистры, флаги и причина останова в виде словаря"""
+    state = {"ACC": cpu.ACC, "PC": cpu.PC, "IR": cpu.IR, "Z": cpu.Z, "N": cpu.N}
+    state.update((f"R{i}", cpu.registers[i]) for i in range(1, NUM_REGISTERS + 1))
+    state["halt_reason"] = cpu.halt_reason
+    return state
+
+
+def dump_registers(cpu, path):
+    """Выгрузка регистров и флагов в JSON"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cpu_state(cpu), f, ensure_ascii=False, indent=2)
+        f.write("\n")
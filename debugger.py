@@ -0,0 +1,254 @@
+"""Точки останова, наблюдения за записью и условные остановы
+
+Проверки встраиваются в таблицу диспетчеризации процессора только по
+тем адресам, где они нужны: точка останова заменяет обработчик своей
+команды, наблюдение за ячейкой или регистром - обработчики команд,
+которые могут туда записать. Остальные команды и сам цикл ``CPU.run``
+не меняются, а без точек останова таблица совпадает с обычной.
+
+Условия вида ``ACC < 0 and [10] == R1`` компилируются в функцию один
+раз при установке. Допустимы ACC, PC, Z, N, R1-R8, ячейки памяти
+данных ``[адрес]`` или ``[Rx]``, числа, арифметика и сравнения.
+Сдвиги допускаются только на постоянное число бит до MAX_SHIFT: иначе
+``ACC << 10**9`` строил бы огромное число при каждой проверке.
+
+Точки останова действуют на все движки, работающие через таблицу
+диспетчеризации (``CPU.run``, ``execute_instruction``, журнал,
+профилировщик), но не на транслированный код.
+"""
+
+import ast
+import re
+
+from cpu import (
+    NUM_REGISTERS, OP_STORE, OP_INC, OP_DEC,
+    ADDR_DIRECT, ADDR_REGISTER, ADDR_INDIRECT,
+)
+
+WRITES = (OP_STORE, OP_INC, OP_DEC)
+MAX_SHIFT = 64  # Наибольший сдвиг в условии
+
+_NAMES = {"ACC", "PC", "Z", "N"} | {f"R{i}" for i in range(1, NUM_REGISTERS + 1)}
+_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+    ast.UAdd, ast.Invert, ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.FloorDiv,
+    ast.Mod, ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Constant, ast.Name, ast.Load, ast.List,
+)
+
+
+def _read(memory, addr):
+    return memory[addr] if 0 <= addr < len(memory) else 0
+
+
+def compile_condition(text):
+    """Компиляция условия в функцию ``condition(cpu) -> bool``
+
+    Возбуждает ValueError при синтаксической ошибке или недопустимом имени.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Синтаксическая ошибка в условии '{text}'")
+
+    used = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _NODES):
+            raise ValueError(f"Недопустимая конструкция в условии '{text}'")
+        if isinstance(node, ast.Name):
+            if node.id not in _NAMES:
+                raise ValueError(f"Неизвестное имя '{node.id}' в условии")
+            used.add(node.id)
+        elif isinstance(node, ast.Constant) and type(node.value) is not int:
+            raise ValueError(f"Недопустимая константа в условии '{text}'")
+        elif isinstance(node, ast.List) and len(node.elts) != 1:
+            raise ValueError(f"Ячейка памяти задается одним адресом: '{text}'")
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, (ast.LShift, ast.RShift)):
+            shift = node.right
+            if not (isinstance(shift, ast.Constant) and type(shift.value) is int
+                    and 0 <= shift.value <= MAX_SHIFT):
+                raise ValueError(f"Сдвиг допускается на число бит от 0 до {MAX_SHIFT}: '{text}'")
+
+    class Cells(ast.NodeTransformer):
+        # [адрес] -> _read(M, адрес)
+        def visit_List(self, node):
+            self.generic_visit(node)
+            return ast.Call(ast.Name("_read", ast.Load()),
+                            [ast.Name("M", ast.Load()), node.elts[0]], [])
+
+    expression = ast.unparse(Cells().visit(tree))
+    lines = ["def condition(cpu):"]
+    for name in sorted(used):
+        if name[0] == "R":
+            lines.append(f"    {name} = cpu.registers[{name[1:]}]")
+        else:
+            lines.append(f"    {name} = cpu.{name}")
+    if "_read" in expression:
+        lines.append("    M = cpu.data_memory")
+    lines.append(f"    return bool({expression})")
+    namespace = {"_read": _read}
+    exec(compile("\n".join(lines), "<condition>", "exec"), namespace)
+    condition = namespace["condition"]
+    condition.text = text.strip()
+    return condition
+
+
+def parse_watch(text):
+    """Разбор списка наблюдений: "10 R1 [20]" -> ({10, 20}, {1})"""
+    cells, registers = set(), set()
+    for item in re.split(r"[\s,;]+", text.strip()):
+        if not item:
+            continue
+        name = item.strip("[]").upper()
+        if name in _NAMES and name[0] == "R":
+            registers.add(int(name[1:]))
+        else:
+            try:
+                cells.add(int(name))
+            except ValueError:
+                raise ValueError(f"Некорректная ячейка или регистр '{item}'")
+    return cells, registers
+
+
+class Debugger:
+    """Точки останова и наблюдения для процессора
+
+    Останов по точке происходит перед выполнением команды (PC указывает
+    на нее, ``halt_reason`` = "break"); по наблюдению - после команды,
+    записавшей в ячейку или регистр (PC указывает на следующую,
+    ``halt_reason`` = "watch"). Команда, вызвавшая останов по
+    наблюдению, не входит в число шагов, как и HALT. Причина последнего
+    останова - в ``hit``.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.breakpoints = {}       # Адрес -> условие (None - безусловно)
+        self.watch_cells = set()
+        self.watch_registers = set()
+        self.hit = None
+        self._resume_pc = None
+
+    @property
+    def armed(self):
+        """Установлена хотя бы одна точка"""
+        return bool(self.breakpoints or self.watch_cells or self.watch_registers)
+
+    def _update(self):
+        self._resume_pc = None
+        self.cpu.set_dispatch_patch(self._patch if self.armed else None)
+
+    def add_breakpoint(self, pc, condition=None):
+        """Точка останова по адресу команды, возможно с условием (текст или функция)"""
+        if isinstance(condition, str):
+            condition = compile_condition(condition) if condition.strip() else None
+        self.breakpoints[pc] = condition
+        self._update()
+
+    def remove_breakpoint(self, pc):
+        self.breakpoints.pop(pc, None)
+        self._update()
+
+    def watch(self, cells=(), registers=()):
+        """Наблюдение за записью в ячейки памяти данных и регистры"""
+        self.watch_cells.update(cells)
+        self.watch_registers.update(registers)
+        self._update()
+
+    def unwatch(self, cells=(), registers=()):
+        self.watch_cells.difference_update(cells)
+        self.watch_registers.difference_update(registers)
+        self._update()
+
+    def clear(self):
+        """Снятие всех точек"""
+        self.breakpoints.clear()
+        self.watch_cells.clear()
+        self.watch_registers.clear()
+        self._update()
+
+    def resume(self):
+        """Следующее выполнение не остановится на точке по текущему PC
+
+        Вызывается перед продолжением с места останова и перед шагом.
+        """
+        pc = self.cpu.PC
+        self._resume_pc = pc if pc in self.breakpoints else None
+
+    # ----- встраивание в таблицу диспетчеризации -----
+
+    def _patch(self, decoded, program):
+        for pc, (opcode, addr_type, operand) in enumerate(program):
+            if opcode in WRITES:
+                watched = self._watched_write(addr_type, operand)
+                if watched is not None:
+                    decoded[pc] = self._watch_entry(decoded[pc], watched)
+        for pc, condition in self.breakpoints.items():
+            if 0 <= pc < len(program):
+                decoded[pc] = self._break_entry(decoded[pc], condition)
+
+    def _watched_write(self, addr_type, operand):
+        """Проверка записи команды: (вид, что проверять) или None"""
+        if addr_type == ADDR_DIRECT:
+            return ("M", operand) if operand in self.watch_cells else None
+        if addr_type == ADDR_REGISTER:
+            return ("R", operand) if operand in self.watch_registers else None
+        if addr_type == ADDR_INDIRECT and self.watch_cells and 1 <= operand <= NUM_REGISTERS:
+            return ("[R]", operand)
+        return None
+
+    def _break_entry(self, entry, condition):
+        handler, get, put = entry
+        debugger = self
+
+        def trap(cpu, pc, get, put):
+            if pc == debugger._resume_pc:
+                debugger._resume_pc = None
+            elif condition is None or condition(cpu):
+                cpu.PC = pc
+                cpu.halt_reason = "break"
+                debugger.hit = ("break", pc)
+                return None
+            return handler(cpu, pc, get, put)
+
+        return trap, get, put
+
+    def _watch_entry(self, entry, watched):
+        handler, get, put = entry
+        kind, operand = watched
+        debugger = self
+        cells = self.watch_cells
+
+        def stop(cpu, next_pc, where):
+            cpu.PC = next_pc
+            cpu.halt_reason = "watch"
+            debugger.hit = ("watch", where)
+            return None
+
+        if kind == "[R]":
+            def trap(cpu, pc, get, put):
+                next_pc = handler(cpu, pc, get, put)
+                addr = cpu.registers[operand]
+                if addr in cells:
+                    return stop(cpu, next_pc, addr)
+                return next_pc
+        else:
+            where = operand if kind == "M" else f"R{operand}"
+
+            def trap(cpu, pc, get, put):
+                return stop(cpu, handler(cpu, pc, get, put), where)
+
+        return trap, get, put
+
+    def describe_hit(self):
+        """Текст о последнем останове"""
+        if self.hit is None:
+            return ""
+        kind, where = self.hit
+        if kind == "break":
+            condition = self.breakpoints.get(where)
+            text = f"Точка останова PC={where}"
+            return f"{text} ({condition.text})" if getattr(condition, "text", None) else text
+        target = where if isinstance(where, str) else f"[{where}]"
+        return f"Запись в {target}, PC={self.cpu.PC}"
@@ -0,0 +1,818 @@
+import time
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox, filedialog
+
+from assembler import assemble, disassemble
+from cpu import CPU, ChangeTracker
+from dataio import EXTENSIONS, dump_data_file, dump_registers, load_data_file
+from debugger import Debugger, parse_watch
+from journal import Journal
+from loopdetect import LoopDetector
+from memview import MemoryView, RecentWrites
+from profiler import Profiler
+
+# Режим непрерывного выполнения
+DEFAULT_MAX_STEPS = 1000000   # Лимит шагов по умолчанию
+FRAME_INTERVAL = 1 / 30       # Не чаще 30 перерисовок в секунду
+SLICE_TIME = 0.02             # Длительность кванта на максимальной скорости, с
+SLICE_CHUNK = 2000            # Шагов между проверками времени внутри кванта
+MAX_SPEED = "Макс."
+SPEED_CHOICES = ["1", "10", "100", "1000", "10000", MAX_SPEED]
+
+# Число строк в окнах памяти (до подстройки под размер окна)
+VIEW_ROWS = 32
+
+class Emulator:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Эмулятор с Гарвардской архитектурой и одноадресной системой команд")
+        self.root.geometry("1400x800")
+        
+        # Инициализация процессора
+        self.cpu = CPU()
+        self.tracker = ChangeTracker(self.cpu)
+        self.journal = Journal(self.cpu)  # Журнал для шагов назад
+        self.profiler = Profiler(self.cpu)
+        self.debugger = Debugger(self.cpu)  # Точки останова и наблюдения
+        self.detector = None  # Поиск бесконечных циклов (на время run_all)
+        self.loop_message = ""  # Описание последнего найденного цикла
+        self.shown_counts = {}  # Счетчики профиля, выведенные в памяти команд
+        self.recent = RecentWrites()  # Недавно записанные ячейки памяти данных
+        self.disasm_cache = {}
+        self.status_text = None
+        self.run_active = False  # Идет непрерывное выполнение (run_all)
+        self.run_job = None      # Отложенный вызов after() следующего кванта
+        self.reset_cpu()
+        
+        # Создание интерфейса
+        self.create_widgets()
+        
+    def reset_cpu(self):
+        """Сброс состояния процессора"""
+        # Регистры, флаги и обе памяти (Гарвардская архитектура)
+        self.cpu.reset()
+        self.journal.clear()
+        self.profiler.clear()
+        
+        # Следующее обновление дисплея перерисует все целиком
+        self.display_stale = True
+        
+        # Машинный код (для отображения)
+        self.machine_code = []
+        
+        # Текущая выполняемая программа
+        self.current_program = ""
+        
+        # Режим выполнения
+        self.running = False
+        self.step_mode = False
+        self.cancel_run()
+        
+    def create_widgets(self):
+        """Создание виджетов интерфейса"""
+        # Основной контейнер
+        main_container = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
+        main_container.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # Левая панель (редактирование и управление)
+        left_panel = ttk.Frame(main_container)
+        main_container.add(left_panel, weight=1)
+        
+        # Правая панель (состояние процессора)
+        right_panel = ttk.Frame(main_container)
+        main_container.add(right_panel, weight=1)
+        
+        # ===== ЛЕВАЯ ПАНЕЛЬ =====
+        
+        # 1. Редактор ассемблерного кода
+        code_frame = ttk.LabelFrame(left_panel, text="Ассемблерный код", padding=10)
+        code_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.code_text = scrolledtext.ScrolledText(code_frame, width=50, height=20, font=("Courier New", 10))
+        self.code_text.pack(fill=tk.BOTH, expand=True)
+        
+        # 2. Ввод данных
+        data_frame = ttk.LabelFrame(left_panel, text="Входные данные", padding=10)
+        data_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.data_text = scrolledtext.ScrolledText(data_frame, width=50, height=5, font=("Courier New", 10))
+        self.data_text.pack(fill=tk.X, pady=5)
+        
+        # Данные из файла задаются строкой "@путь"
+        file_frame = ttk.Frame(data_frame)
+        file_frame.pack(fill=tk.X)
+        ttk.Button(file_frame, text="Из файла...", command=self.choose_data_file).pack(side=tk.LEFT, padx=2)
+        ttk.Button(file_frame, text="Сохранить память...", command=self.save_data_memory).pack(side=tk.LEFT, padx=2)
+        ttk.Button(file_frame, text="Сохранить регистры...", command=self.save_registers).pack(side=tk.LEFT, padx=2)
+        
+        # 3. Кнопки управления
+        button_frame = ttk.LabelFrame(left_panel, text="Примерные программы", padding=10)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(button_frame, text="Сумма массива", command=self.load_sum_example).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Свертка двух массивов", command=self.load_convolution_example).pack(side=tk.LEFT, padx=2)
+        
+        button_frame = ttk.Frame(left_panel)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(button_frame, text="Загрузить", command=self.load_program).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Выполнить полно", command=self.run_all).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Выполнить пошагово", command=self.step).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Стоп", command=self.stop).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Сбросить", command=self.reset).pack(side=tk.LEFT, padx=2)
+        
+        # 4. Параметры непрерывного выполнения
+        run_frame = ttk.LabelFrame(left_panel, text="Режим выполнения", padding=10)
+        run_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(run_frame, text="Скорость (шагов/с):").pack(side=tk.LEFT, padx=2)
+        self.speed_var = tk.StringVar(value=MAX_SPEED)
+        ttk.Combobox(run_frame, textvariable=self.speed_var, values=SPEED_CHOICES,
+                     width=8, state="readonly").pack(side=tk.LEFT, padx=2)
+        
+        ttk.Label(run_frame, text="Лимит шагов:").pack(side=tk.LEFT, padx=2)
+        self.budget_var = tk.StringVar(value=str(DEFAULT_MAX_STEPS))
+        ttk.Entry(run_frame, textvariable=self.budget_var, width=12).pack(side=tk.LEFT, padx=2)
+        
+        # Шаги по одной команде записываются в журнал всегда, непрерывное
+        # выполнение - только по флажку: журнал выполняет команды по одной
+        self.journal_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(run_frame, text="Журнал запуска", variable=self.journal_var).pack(side=tk.LEFT, padx=2)
+        
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(run_frame, text="Профиль", variable=self.profile_var).pack(side=tk.LEFT, padx=2)
+        ttk.Button(run_frame, text="Отчет", command=self.show_profile).pack(side=tk.LEFT, padx=2)
+        
+        self.loop_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(run_frame, text="Зацикливание", variable=self.loop_var).pack(side=tk.LEFT, padx=2)
+        
+        # 5. Обратное выполнение по журналу
+        back_frame = ttk.LabelFrame(left_panel, text="Обратное выполнение", padding=10)
+        back_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Button(back_frame, text="Шаг назад", command=self.step_back).pack(side=tk.LEFT, padx=2)
+        ttk.Label(back_frame, text="PC:").pack(side=tk.LEFT, padx=2)
+        self.back_pc_var = tk.StringVar(value="0")
+        ttk.Entry(back_frame, textvariable=self.back_pc_var, width=6).pack(side=tk.LEFT, padx=2)
+        ttk.Button(back_frame, text="Назад до PC", command=self.run_back).pack(side=tk.LEFT, padx=2)
+        
+        # 6. Точки останова и наблюдения
+        debug_frame = ttk.LabelFrame(left_panel, text="Точки останова", padding=10)
+        debug_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(debug_frame, text="PC:").pack(side=tk.LEFT, padx=2)
+        self.break_var = tk.StringVar()
+        ttk.Entry(debug_frame, textvariable=self.break_var, width=8).pack(side=tk.LEFT, padx=2)
+        ttk.Label(debug_frame, text="Условие:").pack(side=tk.LEFT, padx=2)
+        self.condition_var = tk.StringVar()
+        ttk.Entry(debug_frame, textvariable=self.condition_var, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Label(debug_frame, text="Запись в:").pack(side=tk.LEFT, padx=2)
+        self.watch_var = tk.StringVar()
+        ttk.Entry(debug_frame, textvariable=self.watch_var, width=8).pack(side=tk.LEFT, padx=2)
+        ttk.Button(debug_frame, text="Установить", command=self.set_breakpoints).pack(side=tk.LEFT, padx=2)
+        ttk.Button(debug_frame, text="Снять", command=self.clear_breakpoints).pack(side=tk.LEFT, padx=2)
+
+        # ===== ПРАВАЯ ПАНЕЛЬ =====
+        
+        # Верхняя часть: регистры и флаги
+        top_right = ttk.Frame(right_panel)
+        top_right.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # 1. Специальные регистры
+        special_frame = ttk.LabelFrame(top_right, text="Специальные регистры", padding=10)
+        special_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        self.acc_label = ttk.Label(special_frame, text="ACC: 0", font=("Courier New", 12, "bold"))
+        self.acc_label.pack(anchor=tk.W)
+        
+        self.pc_label = ttk.Label(special_frame, text="PC: 0", font=("Courier New", 12))
+        self.pc_label.pack(anchor=tk.W)
+        
+        self.ir_label = ttk.Label(special_frame, text="IR: 0x0000", font=("Courier New", 12))
+        self.ir_label.pack(anchor=tk.W)
+        
+        # 2. Регистры общего назначения
+        reg_frame = ttk.LabelFrame(top_right, text="Регистры общего назначения", padding=10)
+        reg_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        self.reg_labels = {}
+        reg_grid = ttk.Frame(reg_frame)
+        reg_grid.pack()
+        
+        for i in range(1, 5):
+            frame = ttk.Frame(reg_grid)
+            frame.pack(anchor=tk.W)
+            for j in range(2):
+                reg_num = i + (j * 4)
+                if reg_num <= 8:
+                    reg_name = f"R{reg_num}"
+                    label = ttk.Label(frame, text=f"{reg_name}: 0", font=("Courier New", 10), width=15, anchor=tk.W)
+                    label.pack(side=tk.LEFT, padx=5)
+                    self.reg_labels[reg_name] = label
+        
+        # 3. Флаги
+        flags_frame = ttk.LabelFrame(top_right, text="Флаги", padding=10)
+        flags_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        self.z_label = ttk.Label(flags_frame, text="Z (Zero): 0", font=("Courier New", 12))
+        self.z_label.pack(anchor=tk.W)
+        
+        self.n_label = ttk.Label(flags_frame, text="N (Negative): 0", font=("Courier New", 12))
+        self.n_label.pack(anchor=tk.W)
+        
+        # Нижняя часть: память
+        bottom_right = ttk.Frame(right_panel)
+        bottom_right.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # 4. Память команд (в окне только видимые строки)
+        code_mem_frame = ttk.LabelFrame(bottom_right, text="Память команд", padding=10)
+        code_mem_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        goto_frame = ttk.Frame(code_mem_frame)
+        goto_frame.pack(fill=tk.X)
+        self.code_goto_var = tk.StringVar()
+        ttk.Entry(goto_frame, textvariable=self.code_goto_var, width=7).pack(side=tk.LEFT, padx=2)
+        ttk.Button(goto_frame, text="Перейти", command=self.goto_code).pack(side=tk.LEFT, padx=2)
+        self.follow_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(goto_frame, text="За PC", variable=self.follow_var).pack(side=tk.LEFT, padx=2)
+        
+        self.code_view = MemoryView(code_mem_frame, self.code_line, len(self.cpu.code_memory), VIEW_ROWS)
+        self.code_view.pack(fill=tk.BOTH, expand=True)
+        self.code_view.tag_config("current", background="lightyellow")
+        self.code_view.tag_config("target", underline=True)
+        
+        # 5. Память данных
+        data_mem_frame = ttk.LabelFrame(bottom_right, text="Память данных", padding=10)
+        data_mem_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        goto_frame = ttk.Frame(data_mem_frame)
+        goto_frame.pack(fill=tk.X)
+        self.data_goto_var = tk.StringVar()
+        ttk.Entry(goto_frame, textvariable=self.data_goto_var, width=7).pack(side=tk.LEFT, padx=2)
+        ttk.Button(goto_frame, text="Перейти", command=self.goto_data).pack(side=tk.LEFT, padx=2)
+        
+        self.data_view = MemoryView(data_mem_frame, self.data_line, len(self.cpu.data_memory), VIEW_ROWS)
+        self.data_view.pack(fill=tk.BOTH, expand=True)
+        self.data_view.tag_config("recent", background="#ffe4c4")
+        self.data_view.tag_config("target", underline=True)
+        self.data_view.set_mark("recent", self.recent)
+        
+        # Статус бар
+        self.status_bar = ttk.Label(self.root, text="Готов к работе", relief=tk.SUNKEN, anchor=tk.W)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+    def update_display(self):
+        """Обновление отображения состояния процессора
+        
+        Перерисовываются только изменившиеся с прошлого вызова метки и
+        строки памяти; после загрузки или сброса - все целиком.
+        """
+        cpu = self.cpu
+        scalars, registers, cells = self.tracker.collect()
+        
+        if self.display_stale:
+            self.display_stale = False
+            scalars = set(ChangeTracker.SCALARS)
+            registers = range(1, len(cpu.registers))
+            self.recent.clear()
+            self.code_view.redraw()
+            self.data_view.redraw()
+            cells = ()
+        
+        # Специальные регистры
+        if "ACC" in scalars:
+            self.acc_label.config(text=f"ACC: {cpu.ACC}")
+        # Счетчики профиля рядом со строками памяти команд
+        if self.update_counts():
+            scalars.add("PC")
+        if "PC" in scalars:
+            self.pc_label.config(text=f"PC: {cpu.PC}")
+            self.highlight_pc()
+        if "IR" in scalars:
+            self.ir_label.config(text=f"IR: 0x{cpu.IR:04X}")
+        
+        # Регистры общего назначения
+        for reg in registers:
+            self.reg_labels[f"R{reg}"].config(text=f"R{reg}: {cpu.registers[reg]}")
+        
+        # Флаги
+        if "Z" in scalars:
+            self.z_label.config(text=f"Z (Zero): {cpu.Z}")
+        if "N" in scalars:
+            self.n_label.config(text=f"N (Negative): {cpu.N}")
+        
+        # Память данных: только измененные видимые строки и отметка
+        # недавних записей
+        self.recent.add(cells)
+        self.data_view.update_rows(cells)
+        self.data_view.set_mark("recent", self.recent)
+        
+        # Статус бар
+        status = "Выполнение..." if self.running else "Готов к работе"
+        if status != self.status_text:
+            self.status_text = status
+            self.status_bar.config(text=status)
+    
+    def disassemble_cached(self, instr):
+        """Дизассемблирование с кэшем по слову команды"""
+        asm = self.disasm_cache.get(instr)
+        if asm is None:
+            asm = self.disasm_cache[instr] = disassemble(instr)
+        return asm
+    
+    def code_line(self, addr):
+        """Строка памяти команд: адрес | машинный код | ассемблер | выполнений"""
+        instr = self.cpu.code_memory[addr]
+        text = f"{addr:03d}: 0x{instr:04X}  {self.disassemble_cached(instr)}"
+        count = self.shown_counts[addr] = self.profiler.counts[addr]
+        if count:
+            text = f"{text:<26}{count:>9}"
+        return text
+    
+    def data_line(self, addr):
+        """Строка памяти данных: адрес | значение"""
+        return f"{addr:03d}: {self.cpu.data_memory[addr]}"
+    
+    def update_counts(self):
+        """Обновление изменившихся видимых счетчиков профиля; True, если были"""
+        counts = self.profiler.counts
+        shown = self.shown_counts
+        changed = [addr for addr in self.code_view.visible() if counts[addr] != shown.get(addr)]
+        if not changed:
+            return False
+        self.code_view.update_rows(changed)
+        return True
+    
+    def highlight_pc(self):
+        """Подсветка текущей команды (и прокрутка к ней в режиме "За PC")"""
+        pc = self.cpu.PC
+        if self.follow_var.get() and 0 <= pc < self.code_view.size:
+            self.code_view.show(pc)
+        self.code_view.set_mark("current", (pc,))
+    
+    def goto_address(self, view, var):
+        """Прокрутка окна памяти к адресу из поля ввода"""
+        try:
+            addr = int(var.get(), 0)
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный адрес")
+            return
+        if not 0 <= addr < view.size:
+            messagebox.showerror("Ошибка", f"Адрес вне памяти (0..{view.size - 1})")
+            return
+        view.center(addr)
+        view.set_mark("target", (addr,))
+    
+    def goto_code(self):
+        """Переход к адресу в памяти команд (отключает режим "За PC")"""
+        self.follow_var.set(False)
+        self.goto_address(self.code_view, self.code_goto_var)
+    
+    def goto_data(self):
+        """Переход к адресу в памяти данных"""
+        self.goto_address(self.data_view, self.data_goto_var)
+    
+    def load_data_memory(self, data_str):
+        """Загрузка данных в память ("@путь" - из файла)"""
+        try:
+            if data_str.startswith("@"):
+                load_data_file(self.cpu, data_str[1:].strip())
+                return True
+            
+            numbers = list(map(int, data_str.split()))
+            
+            # Очистка памяти данных и загрузка данных
+            self.cpu.load_data(numbers)
+            
+            return True
+            
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Ошибка", f"Некорректные данные: {e}")
+            return False
+    
+    def choose_data_file(self):
+        """Выбор файла входных данных"""
+        patterns = " ".join(f"*{ext}" for ext in EXTENSIONS)
+        path = filedialog.askopenfilename(filetypes=[("Данные", patterns), ("Все файлы", "*")])
+        if path:
+            self.data_text.delete("1.0", tk.END)
+            self.data_text.insert("1.0", f"@{path}")
+    
+    def save_data_memory(self):
+        """Выгрузка памяти данных в файл (формат по расширению)"""
+        path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                            filetypes=[(ext, f"*{ext}") for ext in EXTENSIONS])
+        if path:
+            try:
+                dump_data_file(self.cpu, path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Ошибка", str(e))
+    
+    def save_registers(self):
+        """Выгрузка регистров и флагов в JSON"""
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if path:
+            try:
+                dump_registers(self.cpu, path)
+            except OSError as e:
+                messagebox.showerror("Ошибка", str(e))
+    
+    def assemble_program(self, asm_code):
+        """Ассемблирование программы из текста"""
+        result = assemble(asm_code)
+        if result.errors:
+            messagebox.showerror("Ошибка", result.format_errors(limit=10))
+            return []
+        return list(result.machine_code)
+    
+    def load_program(self):
+        """Загрузка программы из редактора"""
+        # Получение кода и данных
+        asm_code = self.code_text.get("1.0", tk.END)
+        data_str = self.data_text.get("1.0", tk.END).strip()
+        
+        # Сброс процессора
+        self.reset_cpu()
+        
+        # Загрузка данных в память
+        if not self.load_data_memory(data_str):
+            return
+        
+        # Ассемблирование программы
+        self.machine_code = self.assemble_program(asm_code)
+        
+        if not self.machine_code:
+            messagebox.showerror("Ошибка", "Ошибка ассемблирования программы")
+            return
+        
+        # Загрузка в память команд
+        self.cpu.load_code(self.machine_code)
+        
+        self.current_program = asm_code
+        self.update_display()
+        
+        # Показываем количество загруженных команд
+        non_zero = sum(1 for instr in self.machine_code if instr != 0)
+        messagebox.showinfo("Успех", f"Программа загружена в память.\nЗагружено {non_zero} команд.")
+    
+    def run_all(self):
+        """Выполнение всей программы
+        
+        Программа выполняется квантами, запланированными через after(),
+        поэтому окно остается отзывчивым, а дисплей обновляется не чаще
+        FRAME_INTERVAL.
+        """
+        if not self.machine_code or all(instr == 0 for instr in self.machine_code):
+            messagebox.showwarning("Предупреждение", "Сначала загрузите программу")
+            return
+        
+        if self.run_active:
+            return
+        
+        try:
+            self.max_steps = int(self.budget_var.get())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный лимит шагов")
+            return
+        
+        self.running = True
+        self.run_active = True
+        self.step_mode = False
+        self.run_steps = 0
+        self.run_stopped = False
+        
+        # Точка отсчета для заданной скорости
+        self.speed_base = (None, time.perf_counter(), 0)
+        self.last_render = 0.0
+        self.render_pending = False
+        
+        # Продолжение с точки останова не останавливается на ней же
+        self.debugger.resume()
+        # Наблюдатель записи детектора подключается только на время
+        # выполнения: иначе он отключает суперкоманды и у обычных запусков
+        if self.loop_var.get():
+            self.detector = LoopDetector(self.cpu)
+            self.detector.start()
+        
+        # Обновляем дисплей перед началом
+        self.update_display()
+        self.run_job = self.root.after(0, self.run_slice)
+    
+    def get_speed(self):
+        """Заданная скорость в шагах в секунду (None - максимальная)"""
+        value = self.speed_var.get()
+        return None if value == MAX_SPEED else int(value)
+    
+    def run_slice(self):
+        """Один квант непрерывного выполнения"""
+        self.run_job = None
+        if not self.run_active:
+            return
+        
+        cpu = self.cpu
+        speed = self.get_speed()
+        now = time.perf_counter()
+        
+        # При смене скорости отсчет начинается заново
+        base_speed, base_time, base_steps = self.speed_base
+        if speed != base_speed:
+            self.speed_base = base_speed, base_time, base_steps = speed, now, self.run_steps
+        
+        if speed is None:
+            allowed = self.max_steps - self.run_steps
+            deadline = now + SLICE_TIME
+        else:
+            # Сколько шагов положено выполнить к этому моменту
+            allowed = base_steps + int((now - base_time) * speed) + 1 - self.run_steps
+            deadline = None
+        allowed = min(allowed, self.max_steps - self.run_steps)
+        
+        finished = False
+        while allowed > 0:
+            done = self.execute_steps(min(allowed, SLICE_CHUNK))
+            self.run_steps += done
+            allowed -= done
+            self.render_pending = self.render_pending or done > 0
+            if cpu.halt_reason != "max_steps":
+                finished = True
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        
+        if self.run_steps >= self.max_steps:
+            finished = True
+        
+        if finished:
+            self.finish_run()
+            return
+        
+        now = time.perf_counter()
+        if self.render_pending and now - self.last_render >= FRAME_INTERVAL:
+            self.update_display()
+            self.last_render = now
+            self.render_pending = False
+        
+        # Следующий квант: сразу на максимальной скорости, иначе к следующему шагу
+        delay = 1 if speed is None else min(int(FRAME_INTERVAL * 1000), max(1, 1000 // speed))
+        self.run_job = self.root.after(delay, self.run_slice)
+    
+    def cancel_run(self):
+        """Прекращение непрерывного выполнения без сообщений"""
+        if self.run_job is not None:
+            self.root.after_cancel(self.run_job)
+            self.run_job = None
+        self.run_active = False
+        self.journal.detach()
+        if self.detector is not None:
+            self.detector.detach()
+            self.loop_message = self.detector.describe()
+            self.detector = None
+    
+    def stop(self):
+        """Остановка непрерывного выполнения по кнопке"""
+        if not self.run_active:
+            return
+        self.run_stopped = True
+        self.finish_run()
+    
+    def finish_run(self):
+        """Завершение непрерывного выполнения и вывод результата"""
+        self.cancel_run()
+        self.running = False
+        self.update_display()
+        
+        steps = self.run_steps
+        if self.run_stopped:
+            self.status_bar.config(text=f"Остановлено после {steps} шагов. PC={self.cpu.PC}")
+        elif self.cpu.halt_reason in ("break", "watch"):
+            self.status_bar.config(text=f"{self.debugger.describe_hit()}. Выполнено {steps} шагов")
+        elif self.cpu.halt_reason == "loop":
+            messagebox.showwarning("Предупреждение",
+                                 f"{self.loop_message}.\n"
+                                 f"Выполнено {steps} шагов")
+        elif self.cpu.halt_reason == "max_steps":
+            messagebox.showwarning("Предупреждение", 
+                                 f"Превышено максимальное количество шагов ({self.max_steps})\n"
+                                 f"Возможен бесконечный цикл. PC={self.cpu.PC}")
+        else:
+            messagebox.showinfo("Завершено", 
+                              f"Выполнение программы завершено за {steps} шагов.\n"
+                              f"Результат в ACC: {self.cpu.ACC}")
+    
+    def step(self):
+        """Пошаговое выполнение"""
+        if not self.machine_code or all(instr == 0 for instr in self.machine_code):
+            messagebox.showwarning("Предупреждение", "Сначала загрузите программу")
+            return
+        
+        if self.run_active:
+            return
+        
+        self.running = True
+        
+        self.debugger.resume()
+        result = self.execute_step()
+        self.update_display()
+        
+        if not result and self.cpu.halt_reason == "watch":
+            self.status_bar.config(text=self.debugger.describe_hit())
+            return
+        
+        # Проверка на HALT или конец программы
+        if not result or self.cpu.IR == 0xF:
+            self.running = False
+            messagebox.showinfo("Завершено", f"Программа завершена.\nРезультат в ACC: {self.cpu.ACC}")
+    
+    def execute_step(self):
+        """Выполнение одной команды (с профилем, если включен, иначе с журналом)"""
+        if self.profile_var.get():
+            # Шаги мимо журнала делают его записи неверными
+            self.journal.clear()
+            return self.profiler.step()
+        # Наблюдатель записи журнала подключен только на время шага
+        try:
+            return self.journal.step()
+        finally:
+            self.journal.detach()
+    
+    def execute_steps(self, max_steps):
+        """Выполнение не более max_steps команд (с профилем, поиском
+        зацикливания или журналом)"""
+        if self.profile_var.get():
+            self.journal.clear()
+            return self.profiler.run(max_steps)
+        if self.detector is not None:
+            self.journal.clear()
+            return self.detector.run(max_steps)
+        if self.journal_var.get():
+            return self.journal.run(max_steps)
+        self.journal.clear()
+        return self.cpu.run(max_steps)
+    
+    def show_profile(self):
+        """Окно с отчетом профилировщика"""
+        if not self.profiler.total:
+            messagebox.showinfo("Профиль", "Нет данных профиля.\nВключите \"Профиль\" и выполните программу.")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Профиль выполнения")
+        text = scrolledtext.ScrolledText(window, width=80, height=40, font=("Courier New", 9))
+        text.pack(fill=tk.BOTH, expand=True)
+        text.insert(tk.END, self.profiler.report(top=10))
+        text.config(state=tk.DISABLED)
+    
+    def set_breakpoints(self):
+        """Установка точек останова и наблюдения из полей ввода"""
+        try:
+            addresses = [int(item) for item in self.break_var.get().replace(",", " ").split()]
+            condition = self.condition_var.get().strip() or None
+            if condition and not addresses:
+                raise ValueError("Для условия укажите адреса команд")
+            cells, registers = parse_watch(self.watch_var.get())
+            self.debugger.clear()
+            for pc in addresses:
+                self.debugger.add_breakpoint(pc, condition)
+            self.debugger.watch(cells, registers)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self.status_bar.config(text=f"Точек останова: {len(self.debugger.breakpoints)}, "
+                                    f"наблюдений: {len(cells) + len(registers)}")
+    
+    def clear_breakpoints(self):
+        """Снятие всех точек останова и наблюдения"""
+        self.debugger.clear()
+        self.status_bar.config(text="Точки останова сняты")
+    
+    def step_back(self):
+        """Отмена последнего шага по журналу"""
+        if self.run_active:
+            return
+        if not self.journal.back():
+            messagebox.showwarning("Предупреждение", "Журнал шагов пуст")
+            return
+        self.update_display()
+        self.status_bar.config(text=f"Шаг назад. PC={self.cpu.PC}, в журнале {len(self.journal)} шагов")
+    
+    def run_back(self):
+        """Обратное выполнение до заданного адреса команды"""
+        if self.run_active:
+            return
+        try:
+            pc = int(self.back_pc_var.get())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный адрес")
+            return
+        if not len(self.journal):
+            messagebox.showwarning("Предупреждение", "Журнал шагов пуст")
+            return
+        
+        undone = self.journal.back_to(pc)
+        self.update_display()
+        if self.cpu.PC == pc:
+            self.status_bar.config(text=f"Отменено {undone} шагов. PC={pc}")
+        else:
+            self.status_bar.config(text=f"Адрес {pc} не найден в журнале, отменено {undone} шагов. "
+                                        f"PC={self.cpu.PC}")
+    
+    def reset(self):
+        """Сброс эмулятора"""
+        self.reset_cpu()
+        self.update_display()
+        messagebox.showinfo("Сброс", "Эмулятор сброшен в начальное состояние")
+
+    def load_sum_example(self):
+        """Загрузка примера программы для суммы массива"""
+        # Программа для суммы массива
+        sum_code = """START:
+    LOAD #0
+    STORE R1     ; R1 = сумма
+
+    LOAD 0       ; ACC = размер массива
+    STORE R2     ; R2 = счетчик
+
+    LOAD #1
+    STORE R3     ; R3 = индекс массива
+
+LOOP:
+    LOAD R2      ; ACC = счетчик
+    CMP #0       ; Сравнить с 0
+    JZ END       ; Если счетчик == 0, закончить
+
+    LOAD [R3]    ; ACC = элемент массива
+    ADD R1       ; ACC = ACC + сумма
+    STORE R1     ; R1 = новая сумма
+
+    INC R3       ; Следующий элемент
+    DEC R2       ; Уменьшить счетчик
+    JMP LOOP     ; Повторить цикл
+
+END:
+    LOAD R1      ; ACC = результат
+    HALT"""
+        
+        # Данные для суммы: размер 10, затем 10 элементов
+        sum_data = """10 1 2 3 4 5 6 7 8 9 10"""
+        
+        self.code_text.delete("1.0", tk.END)
+        self.code_text.insert("1.0", sum_code)
+        
+        self.data_text.delete("1.0", tk.END)
+        self.data_text.insert("1.0", sum_data)
+        
+        messagebox.showinfo("Пример загружен", "Загружен пример программы для суммы элементов массива")
+    
+    def load_convolution_example(self):
+        """Загрузка примера программы для свертки"""
+        # Программа для свертки двух массивов
+        conv_code = """START:
+    LOAD #0
+    STORE R1     ; R1 = результат
+
+    LOAD 0       ; ACC = размер массивов
+    STORE R2     ; R2 = счетчик
+
+    LOAD #1
+    STORE R3     ; R3 = индекс массива A
+    
+    LOAD R2
+    ADD #1
+    STORE R4     ; R4 = индекс массива B
+
+LOOP:
+    LOAD R2      ; ACC = счетчик
+    CMP #0       ; Сравнить с 0
+    JZ END       ; Если счетчик == 0, закончить
+
+    LOAD [R3]    ; Загрузка A[i]
+    MUL [R4]     ; Умножение на B[i]
+    ADD R1       ; Прибавление к итоговой сумме
+    STORE R1     ; Обновляем результат
+
+    INC R3
+    INC R4
+    DEC R2
+    JMP LOOP
+
+END:
+    LOAD R1      ; ACC = результат
+    HALT"""
+        
+        # Данные для свертки: размер 10, затем два массива по 10 элементов
+        conv_data = """10 1 2 3 4 5 6 7 8 9 10 10 -9 8 -7 6 -5 4 -3 2 -1"""
+        
+        self.code_text.delete("1.0", tk.END)
+        self.code_text.insert("1.0", conv_code)
+        
+        self.data_text.delete("1.0", tk.END)
+        self.data_text.insert("1.0", conv_data)
+        
+        messagebox.showinfo("Пример загружен", "Загружен пример программы для свертки двух массивов")
+    
+def main():
+    root = tk.Tk()
+    app = Emulator(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,351 @@
+"""Потактовая модель процессора cpu.v
+
+Модель повторяет автомат Fetch/Decode/Execute из cpu.v: каждая команда
+занимает три такта (HALT тоже), выборка за пределами памяти команд
+останавливает процессор за один такт. В отличие от ``CPU`` сохранены
+все особенности Verilog-описания:
+
+- ACC, регистры и ячейки памяти 16-битные (перенос отбрасывается);
+- непосредственный операнд не расширяется по знаку (IR[9:0]);
+- декодируются только R1-R4 по битам IR[2:0], остальные регистры
+  читаются как 0 (кроме INC/DEC [Rx], где 000 означает R8);
+- флаги выставляет только CMP, причем N берется из sub_result
+  предыдущей команды (неблокирующее присваивание);
+- SUB и MUL записывают в ACC результат, вычисленный предыдущей
+  командой SUB/CMP или MUL (по той же причине);
+- чтение за пределами памяти данных дает 0 (в симуляторе - X),
+  запись туда игнорируется.
+
+Образ памяти команд для ``$readmemb`` (как sum_program.mem) строится
+из результата ``assemble_program`` или из готового образа программы
+(image.py, .emi).
+
+Использование::
+
+    python hardware.py run sum.asm --data "10 1 2 3 4 5 6 7 8 9 10"
+    python hardware.py export sum.asm -o sum_program.mem
+    python hardware.py export sum.emi -o sum_program.mem
+"""
+
+import argparse
+import sys
+
+from assembler import assemble, disassemble
+from image import is_image, load_image
+from cpu import (
+    OP_HALT, OP_LOAD, OP_STORE, OP_ADD, OP_SUB, OP_MUL, OP_CMP,
+    OP_JMP, OP_JZ, OP_JN, OP_INC, OP_DEC, OP_EXT,
+    ADDR_IMMEDIATE, ADDR_DIRECT, ADDR_REGISTER, ADDR_INDIRECT,
+)
+
+# Стадии автомата
+STAGE_FETCH, STAGE_DECODE, STAGE_EXECUTE = 0, 1, 2
+STAGE_NAMES = ("FETCH", "DECODE", "EXECUTE")
+
+# Размеры памятей и разрядность cpu.v
+MEMORY_SIZE = 256
+WORD_MASK = 0xFFFF
+
+# Период тактового сигнала испытательного стенда sum_test.v (always #1), нс
+CLOCK_PERIOD_NS = 2.0
+
+DEFAULT_MAX_CLOCKS = 3000000
+
+
+def to_signed(value):
+    """16-битное слово как знаковое число"""
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class HardwareModel:
+    """Потактовая модель cpu.v
+
+    Значения хранятся как беззнаковые 16-битные слова (как в регистрах
+    Verilog); ``to_signed`` переводит их в знаковые.
+    """
+
+    def __init__(self):
+        self.code_memory = [0] * MEMORY_SIZE
+        self.data_memory = [0] * MEMORY_SIZE
+        self.registers = [0] * 9  # registers[1..8] = R1..R8
+        self.reset()
+
+    def reset(self):
+        """Начальное состояние (блоки initial в cpu.v); память не очищается"""
+        self.ACC = 0
+        self.PC = 0
+        self.IR = 0
+        self.Z = 0
+        self.N = 0
+        self.registers[:] = [0] * 9
+        self.stage = STAGE_FETCH
+        self.halted = False
+        self.halt_reason = None
+        self.operand_value = 0
+        self.addr_type = 0
+        self.ir_operand = 0
+        self.add_result = 0
+        self.sub_result = 0
+        self.mul_result = 0
+        self.clocks = 0
+        self.instructions = 0
+
+    def load_code(self, machine_code):
+        """Загрузка машинного кода с адреса 0 (остаток обнуляется)"""
+        code = [w & WORD_MASK for w in machine_code[:MEMORY_SIZE]]
+        self.code_memory[:] = code + [0] * (MEMORY_SIZE - len(code))
+
+    def load_data(self, values):
+        """Загрузка данных с адреса 0; значения усекаются до 16 бит"""
+        data = [v & WORD_MASK for v in values[:MEMORY_SIZE]]
+        self.data_memory[:] = data + [0] * (MEMORY_SIZE - len(data))
+
+    # ----- стадии -----
+
+    def _read(self, addr):
+        return self.data_memory[addr] if addr < MEMORY_SIZE else 0
+
+    def _write(self, addr, value):
+        if addr < MEMORY_SIZE:
+            self.data_memory[addr] = value & WORD_MASK
+
+    def _fetch(self):
+        if self.PC < MEMORY_SIZE:
+            self.IR = self.code_memory[self.PC]
+            self.stage = STAGE_DECODE
+        else:
+            self.halted = True
+            self.halt_reason = "end"
+
+    def _decode(self):
+        ir = self.IR
+        addr_type = (ir >> 10) & 0x3
+        self.addr_type = addr_type
+        self.ir_operand = ir & 0x3FF
+        reg = ir & 0x7
+        if addr_type == ADDR_IMMEDIATE:
+            self.operand_value = ir & 0x3FF
+        elif addr_type == ADDR_DIRECT:
+            self.operand_value = self._read(ir & 0x3FF)
+        elif addr_type == ADDR_REGISTER:
+            self.operand_value = self.registers[reg] if 1 <= reg <= 4 else 0
+        else:
+            self.operand_value = self._read(self.registers[reg]) if 1 <= reg <= 4 else 0
+        self.stage = STAGE_EXECUTE
+
+    def _execute(self):
+        opcode = (self.IR >> 12) & 0xF
+        acc = self.ACC
+        value = self.operand_value
+        addr_type = self.addr_type
+        operand = self.ir_operand
+        regs = self.registers
+        reg = operand & 0x7
+        next_pc = (self.PC + 1) & WORD_MASK
+        self.stage = STAGE_FETCH
+        self.instructions += 1
+
+        if opcode == OP_HALT:
+            self.halted = True
+            self.halt_reason = "halt"
+            return
+        elif opcode == OP_LOAD:
+            self.ACC = value
+        elif opcode == OP_STORE:
+            if addr_type == ADDR_DIRECT:
+                self._write(operand, acc)
+            elif addr_type == ADDR_REGISTER:
+                if 1 <= reg <= 4:
+                    regs[reg] = acc
+            elif addr_type == ADDR_INDIRECT:
+                if 1 <= reg <= 4:
+                    self._write(regs[reg], acc)
+        elif opcode == OP_ADD:
+            self.add_result = self.ACC = (acc + value) & WORD_MASK
+        elif opcode == OP_SUB:
+            # Неблокирующее присваивание: в ACC попадает прошлый sub_result
+            self.ACC = self.sub_result
+            self.sub_result = (acc - value) & WORD_MASK
+        elif opcode == OP_MUL:
+            self.ACC = self.mul_result
+            self.mul_result = (acc * value) & WORD_MASK
+        elif opcode == OP_CMP:
+            self.Z = 1 if acc == value else 0
+            self.N = self.sub_result >> 15
+            self.sub_result = (acc - value) & WORD_MASK
+        elif opcode == OP_JMP:
+            next_pc = value
+        elif opcode == OP_JZ:
+            if self.Z:
+                next_pc = value
+        elif opcode == OP_JN:
+            if self.N:
+                next_pc = value
+        elif opcode in (OP_INC, OP_DEC):
+            delta = 1 if opcode == OP_INC else -1
+            if addr_type == ADDR_DIRECT:
+                self._write(operand, self._read(operand) + delta)
+            elif addr_type == ADDR_REGISTER:
+                if 1 <= reg <= 4:
+                    regs[reg] = (regs[reg] + delta) & WORD_MASK
+            elif addr_type == ADDR_INDIRECT:
+                addr = regs[reg or 8]
+                self._write(addr, self._read(addr) + delta)
+        self.PC = next_pc
+
+    _STAGES = (_fetch, _decode, _execute)
+
+    def clock(self):
+        """Один такт; False, если процессор уже остановлен"""
+        if self.halted:
+            return False
+        self._STAGES[self.stage](self)
+        self.clocks += 1
+        return True
+
+    def step(self):
+        """Тактирование до завершения текущей команды; возвращает число тактов"""
+        start = self.clocks
+        while self.clock() and self.stage != STAGE_FETCH:
+            pass
+        return self.clocks - start
+
+    def run(self, max_clocks=DEFAULT_MAX_CLOCKS):
+        """Тактирование до останова, но не более max_clocks тактов
+
+        Возвращает число выполненных тактов; причина останова - в
+        ``halt_reason`` ("halt", "end" или "max_clocks").
+        """
+        start = self.clocks
+        limit = start + max_clocks
+        fetch, decode, execute = self._fetch, self._decode, self._execute
+        while not self.halted:
+            if self.clocks + 3 <= limit and self.stage == STAGE_FETCH:
+                # Команда целиком: три такта подряд
+                fetch()
+                if self.halted:
+                    self.clocks += 1
+                    break
+                decode()
+                execute()
+                self.clocks += 3
+            elif self.clocks < limit:
+                self.clock()
+            else:
+                self.halt_reason = "max_clocks"
+                break
+        return self.clocks - start
+
+    def run_time_ns(self, period_ns=CLOCK_PERIOD_NS):
+        """Время выполнения на аппаратуре при заданном периоде такта"""
+        return self.clocks * period_ns
+
+
+def compatibility_issues(machine_code):
+    """Места программы, которые cpu.v выполнит иначе, чем ``CPU``
+
+    Возвращает список (адрес, описание).
+    """
+    issues = []
+    for addr, word in enumerate(machine_code):
+        opcode = (word >> 12) & 0xF
+        addr_type = (word >> 10) & 0x3
+        operand = word & 0x3FF
+        if addr >= MEMORY_SIZE:
+            issues.append((addr, "за пределами 256 слов памяти команд"))
+            break
+        if word == 0 or opcode == OP_HALT:
+            continue
+        if opcode == OP_EXT:
+            issues.append((addr, "префикс EXT не поддерживается"))
+        elif opcode in (OP_LOAD, OP_ADD):
+            pass
+        elif opcode in (OP_SUB, OP_MUL):
+            issues.append((addr, "SUB/MUL записывают в ACC результат предыдущей операции"))
+        elif opcode == OP_JN:
+            issues.append((addr, "флаг N берется из результата SUB/CMP перед последней CMP"))
+        elif opcode == OP_JZ and (addr == 0 or machine_code[addr - 1] >> 12 != OP_CMP):
+            issues.append((addr, "флаги выставляет только CMP, а не LOAD/ADD/SUB/MUL"))
+        if addr_type == ADDR_IMMEDIATE and operand & 0x200 and opcode not in (OP_JMP, OP_JZ, OP_JN):
+            issues.append((addr, f"непосредственный операнд не расширяется по знаку "
+                                 f"({operand - 0x400} станет {operand})"))
+        if addr_type in (ADDR_REGISTER, ADDR_INDIRECT) and not 1 <= operand <= 4:
+            issues.append((addr, f"регистр {operand} не декодируется (только R1-R4)"))
+        if addr_type == ADDR_DIRECT and operand >= MEMORY_SIZE:
+            issues.append((addr, f"адрес {operand} за пределами 256 слов памяти данных"))
+    return issues
+
+
+def format_mem(words, comments=True):
+    """Текст образа памяти для $readmemb: 16 двоичных разрядов на строку"""
+    lines = []
+    for word in words:
+        line = format(word & WORD_MASK, "016b")
+        if comments:
+            line += f"  // {disassemble(word & WORD_MASK)}"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def export_mem(machine_code, path, comments=True):
+    """Запись образа памяти команд в файл (как sum_program.mem)"""
+    if len(machine_code) > MEMORY_SIZE:
+        raise ValueError(f"Программа длиннее {MEMORY_SIZE} слов памяти команд cpu.v")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(format_mem(machine_code, comments))
+
+
+def _assemble_file(path):
+    if is_image(path):
+        try:
+            return list(load_image(path).code)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return None
+    with open(path, encoding="utf-8") as f:
+        result = assemble(f.read())
+    if result.errors:
+        print(result.format_errors(), file=sys.stderr)
+        return None
+    return list(result.machine_code)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потактовая модель cpu.v")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="выполнение программы на модели")
+    run.add_argument("program", help="файл программы на ассемблере или образ .emi")
+    run.add_argument("--data", default="", help="входные данные (числа через пробел)")
+    run.add_argument("--max-clocks", type=int, default=DEFAULT_MAX_CLOCKS)
+    run.add_argument("--period-ns", type=float, default=CLOCK_PERIOD_NS,
+                     help="период тактового сигнала, нс")
+    export = commands.add_parser("export", help="образ памяти команд для $readmemb")
+    export.add_argument("program", help="файл программы на ассемблере или образ .emi")
+    export.add_argument("-o", "--output", required=True, help="файл .mem")
+    export.add_argument("--no-comments", action="store_true",
+                        help="без дизассемблирования в комментариях")
+    args = parser.parse_args(argv)
+
+    machine_code = _assemble_file(args.program)
+    if machine_code is None:
+        return 1
+    for addr, issue in compatibility_issues(machine_code):
+        print(f"Предупреждение: {addr:03d}: {issue}", file=sys.stderr)
+
+    if args.command == "export":
+        export_mem(machine_code, args.output, comments=not args.no_comments)
+        return 0
+
+    model = HardwareModel()
+    model.load_code(machine_code)
+    model.load_data(list(map(int, args.data.split())))
+    model.run(args.max_clocks)
+    regs = " ".join(f"R{i}={to_signed(model.registers[i])}" for i in range(1, 5))
+    print(f"Останов: {model.halt_reason}, команд: {model.instructions}, тактов: {model.clocks}")
+    print(f"ACC = {to_signed(model.ACC)} (0x{model.ACC:04X}), {regs}")
+    print(f"Время при периоде {args.period_ns} нс: {model.run_time_ns(args.period_ns):.0f} нс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Распознавание счетных циклов-редукций и их выполнение через NumPy
+
+Цикл вида (как в sum.asm и convolution.asm)::
+
+    LOOP: LOAD Rc           ; или проверка в конце тела:
+          CMP #0            ;   тело; LOAD Rc; CMP #0; JZ END; JMP LOOP
+          JZ END
+          LOAD [Ra]
+          MUL [Rb]          ; необязательно (скалярное произведение)
+          ADD Rs
+          STORE Rs
+          INC Ra            ; в любом порядке
+          INC Rb
+          DEC Rc
+          JMP LOOP
+
+за один вызов проходит столько полных оборотов (от LOOP до LOOP),
+сколько позволяют счетчик, границы памяти и бюджет шагов: сумма или
+скалярное произведение считаются ``numpy.sum``/``numpy.dot`` по
+представлению памяти данных (``numpy.frombuffer``), а регистры, ACC, флаги, IR и число шагов
+выставляются такими же, как после пошагового выполнения. Последний
+оборот с выходом из цикла выполняется обычным образом.
+
+Если NumPy не установлен, циклы не распознаются.
+"""
+
+from cpu import (
+    OP_LOAD, OP_STORE, OP_ADD, OP_MUL, OP_CMP, OP_JMP, OP_JZ, OP_INC, OP_DEC,
+    ADDR_IMMEDIATE, ADDR_REGISTER, ADDR_INDIRECT, NUM_REGISTERS,
+)
+
+# NumPy импортируется при первом найденном цикле: его загрузка дольше
+# запуска всего эмулятора, а программам без редукций он не нужен
+np = None
+_numpy_missing = False
+
+# Наибольшая сумма, которая гарантированно помещается в int64
+_INT64_LIMIT = 1 << 62
+
+
+def _load_numpy():
+    """True, если NumPy доступен"""
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+        except ImportError:  # NumPy не установлен
+            _numpy_missing = True
+        else:
+            np = numpy
+    return np is not None
+
+
+def _magnitude(values):
+    """Наибольшее абсолютное значение массива (целое Python)
+
+    ``np.abs`` для INT64_MIN переполняется и дает отрицательное число.
+    """
+    return max(-int(values.min()), int(values.max()))
+
+
+class Reduction:
+    """Распознанный цикл-редукция
+
+    header - адрес начала оборота, length - команд в обороте, jump -
+    адрес замыкающего JMP, a/b/counter/total - номера регистров (b -
+    None для суммы), top_test - проверка счетчика в начале оборота.
+    """
+
+    __slots__ = ("header", "length", "jump", "a", "b", "counter", "total", "top_test",
+                 "jump_word", "fallback")
+
+    def __init__(self, header, jump, a, b, counter, total, top_test, jump_word):
+        self.header = header
+        self.jump = jump
+        self.length = jump - header + 1
+        self.a = a
+        self.b = b
+        self.counter = counter
+        self.total = total
+        self.top_test = top_test
+        self.jump_word = jump_word
+        self.fallback = None  # Запись таблицы суперкоманд для начала оборота
+
+    def cycles(self, cpu, max_steps):
+        """Число полных оборотов, которые можно выполнить сразу"""
+        regs = cpu.registers
+        count = regs[self.counter]
+        # Оборот возвращается к началу, пока счетчик после DEC не нулевой
+        cycles = count if self.top_test else count - 1
+        cycles = min(cycles, max_steps // self.length)
+        size = len(cpu.data_memory)
+        for reg in (self.a, self.b):
+            if reg is not None:
+                start = regs[reg]
+                if not 0 <= start < size:
+                    return 0
+                cycles = min(cycles, size - start)
+        return max(cycles, 0)
+
+    def execute(self, cpu, max_steps):
+        """Выполнение полных оборотов; возвращает число шагов (0 - не выполнялось)"""
+        cycles = self.cycles(cpu, max_steps)
+        if cycles <= 0:
+            return 0
+        regs = cpu.registers
+        memory = np.frombuffer(cpu.data_memory, dtype=cpu.data_memory.typecode)
+        a = memory[regs[self.a]:regs[self.a] + cycles].astype(np.int64)
+        if self.b is None:
+            b = None
+            bound = _magnitude(a) * cycles
+        else:
+            b = memory[regs[self.b]:regs[self.b] + cycles].astype(np.int64)
+            bound = _magnitude(a) * _magnitude(b) * cycles
+        if bound >= _INT64_LIMIT:
+            # Сумма может не поместиться в int64: точные целые Python
+            if b is None:
+                value = sum(a.tolist())
+            else:
+                value = sum(x * y for x, y in zip(a.tolist(), b.tolist()))
+        elif b is None:
+            value = int(a.sum())
+        else:
+            value = int(np.dot(a, b))
+
+        total = regs[self.total] = regs[self.total] + value
+        regs[self.a] += cycles
+        if self.b is not None:
+            regs[self.b] += cycles
+        counter = regs[self.counter] = regs[self.counter] - cycles
+
+        # ACC и флаги - от последней команды оборота, которая их меняет
+        acc = counter if not self.top_test else total
+        cpu.ACC = acc
+        cpu.Z = 1 if acc == 0 else 0
+        cpu.N = 1 if acc < 0 else 0
+        cpu.IR = self.jump_word
+        return cycles * self.length
+
+
+def _is(entry, opcode, addr_type):
+    return entry[0] == opcode and entry[1] == addr_type and 1 <= entry[2] <= NUM_REGISTERS
+
+
+def _match_test(seq):
+    """Проверка счетчика: (регистр, длина, адрес выхода) или None"""
+    if len(seq) < 2 or not _is(seq[0], OP_LOAD, ADDR_REGISTER):
+        return None
+    i = 1
+    if seq[1] == (OP_CMP, ADDR_IMMEDIATE, 0):
+        i = 2
+    if i < len(seq) and seq[i][0] == OP_JZ and seq[i][1] == ADDR_IMMEDIATE:
+        return seq[0][2], i + 1, seq[i][2]
+    return None
+
+
+def _match_body(seq):
+    """Тело: (a, b, total, counter, длина) или None"""
+    if len(seq) < 4 or not _is(seq[0], OP_LOAD, ADDR_INDIRECT):
+        return None
+    a = seq[0][2]
+    i = 1
+    b = None
+    if _is(seq[1], OP_MUL, ADDR_INDIRECT):
+        b = seq[1][2]
+        i = 2
+    if i + 1 >= len(seq) or not _is(seq[i], OP_ADD, ADDR_REGISTER):
+        return None
+    total = seq[i][2]
+    if seq[i + 1] != (OP_STORE, ADDR_REGISTER, total):
+        return None
+    i += 2
+    updates = {}
+    while i < len(seq) and seq[i][0] in (OP_INC, OP_DEC) and seq[i][1] == ADDR_REGISTER:
+        updates[seq[i][2]] = updates.get(seq[i][2], 0) + (1 if seq[i][0] == OP_INC else -1)
+        i += 1
+    counters = [reg for reg, delta in updates.items() if delta == -1]
+    expected = {a: 1} if b is None else {a: 1, b: 1}
+    if len(counters) != 1 or len(updates) != len(expected) + 1:
+        return None
+    counter = counters[0]
+    expected[counter] = -1
+    if updates != expected or len({a, b, total, counter} - {None}) != 3 + (b is not None):
+        return None
+    return a, b, total, counter, i
+
+
+def find_reductions(program, code):
+    """Циклы-редукции программы: словарь адрес начала оборота -> Reduction
+
+    program - результат ``decode_program``, code - память команд.
+    """
+    found = {}
+    for jump, (opcode, addr_type, header) in enumerate(program):
+        if opcode != OP_JMP or addr_type != ADDR_IMMEDIATE or not 0 <= header < jump:
+            continue
+        seq = program[header:jump]
+        # Проверка в начале: LOAD Rc; [CMP #0]; JZ выход; тело
+        test = _match_test(seq)
+        if test is not None:
+            body = _match_body(seq[test[1]:])
+            top_test = True
+            if body is not None and body[4] != len(seq) - test[1]:
+                body = None
+        else:
+            # Проверка в конце: тело; LOAD Rc; [CMP #0]; JZ выход
+            body = _match_body(seq)
+            top_test = False
+            if body is not None:
+                test = _match_test(seq[body[4]:])
+                if test is None or body[4] + test[1] != len(seq):
+                    body = None
+        if body is None:
+            continue
+        counter, _, exit_addr = test
+        a, b, total, body_counter, _ = body
+        if counter != body_counter or header <= exit_addr <= jump:
+            continue
+        found[header] = Reduction(header, jump, a, b, counter, total, top_test, code[jump])
+    if found and not _load_numpy():
+        return {}
+    return found
@@ -0,0 +1,239 @@
+"""Образ программы: готовый к загрузке двоичный файл (.emi)
+
+Образ хранит все, что получается при ассемблировании, поэтому загрузка
+не требует исходного текста и ассемблера:
+
+- слова памяти команд;
+- начальный образ памяти данных;
+- таблицу меток (имя -> адрес);
+- необязательно - начала базовых блоков (``translator.find_leaders``).
+
+Формат (little-endian)::
+
+    заголовок  "EMUI", версия u16, ширина ячейки данных u16 (4 или 8),
+               число слов команд, ячеек данных, блоков и меток (u32)
+    команды    u16 * n, выравнивание до 8 байт
+    данные     i32 или i64 * n
+    блоки      u32 * n
+    метки      адреса u32 * n, затем имена в UTF-8 через "\\n" до конца файла
+
+Файл отображается в память (mmap), и каждый раздел копируется в свой
+буфер array одним копированием байтов.
+
+Использование::
+
+    python image.py build sum.asm -o sum.emi --data "10 1 2 3 4 5 6 7 8 9 10"
+    python image.py show sum.emi
+    python image.py export sum.emi -o sum_program.mem
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+
+from cpu import CODE_TYPE, decode_program
+
+IMAGE_EXTENSION = ".emi"
+MAGIC = b"EMUI"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIIII")
+_DATA_TYPES = {4: "i", 8: "q"}  # Ширина ячейки данных -> код типа array
+_LITTLE = sys.byteorder == "little"
+
+
+def is_image(path):
+    """Является ли файл образом программы (по расширению)"""
+    return str(path).lower().endswith(IMAGE_EXTENSION)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class ProgramImage:
+    """Образ программы
+
+    code - array слов команд, data - array начальных значений памяти
+    данных (остаток памяти при загрузке обнуляется), symbols - таблица
+    меток, blocks - список начал базовых блоков или None.
+    """
+
+    __slots__ = ("code", "data", "symbols", "blocks")
+
+    def __init__(self, code, data=(), symbols=None, blocks=None):
+        self.code = array(CODE_TYPE, code)
+        data = list(data)
+        try:
+            self.data = array("i", data)
+        except OverflowError:
+            self.data = array("q", data)
+        self.symbols = dict(symbols or {})
+        self.blocks = None if blocks is None else list(blocks)
+
+    def load_into(self, cpu):
+        """Загрузка команд и данных в процессор (без ассемблирования)"""
+        cpu.load_code(self.code)
+        cpu.load_data(self.data)
+
+    def to_bytes(self):
+        blocks = array("I", self.blocks or ())
+        addrs = array("I", self.symbols.values())
+        parts = [_HEADER.pack(MAGIC, VERSION, self.data.itemsize, len(self.code),
+                              len(self.data), len(blocks), len(addrs))]
+        sections = [self.code, self.data, blocks, addrs]
+        if not _LITTLE:
+            sections = [array(section.typecode, section) for section in sections]
+            for section in sections:
+                section.byteswap()
+        code, data, blocks, addrs = sections
+        parts.append(code.tobytes())
+        offset = _HEADER.size + len(parts[-1])
+        parts.append(bytes(_align(offset) - offset))
+        parts.append(data.tobytes())
+        parts.append(blocks.tobytes())
+        parts.append(addrs.tobytes())
+        parts.append("\n".join(self.symbols).encode("utf-8"))
+        return b"".join(parts)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+def build_image(machine_code, symbols=None, data=(), blocks=True):
+    """Образ из машинного кода; blocks - сохранить начала базовых блоков"""
+    leaders = None
+    if blocks:
+        from translator import find_leaders
+        leaders = find_leaders(decode_program(machine_code))
+    return ProgramImage(machine_code, data, symbols, leaders)
+
+
+def _section(buffer, offset, typecode, count, path):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(buffer):
+        raise ValueError(f"Образ '{path}' обрезан")
+    values.frombytes(buffer[offset:end])
+    if not _LITTLE:
+        values.byteswap()
+    return values, end
+
+
+def parse_image(buffer, path="<bytes>"):
+    """Образ из байтов (bytes, memoryview или отображение файла)
+
+    Возбуждает ValueError, если данные не являются образом.
+    """
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"'{path}' не является образом программы")
+    magic, version, width, n_code, n_data, n_blocks, n_symbols = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' не является образом программы")
+    if version != VERSION or width not in _DATA_TYPES:
+        raise ValueError(f"Неподдерживаемая версия образа '{path}'")
+
+    image = ProgramImage.__new__(ProgramImage)
+    image.code, offset = _section(buffer, _HEADER.size, CODE_TYPE, n_code, path)
+    image.data, offset = _section(buffer, _align(offset), _DATA_TYPES[width], n_data, path)
+    blocks, offset = _section(buffer, offset, "I", n_blocks, path)
+    image.blocks = blocks.tolist() if n_blocks else None
+    addrs, offset = _section(buffer, offset, "I", n_symbols, path)
+    names = bytes(buffer[offset:]).decode("utf-8").split("\n") if n_symbols else []
+    if len(names) != n_symbols:
+        raise ValueError(f"Образ '{path}' обрезан")
+    image.symbols = dict(zip(names, addrs.tolist()))
+    return image
+
+
+def load_image(path):
+    """Чтение образа из файла через отображение в память
+
+    Возбуждает ValueError при некорректном файле, OSError - при ошибке
+    чтения.
+    """
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Пустой файл не отображается
+            raise ValueError(f"'{path}' не является образом программы")
+    with mapped, memoryview(mapped) as buffer:
+        return parse_image(buffer, path)
+
+
+def _build(args):
+    from assembler import assemble
+
+    with open(args.program, encoding="utf-8") as f:
+        result = assemble(f.read())
+    if result.errors:
+        print(result.format_errors(), file=sys.stderr)
+        return 1
+    machine_code, symbols = result.machine_code, result.symbols
+    if args.optimize:
+        from optimizer import optimize
+        optimization = optimize(machine_code)
+        machine_code = optimization.machine_code
+        symbols = optimization.remap_symbols(symbols)
+    data = list(map(int, args.data.split()))
+    build_image(machine_code, symbols, data, not args.no_blocks).save(args.output)
+    return 0
+
+
+def _show(args):
+    from assembler import disassemble
+
+    image = load_image(args.image)
+    labels = {addr: name for name, addr in image.symbols.items()}
+    blocks = set(image.blocks or ())
+    print(f"Команд: {len(image.code)}, данных: {len(image.data)}, меток: {len(labels)}, "
+          f"блоков: {len(blocks) if image.blocks is not None else '-'}")
+    for addr, word in enumerate(image.code):
+        label = f"{labels[addr]}:" if addr in labels else ""
+        mark = "*" if addr in blocks else " "
+        print(f"{mark} {label:<10}{addr:03d}  0x{word:04X}  {disassemble(word)}")
+    if image.data:
+        print("Данные:", " ".join(map(str, image.data)))
+    return 0
+
+
+def _export(args):
+    from hardware import export_mem
+
+    export_mem(load_image(args.image).code, args.output, comments=not args.no_comments)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Образы программ (.emi)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="ассемблирование в образ")
+    build.add_argument("program", help="файл программы на ассемблере")
+    build.add_argument("-o", "--output", required=True, help="файл образа .emi")
+    build.add_argument("--data", default="", help="начальные данные (числа через пробел)")
+    build.add_argument("--optimize", action="store_true", help="оптимизировать код")
+    build.add_argument("--no-blocks", action="store_true",
+                       help="не сохранять начала базовых блоков")
+    build.set_defaults(handler=_build)
+    show = commands.add_parser("show", help="содержимое образа")
+    show.add_argument("image", help="файл образа .emi")
+    show.set_defaults(handler=_show)
+    export = commands.add_parser("export", help="образ памяти команд для $readmemb")
+    export.add_argument("image", help="файл образа .emi")
+    export.add_argument("-o", "--output", required=True, help="файл .mem")
+    export.add_argument("--no-comments", action="store_true",
+                        help="без дизассемблирования в комментариях")
+    export.set_defaults(handler=_export)
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Журнал отмены шагов для обратного выполнения
+
+Перед каждым шагом запоминаются PC, ACC, IR и флаги, а наблюдатель
+записи добавляет единственный регистр или ячейку памяти, которые
+изменила команда, вместе со старым значением. Записи хранятся в
+кольцевом буфере из массивов ``array`` фиксированной емкости (23 байта
+на шаг: PC, IR и номер ячейки - по 2 байта, флаги - 1, ACC и старое
+значение - по 8); при переполнении вытесняются самые старые шаги.
+
+Журнал верен, только если все шаги выполнялись через него: после
+выполнения мимо журнала (``CPU.run``, загрузка программы) его нужно
+очистить через ``clear``.
+
+Наблюдатель записи подключается первым ``step`` или ``run`` и остается
+до ``detach``; пока он подключен, ``CPU.run`` выполняется без
+суперкоманд, поэтому между сеансами записи журнал стоит отключать.
+"""
+
+from array import array
+
+from cpu import WRITE_REGISTER, WRITE_MEMORY
+
+DEFAULT_CAPACITY = 100000
+
+# Биты поля flags записи журнала
+_Z = 0x1
+_N = 0x2
+_WROTE_REGISTER = 0x4
+_WROTE_MEMORY = 0x8
+_BIG = 0x10  # ACC или старое значение не помещаются в 64 бита (словарь _big)
+
+
+def _executed(cpu, running):
+    """Выполнилась ли команда (останов по точке - до ее выполнения)"""
+    return running or cpu.halt_reason != "break"
+
+
+class Journal:
+    """Кольцевой журнал отмены шагов процессора"""
+
+    def __init__(self, cpu, capacity=DEFAULT_CAPACITY):
+        self.cpu = cpu
+        self.capacity = capacity
+        self.pcs = array("H", [0]) * capacity
+        self.accs = array("q", [0]) * capacity
+        self.irs = array("H", [0]) * capacity
+        self.flags = array("B", [0]) * capacity
+        self.indexes = array("H", [0]) * capacity
+        self.olds = array("q", [0]) * capacity
+        self._big = {}
+        self.head = 0   # Позиция следующей записи
+        self.count = 0  # Число записей в буфере
+        self._recording = False
+        self._write = None
+        self._attached = False
+
+    def __len__(self):
+        return self.count
+
+    def on_write(self, kind, index, old, new):
+        # Учитывается только запись, сделанная шагом под журналом
+        if self._recording and self._write is None:
+            self._write = (kind, index, old)
+
+    def attach(self):
+        """Подключение наблюдателя записи (если еще не подключен)"""
+        if not self._attached:
+            self.cpu.add_write_hook(self.on_write)
+            self._attached = True
+
+    def detach(self):
+        """Отключение наблюдателя записи; записи журнала сохраняются"""
+        if self._attached:
+            self.cpu.remove_write_hook(self.on_write)
+            self._attached = False
+
+    def clear(self):
+        """Удаление всех записей"""
+        self.head = 0
+        self.count = 0
+        self._big.clear()
+
+    def _record(self, pc, acc, ir, z, n, write):
+        slot = self.head
+        flags = (_Z if z else 0) | (_N if n else 0)
+        index = old = 0
+        if write is not None:
+            kind, index, old = write
+            flags |= _WROTE_REGISTER if kind == WRITE_REGISTER else _WROTE_MEMORY
+        if self._big:
+            self._big.pop(slot, None)
+        try:
+            self.accs[slot] = acc
+            self.olds[slot] = old
+        except OverflowError:
+            # Целые Python без ограничения разрядности
+            self._big[slot] = (acc, old)
+            flags |= _BIG
+        self.pcs[slot] = pc
+        self.irs[slot] = ir
+        self.flags[slot] = flags
+        self.indexes[slot] = index
+        self.head = slot + 1 if slot + 1 < self.capacity else 0
+        if self.count < self.capacity:
+            self.count += 1
+
+    def step(self):
+        """Выполнение одной команды с записью в журнал
+
+        Возвращает результат ``CPU.execute_instruction``. Останов по
+        точке (до выполнения команды) в журнал не записывается.
+        """
+        cpu = self.cpu
+        pc = cpu.PC
+        if not 0 <= pc < len(cpu.code_memory):
+            # Останов по концу памяти ничего не меняет
+            return cpu.execute_instruction()
+        self.attach()
+        acc, ir, z, n = cpu.ACC, cpu.IR, cpu.Z, cpu.N
+        self._write = None
+        self._recording = True
+        try:
+            running = cpu.execute_instruction()
+        finally:
+            self._recording = False
+        if _executed(cpu, running):
+            self._record(pc, acc, ir, z, n, self._write)
+        return running
+
+    def run(self, max_steps):
+        """Выполнение с записью в журнал, как ``CPU.run``
+
+        Возвращает количество выполненных шагов.
+        """
+        self.attach()
+        cpu = self.cpu
+        cpu.halt_reason = None
+        execute = cpu.execute_instruction
+        record = self._record
+        size = len(cpu.code_memory)
+        steps = 0
+        while steps < max_steps:
+            pc = cpu.PC
+            if not 0 <= pc < size:
+                cpu.halt_reason = "end"
+                return steps
+            acc, ir, z, n = cpu.ACC, cpu.IR, cpu.Z, cpu.N
+            self._write = None
+            self._recording = True
+            try:
+                running = execute()
+            finally:
+                self._recording = False
+            if _executed(cpu, running):
+                record(pc, acc, ir, z, n, self._write)
+            if not running:
+                return steps
+            steps += 1
+        cpu.halt_reason = "max_steps"
+        return steps
+
+    def back(self):
+        """Отмена последнего шага; False, если журнал пуст"""
+        if not self.count:
+            return False
+        cpu = self.cpu
+        slot = (self.head - 1) % self.capacity
+        flags = self.flags[slot]
+        pc = self.pcs[slot]
+        if flags & _BIG:
+            acc, old = self._big.pop(slot)
+        else:
+            acc, old = self.accs[slot], self.olds[slot]
+
+        if flags & _WROTE_REGISTER:
+            cpu.write(WRITE_REGISTER, self.indexes[slot], old)
+        elif flags & _WROTE_MEMORY:
+            cpu.write(WRITE_MEMORY, self.indexes[slot], old)
+        cpu.PC = pc
+        cpu.ACC = acc
+        cpu.IR = self.irs[slot]
+        cpu.Z = 1 if flags & _Z else 0
+        cpu.N = 1 if flags & _N else 0
+        cpu.halt_reason = None
+
+        self.head = slot
+        self.count -= 1
+        return True
+
+    def back_to(self, pc, limit=None):
+        """Отмена шагов, пока PC не станет равен pc (хотя бы один шаг)
+
+        Возвращает число отмененных шагов. Если адрес не встретился,
+        журнал (или limit шагов) отматывается до конца.
+        """
+        undone = 0
+        while (limit is None or undone < limit) and self.back():
+            undone += 1
+            if self.cpu.PC == pc:
+                break
+        return undone
@@ -0,0 +1,217 @@
+"""Обнаружение бесконечных циклов по повторению состояния
+
+Состояние машины - PC, ACC, флаги, регистры и память данных. Для
+памяти поддерживается хэш, который наблюдатель записи обновляет при
+каждой записи (XOR слагаемых ячеек), так что сравнение состояний не
+требует просмотра всей памяти. Повтор ищется алгоритмом Брента: текущее
+состояние сравнивается с сохраненным, а сохраненное заменяется на
+шагах, равных степеням двойки. Совпадение проверяется полностью
+(включая память), поэтому найденный цикл доказуемо бесконечен:
+процессор детерминирован, и из того же состояния он пройдет тот же путь.
+С подключенными портами ввода-вывода (ports.py) в состояние входит и
+положение в потоках, поэтому программа, читающая вход, не считается
+зациклившейся.
+
+Цикл находится не позже чем через 2 * (предпериод + период) шагов
+после ``start``.
+
+``SliceLoopDetector`` включает эту проверку лишь на короткие отрезки, а
+остальное время выполняет программу быстрым движком (``CPU.run`` с
+суперкомандами и идиомами, без наблюдателя записи), поэтому долгие
+программы, которые останавливаются сами, почти не замедляются.
+"""
+
+from cpu import WRITE_MEMORY
+
+LOOP_SLICE = 16384  # Наибольшая порция быстрого выполнения в SliceLoopDetector
+PROBE_STEPS = 4096  # Наименьшая пошаговая проверка в SliceLoopDetector
+PROBE_SHARE = 256   # Пошаговая проверка - не меньше 1/PROBE_SHARE выполненных шагов
+
+
+def _term(index, value):
+    # Вклад ячейки в хэш памяти; нулевые ячейки не вносят ничего
+    return hash((index, value)) if value else 0
+
+
+class LoopDetector:
+    """Выполнение с поиском повторяющегося состояния
+
+    Выполнение идет через ``run``; при найденном цикле процессор
+    останавливается с ``halt_reason`` = "loop", а ``loop`` содержит
+    (PC, период в шагах).
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.memory_hash = 0
+        self.loop = None
+        self._saved = None
+        self._saved_memory = None
+        self._power = 1
+        self._distance = 0
+        cpu.add_write_hook(self.on_write)
+
+    def on_write(self, kind, index, old, new):
+        if kind == WRITE_MEMORY:
+            self.memory_hash ^= _term(index, old) ^ _term(index, new)
+
+    def detach(self):
+        """Отключение от процессора"""
+        self.cpu.remove_write_hook(self.on_write)
+
+    def start(self):
+        """Начало поиска с текущего состояния
+
+        Вызывается перед выполнением, если состояние менялось не через
+        ``run`` (загрузка данных, шаги, отмена шагов).
+        """
+        self.memory_hash = 0
+        for index, value in enumerate(self.cpu.data_memory):
+            if value:
+                self.memory_hash ^= _term(index, value)
+        self.loop = None
+        self._save(self.cpu.PC)
+        self._power = 1
+        self._distance = 0
+
+    def _save(self, pc):
+        cpu = self.cpu
+        ports = cpu.ports.position() if cpu.ports is not None else None
+        self._saved = (pc, cpu.ACC, cpu.Z, cpu.N, list(cpu.registers), self.memory_hash, ports)
+        self._saved_memory = cpu.data_memory[:]
+
+    def _repeats(self, pc):
+        """Полное сравнение состояния с сохраненным"""
+        cpu = self.cpu
+        saved = self._saved
+        return (pc == saved[0] and cpu.ACC == saved[1] and cpu.Z == saved[2]
+                and cpu.N == saved[3] and cpu.registers == saved[4]
+                and self.memory_hash == saved[5]
+                and (cpu.ports.position() if cpu.ports is not None else None) == saved[6]
+                and cpu.data_memory == self._saved_memory)
+
+    def run(self, max_steps):
+        """Выполнение с поиском цикла, как ``CPU.run``
+
+        Продолжает поиск, начатый ``start`` (или предыдущим ``run``).
+        Возвращает количество выполненных шагов.
+        """
+        cpu = self.cpu
+        cpu.halt_reason = None
+        code = cpu.code_memory
+        size = len(code)
+        pc = cpu.PC
+        if not 0 <= pc < size:
+            cpu.halt_reason = "end"
+            return 0
+        if self._saved is None:
+            self.start()
+
+        decoded = cpu.dispatch_table()
+        saved_pc = self._saved[0]
+        power = self._power
+        distance = self._distance
+        steps = 0
+        last = pc
+        while steps < max_steps:
+            handler, get, put = decoded[pc]
+            next_pc = handler(cpu, pc, get, put)
+            if next_pc is None:
+                cpu.IR = code[pc] if pc < size else code[last]
+                break
+            last = pc
+            pc = next_pc
+            steps += 1
+            distance += 1
+            if pc == saved_pc and self._repeats(pc):
+                cpu.IR = code[last]
+                cpu.PC = pc
+                cpu.halt_reason = "loop"
+                self.loop = (pc, distance)
+                break
+            if distance == power:
+                # Следующая степень двойки: новое сохраненное состояние
+                self._save(pc)
+                saved_pc = pc
+                power *= 2
+                distance = 0
+        else:
+            if steps:
+                cpu.IR = code[last]
+            if pc <= size:
+                cpu.PC = pc
+            cpu.halt_reason = "max_steps"
+
+        self._power = power
+        self._distance = distance
+        return steps
+
+    def describe(self):
+        """Текст о найденном цикле"""
+        if self.loop is None:
+            return ""
+        pc, period = self.loop
+        return f"Доказуемо бесконечный цикл на PC={pc} (период в шагах: {period})"
+
+
+class SliceLoopDetector:
+    """Быстрое выполнение с периодическим поиском цикла
+
+    Программа выполняется движком execute(шаги) (по умолчанию
+    ``cpu.run``) без наблюдателя записи, а ``LoopDetector`` проверяет
+    шаги подряд только время от времени: сразу после ``start`` и затем
+    каждый раз, когда число шагов удваивается, на PROBE_STEPS шагов или
+    1/PROBE_SHARE уже выполненных, если это больше. У долгой программы
+    пошагово выполняется меньше 1% шагов, а цикл с предпериодом mu и
+    периодом p находится после примерно 2 * max(mu, 3 * PROBE_SHARE * p)
+    шагов. Интерфейс - как у ``LoopDetector``: ``start``, ``run``,
+    ``loop`` и ``describe``.
+    """
+
+    def __init__(self, cpu, execute=None, slice_steps=LOOP_SLICE):
+        self.cpu = cpu
+        self.execute = execute or cpu.run
+        self.slice_steps = slice_steps
+        self.loop = None
+        self._elapsed = 0
+        self._next_probe = 0
+
+    def start(self):
+        """Начало поиска с текущего состояния"""
+        self.loop = None
+        self._elapsed = 0
+        self._next_probe = 0
+
+    def run(self, max_steps):
+        """Выполнение с поиском цикла, как ``CPU.run``
+
+        Возвращает количество выполненных шагов.
+        """
+        cpu = self.cpu
+        steps = 0
+        while steps < max_steps:
+            elapsed = self._elapsed + steps
+            if elapsed >= self._next_probe:
+                self._next_probe = 2 * elapsed + self.slice_steps
+                budget = max(PROBE_STEPS, elapsed // PROBE_SHARE)
+                steps += self._probe(min(budget, max_steps - steps))
+            else:
+                budget = min(self.slice_steps, self._next_probe - elapsed)
+                steps += self.execute(min(budget, max_steps - steps))
+            if cpu.halt_reason != "max_steps":
+                break
+        self._elapsed += steps
+        return steps
+
+    def _probe(self, max_steps):
+        """Выполнение по шагам с ``LoopDetector``; число шагов"""
+        detector = LoopDetector(self.cpu)
+        try:
+            detector.start()
+            steps = detector.run(max_steps)
+        finally:
+            detector.detach()
+        self.loop = detector.loop
+        return steps
+
+    describe = LoopDetector.describe
@@ -0,0 +1,166 @@
+"""Виртуализированное окно памяти для GUI
+
+В текстовом поле находятся строки только для видимых адресов, а полоса
+прокрутки отражает положение в памяти целиком. Прокрутка и обновление
+перерисовывают не больше строк, чем помещается в окне, поэтому
+стоимость перерисовки не зависит от размера памяти (256 слов или 64K).
+
+Отметки (``set_mark``) - наборы адресов, строки которых выделяются тегом
+текстового поля: текущая команда, цель перехода по адресу, недавние
+записи. Проверяются только видимые адреса.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+from collections import deque
+from tkinter import ttk
+
+DEFAULT_ROWS = 30
+RECENT_FRAMES = 3  # Сколько перерисовок выделяются недавние записи
+
+
+class RecentWrites:
+    """Адреса, записанные за последние frames перерисовок (для ``set_mark``)"""
+
+    def __init__(self, frames=RECENT_FRAMES):
+        self.history = deque(maxlen=frames)
+
+    def add(self, addresses):
+        """Записи очередного кадра"""
+        self.history.append(addresses)
+
+    def clear(self):
+        self.history.clear()
+
+    def __contains__(self, addr):
+        return any(addr in frame for frame in self.history)
+
+
+class MemoryView:
+    """Окно памяти из size строк; line(адрес) возвращает текст строки"""
+
+    def __init__(self, parent, line, size, rows=DEFAULT_ROWS, width=35,
+                 font=("Courier New", 9)):
+        self.line = line
+        self.size = size
+        self.rows = rows
+        self.top = 0
+        self.marks = {}  # Тег -> множество адресов (или объект с "in")
+
+        self.frame = ttk.Frame(parent)
+        self.text = tk.Text(self.frame, width=width, height=rows, font=font,
+                            wrap=tk.NONE, state=tk.DISABLED)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.line_height = tkfont.Font(font=font).metrics("linespace")
+
+        self.text.bind("<Configure>", self.on_resize)
+        self.text.bind("<MouseWheel>", self.on_wheel)
+        self.text.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.text.bind("<Button-5>", lambda event: self.scroll_by(3))
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def tag_config(self, tag, **options):
+        self.text.tag_config(tag, **options)
+
+    def visible(self):
+        """Видимые адреса"""
+        return range(self.top, min(self.top + self.rows, self.size))
+
+    # ----- прокрутка -----
+
+    def scroll_to(self, top, force=False):
+        """Прокрутка так, чтобы первой строкой был адрес top"""
+        top = max(0, min(top, self.size - self.rows))
+        if top != self.top or force:
+            self.top = top
+            self.redraw()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.top + rows)
+        return "break"
+
+    def show(self, addr):
+        """Прокрутка на минимальное расстояние, чтобы адрес был виден"""
+        if addr < self.top:
+            self.scroll_to(addr)
+        elif addr >= self.top + self.rows:
+            self.scroll_to(addr - self.rows + 1)
+
+    def center(self, addr):
+        """Прокрутка, при которой адрес в середине окна"""
+        self.scroll_to(addr - self.rows // 2)
+
+    def on_scroll(self, action, amount, unit=None):
+        # Команда полосы прокрутки: moveto доля | scroll n units/pages
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.size))
+        elif unit == "pages":
+            self.scroll_by(int(amount) * max(1, self.rows - 1))
+        else:
+            self.scroll_by(int(amount))
+
+    def on_wheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_resize(self, event):
+        rows = max(1, event.height // self.line_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.scroll_to(self.top, force=True)
+
+    # ----- перерисовка -----
+
+    def set_size(self, size):
+        """Новый размер памяти (с перерисовкой)"""
+        self.size = size
+        self.scroll_to(self.top, force=True)
+
+    def redraw(self):
+        """Перерисовка всех видимых строк"""
+        text = self.text
+        text.config(state=tk.NORMAL)
+        text.delete("1.0", tk.END)
+        text.insert("1.0", "\n".join(self.line(addr) for addr in self.visible()))
+        self._apply_marks(self.marks)
+        text.config(state=tk.DISABLED)
+        if self.size:
+            self.scrollbar.set(self.top / self.size, min(1.0, (self.top + self.rows) / self.size))
+
+    def update_rows(self, addresses):
+        """Перерисовка строк тех адресов, которые сейчас видны"""
+        top = self.top
+        end = min(top + self.rows, self.size)
+        if len(addresses) > self.rows:
+            # Изменений больше, чем строк: проверяются видимые адреса
+            rows = [addr for addr in self.visible() if addr in addresses]
+        else:
+            rows = [addr for addr in addresses if top <= addr < end]
+        if not rows:
+            return
+        text = self.text
+        text.config(state=tk.NORMAL)
+        for addr in rows:
+            line = addr - top + 1
+            text.delete(f"{line}.0", f"{line}.end")
+            text.insert(f"{line}.0", self.line(addr))
+            for tag, marked in self.marks.items():
+                if addr in marked:
+                    text.tag_add(tag, f"{line}.0", f"{line + 1}.0")
+        text.config(state=tk.DISABLED)
+
+    def set_mark(self, tag, addresses):
+        """Выделение строк адресов тегом (прежняя отметка снимается)"""
+        self.marks[tag] = addresses
+        self._apply_marks({tag: addresses})
+
+    def _apply_marks(self, marks):
+        text = self.text
+        for tag, marked in marks.items():
+            text.tag_remove(tag, "1.0", tk.END)
+            for line, addr in enumerate(self.visible(), 1):
+                if addr in marked:
+                    text.tag_add(tag, f"{line}.0", f"{line + 1}.0")
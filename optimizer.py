@@ -0,0 +1,318 @@
+"""Оптимизатор машинного кода (peephole)
+
+Проход по результату ``assemble_program`` удаляет избыточные команды:
+
+- ``CMP #0`` после LOAD/ADD/SUB/MUL, которые уже выставили Z и N по ACC;
+- ``LOAD Rx`` сразу после ``STORE Rx`` (ACC и флаги не меняются);
+- переходы на следующую команду и пустые команды (NOP);
+
+а переходы на безусловный переход перенаправляет сразу на его цель.
+Команды, на которые есть переходы, не удаляются, если от этого зависят
+флаги. После удаления адреса переходов пересчитываются (с префиксами
+EXT, если адрес перестал помещаться в 10 бит).
+
+Цель перехода с непосредственным операндом - метка или число (``JMP 5``
+ассемблируется так же, как ``JMP LOOP``) - пересчитывается и
+перенаправляется. Программы с переходами по вычисляемому адресу
+(регистровая или косвенная адресация в JMP/JZ/JN - ассемблер таких не
+порождает, но они возможны в машинном коде) не оптимизируются: их цели
+нельзя пересчитать.
+
+Использование::
+
+    python optimizer.py sum.asm --data "10 1 2 3 4 5 6 7 8 9 10"
+"""
+
+import argparse
+import sys
+
+from assembler import assemble, disassemble, encode_extended, ext_count
+from cpu import (
+    CPU, OP_LOAD, OP_STORE, OP_ADD, OP_SUB, OP_MUL, OP_CMP,
+    OP_JMP, OP_JZ, OP_JN, OP_HALT, OP_EXT,
+    ADDR_IMMEDIATE, ADDR_REGISTER, HANDLERS, decode_program,
+)
+
+JUMPS = (OP_JMP, OP_JZ, OP_JN)
+# Команды, выставляющие Z и N по новому значению ACC
+SETS_FLAGS = (OP_LOAD, OP_ADD, OP_SUB, OP_MUL)
+
+DEFAULT_MAX_STEPS = 1000000
+
+
+class OptimizationResult:
+    """Результат оптимизации
+
+    machine_code - кортеж слов, address_map - новый адрес для каждого
+    старого адреса команды (0..длина программы включительно; удаленная
+    команда отображается на следующую оставшуюся), removed - список
+    (старый адрес, текст команды), threaded - число перенаправленных
+    переходов, skipped - причина, по которой оптимизация не выполнялась.
+    """
+
+    __slots__ = ("machine_code", "address_map", "removed", "threaded", "skipped")
+
+    def __init__(self, machine_code, address_map, removed, threaded, skipped=None):
+        self.machine_code = machine_code
+        self.address_map = address_map
+        self.removed = removed
+        self.threaded = threaded
+        self.skipped = skipped
+
+    def remap_symbols(self, symbols):
+        """Таблица меток с новыми адресами"""
+        return {name: self.map_address(addr) for name, addr in symbols.items()}
+
+    def map_address(self, addr):
+        """Новый адрес для старого (за концом программы - со сдвигом)"""
+        last = len(self.address_map) - 1
+        if addr <= last:
+            return self.address_map[addr]
+        return addr - last + self.address_map[last]
+
+
+def _instructions(machine_code):
+    """Команды программы: [адрес, код, тип адресации, операнд, слова]
+
+    Префиксы EXT объединяются с командой, к которой относятся.
+    """
+    instructions = []
+    start = 0
+    for addr, (opcode, addr_type, operand) in enumerate(decode_program(machine_code)):
+        if opcode == OP_EXT and addr + 1 < len(machine_code):
+            continue
+        instructions.append([start, opcode, addr_type, operand,
+                             tuple(machine_code[start:addr + 1])])
+        start = addr + 1
+    return instructions
+
+
+def _is_nop(opcode):
+    return opcode != OP_EXT and HANDLERS[opcode].__name__ == "_op_nop"
+
+
+class _Program:
+    """Команды с исходными адресами; удаленная команда заменяется следующей"""
+
+    def __init__(self, instructions, end):
+        self.instructions = instructions
+        self.end = end
+        self.kept = list(instructions)
+        self._resolved = {}
+
+    def remove(self, addresses):
+        self.kept = [ins for ins in self.kept if ins[0] not in addresses]
+        following = self.end
+        self._resolved = {self.end: self.end}
+        kept = {ins[0] for ins in self.kept}
+        for ins in reversed(self.instructions):
+            if ins[0] in kept:
+                following = ins[0]
+            self._resolved[ins[0]] = following
+
+    def resolve(self, addr):
+        """Исходный адрес команды, которая выполнится при переходе на addr"""
+        return self._resolved.get(addr, addr)
+
+    def by_addr(self):
+        return {ins[0]: ins for ins in self.kept}
+
+
+def _thread_jumps(program):
+    """Перенаправление переходов на безусловные переходы; число изменений"""
+    by_addr = program.by_addr()
+    threaded = 0
+    for ins in program.kept:
+        if ins[1] not in JUMPS:
+            continue
+        target = program.resolve(ins[3])
+        seen = {ins[0]}
+        while target in by_addr and by_addr[target][1] == OP_JMP and target not in seen:
+            seen.add(target)
+            target = program.resolve(by_addr[target][3])
+        if target != program.resolve(ins[3]):
+            ins[3] = target
+            threaded += 1
+    return threaded
+
+
+def _removable(program):
+    """Исходные адреса избыточных команд за один проход"""
+    kept = program.kept
+    targets = {program.resolve(ins[3]) for ins in kept if ins[1] in JUMPS}
+    removable = set()
+    flags_acc = False  # Z и N соответствуют ACC
+    previous = None
+    for i, ins in enumerate(kept):
+        addr, opcode, addr_type, operand, _ = ins
+        if addr in targets:
+            flags_acc = False
+            previous = None
+
+        if _is_nop(opcode):
+            removable.add(addr)
+            continue
+        if opcode in JUMPS:
+            following = kept[i + 1][0] if i + 1 < len(kept) else program.end
+            if program.resolve(operand) == following:
+                removable.add(addr)
+                continue
+        if opcode == OP_CMP and addr_type == ADDR_IMMEDIATE and operand == 0 and flags_acc:
+            removable.add(addr)
+            continue
+        if (opcode == OP_LOAD and addr_type == ADDR_REGISTER and flags_acc
+                and previous is not None and previous[1] == OP_STORE
+                and previous[2] == ADDR_REGISTER and previous[3] == operand):
+            removable.add(addr)
+            continue
+
+        if opcode in SETS_FLAGS:
+            flags_acc = True
+        elif opcode == OP_CMP:
+            flags_acc = addr_type == ADDR_IMMEDIATE and operand == 0
+        elif opcode in (OP_JMP, OP_HALT):
+            flags_acc = False
+        previous = ins
+    return removable
+
+
+def _layout(program):
+    """Новые адреса: (отображение исходных адресов, слова команд)
+
+    Размер перехода зависит от нового адреса цели, поэтому раскладка
+    повторяется до устойчивости (как в ассемблере).
+    """
+    kept = program.kept
+    sizes = [1 if ins[1] in JUMPS else len(ins[4]) for ins in kept]
+    while True:
+        new = {}
+        addr = 0
+        for ins, size in zip(kept, sizes):
+            new[ins[0]] = addr
+            addr += size
+        new_end = addr
+
+        def new_address(old):
+            old = program.resolve(old)
+            if old in new:
+                return new[old]
+            return old - program.end + new_end if old >= program.end else old
+
+        changed = False
+        for i, ins in enumerate(kept):
+            if ins[1] in JUMPS:
+                size = 1 + (ext_count(new_address(ins[3]), ADDR_IMMEDIATE) or 0)
+                if size > sizes[i]:
+                    sizes[i] = size
+                    changed = True
+        if not changed:
+            break
+
+    code = []
+    for ins, size in zip(kept, sizes):
+        if ins[1] in JUMPS:
+            code.extend(encode_extended(ins[1], new_address(ins[3]), ADDR_IMMEDIATE, size - 1))
+        else:
+            code.extend(ins[4])
+    address_map = [new_address(ins[0]) for ins in program.instructions
+                   for _ in ins[4]] + [new_end]
+    return address_map, code
+
+
+def optimize(machine_code):
+    """Оптимизация машинного кода; возвращает ``OptimizationResult``"""
+    machine_code = list(machine_code)
+    end = len(machine_code)
+    instructions = _instructions(machine_code)
+    starts = {ins[0] for ins in instructions}
+    for ins in instructions:
+        if ins[1] not in JUMPS:
+            continue
+        if ins[2] != ADDR_IMMEDIATE:
+            skipped = "переход по вычисляемому адресу"
+        elif ins[3] < end and ins[3] not in starts:
+            skipped = f"переход внутрь команды с префиксом EXT ({ins[3]})"
+        else:
+            continue
+        return OptimizationResult(tuple(machine_code), list(range(end + 1)), [], 0, skipped)
+
+    program = _Program(instructions, end)
+    threaded = _thread_jumps(program)
+    removed = set()
+    while True:
+        removable = _removable(program)
+        if not removable:
+            break
+        removed |= removable
+        program.remove(removed)
+        threaded += _thread_jumps(program)
+
+    address_map, code = _layout(program)
+    removed = [(ins[0], disassemble(ins[4][-1])) for ins in instructions if ins[0] in removed]
+    return OptimizationResult(tuple(code), address_map, removed, threaded)
+
+
+def measure(original, optimized, data, max_steps=DEFAULT_MAX_STEPS, **sizes):
+    """Выполнение обеих версий на одних данных
+
+    Возвращает (шагов до, шагов после, совпало ли состояние: ACC,
+    флаги, регистры и память данных).
+    """
+    results = []
+    for machine_code in (original, optimized):
+        cpu = CPU(**sizes)
+        cpu.load_code(machine_code)
+        cpu.load_data(data)
+        steps = cpu.run(max_steps)
+        state = (cpu.ACC, cpu.Z, cpu.N, list(cpu.registers), cpu.data_memory.tobytes(),
+                 cpu.halt_reason)
+        results.append((steps, state))
+    (before, state_before), (after, state_after) = results
+    return before, after, state_before == state_after
+
+
+def report(result, steps=None):
+    """Текстовый отчет об оптимизации"""
+    if result.skipped:
+        return f"Оптимизация не выполнялась: {result.skipped}"
+    lines = [f"Удалено команд: {len(result.removed)}, слов: {len(result.address_map) - 1} -> "
+             f"{len(result.machine_code)}, перенаправлено переходов: {result.threaded}"]
+    for addr, text in result.removed:
+        lines.append(f"  {addr:03d} {text}")
+    if steps is not None:
+        before, after, same = steps
+        saved = before - after
+        share = f" ({100 * saved / before:.1f}%)" if before else ""
+        lines.append(f"Шагов: {before} -> {after}, сэкономлено {saved}{share}"
+                     + ("" if same else "; ВНИМАНИЕ: состояние отличается"))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Оптимизация машинного кода программы")
+    parser.add_argument("program", help="файл программы на ассемблере")
+    parser.add_argument("--data", default="", help="входные данные для оценки числа шагов")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS)
+    parser.add_argument("--listing", action="store_true", help="вывести оптимизированный код")
+    args = parser.parse_args(argv)
+
+    with open(args.program, encoding="utf-8") as f:
+        result = assemble(f.read())
+    if result.errors:
+        print(result.format_errors(), file=sys.stderr)
+        return 1
+
+    optimized = optimize(result.machine_code)
+    steps = measure(result.machine_code, optimized.machine_code,
+                    list(map(int, args.data.split())), args.max_steps)
+    print(report(optimized, steps))
+    if args.listing:
+        symbols = {addr: name for name, addr in optimized.remap_symbols(result.symbols).items()}
+        for addr, word in enumerate(optimized.machine_code):
+            label = f"{symbols[addr]}:" if addr in symbols else ""
+            print(f"{label:<10}{addr:03d}  {disassemble(word)}")
+    return 0 if steps[2] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""Порты ввода-вывода, отображенные на память данных
+
+Порты занимают PORT_COUNT ячеек памяти данных начиная с ``base`` (по
+умолчанию - последние ячейки памяти):
+
+- ``base + PORT_INPUT`` - чтение выдает следующее значение входного
+  потока (после его конца - 0);
+- ``base + PORT_OUTPUT`` - записанное значение добавляется в выходной
+  поток (усекается до разрядности ячейки, как при записи в память);
+- ``base + PORT_EOF`` - чтение выдает 1, если входной поток исчерпан.
+
+Входной поток - любой итерируемый объект с целыми числами (например,
+``read_stream``), он читается пачками по ``chunk`` значений; выход
+накапливается и передается приемнику такими же пачками. Поэтому
+программа суммирования или свертки может обработать сколько угодно
+значений в постоянной памяти (sum_stream.asm)::
+
+    LOOP: LOAD 255      ; конец входа?
+          JZ NEXT
+          JMP END
+    NEXT: LOAD 253      ; следующее значение
+          ...
+    END:  LOAD R1
+          STORE 254     ; сумма - в выходной поток
+
+Порты обслуживаются функциями доступа к операндам (``get_operand_value``,
+``set_operand_value``, таблица диспетчеризации); пока они подключены,
+``CPU.run`` не использует суперкоманды, а транслированный код
+(translator.py) и vector.py портов не поддерживают.
+
+Использование::
+
+    python ports.py sum_stream.asm --input values.i32 --output out.csv
+"""
+
+import argparse
+import re
+import sys
+from array import array
+from itertools import islice
+
+from dataio import RAW_TYPES, file_format
+
+PORT_INPUT = 0
+PORT_OUTPUT = 1
+PORT_EOF = 2
+PORT_COUNT = 3
+
+DEFAULT_CHUNK = 65536
+DEFAULT_MAX_STEPS = 10 ** 9
+
+
+def read_stream(path, fmt=None, chunk=DEFAULT_CHUNK):
+    """Генератор значений файла (форматы dataio.py), читаемого пачками"""
+    fmt = file_format(path, fmt)
+    if fmt in RAW_TYPES:
+        typecode = RAW_TYPES[fmt][0]
+        with open(path, "rb") as f:
+            while True:
+                values = array(typecode)
+                try:
+                    values.fromfile(f, chunk)
+                except EOFError:
+                    pass  # Последняя неполная пачка уже в values
+                if sys.byteorder != "little":
+                    values.byteswap()
+                yield from values
+                if len(values) < chunk:
+                    return
+    elif fmt == "npy":
+        import numpy as np
+        data = np.load(path, mmap_mode="r", allow_pickle=False)
+        for start in range(0, len(data), chunk):
+            yield from data[start:start + chunk].tolist()
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                for item in re.split(r"[\s,;]+", line.strip()):
+                    if item:
+                        yield int(item)
+
+
+class StreamWriter:
+    """Приемник выходного потока в файл (int16, int32 или csv)"""
+
+    def __init__(self, path, fmt=None):
+        self.fmt = file_format(path, fmt)
+        if self.fmt == "npy":
+            raise ValueError("Формат npy не поддерживает потоковую запись")
+        binary = self.fmt in RAW_TYPES
+        self.file = open(path, "wb" if binary else "w", encoding=None if binary else "utf-8")
+
+    def __call__(self, values):
+        if self.fmt in RAW_TYPES:
+            try:
+                values = array(RAW_TYPES[self.fmt][0], values)
+            except OverflowError:
+                raise ValueError(f"Значение не помещается в формат {self.fmt}")
+            if sys.byteorder != "little":
+                values.byteswap()
+            values.tofile(self.file)
+        else:
+            self.file.write("".join(f"{value}\n" for value in values))
+
+    def close(self):
+        self.file.close()
+
+
+class IOPorts:
+    """Порты ввода-вывода процессора
+
+    input - итерируемый объект с целыми числами, output - приемник пачек:
+    объект с методом ``extend`` (список, array) или функция; по
+    умолчанию значения собираются в список ``output``. ``consumed`` и
+    ``produced`` - число прочитанных и записанных значений.
+    """
+
+    def __init__(self, cpu, input=(), output=None, base=None, chunk=DEFAULT_CHUNK):
+        memory = cpu.data_memory
+        if base is None:
+            base = len(memory) - PORT_COUNT
+        if not 0 <= base <= len(memory) - PORT_COUNT:
+            raise ValueError(f"Порты должны помещаться в память данных (0..{len(memory)})")
+        self.cpu = cpu
+        self.base = base
+        self.chunk = chunk
+        self.output = [] if output is None else output
+        self._send = self.output.extend if hasattr(self.output, "extend") else self.output
+        self._source = iter(input)
+        self._buffer = []
+        self._index = 0
+        self._pending = []
+        self.consumed = 0
+        self.produced = 0
+        bits = memory.itemsize * 8
+        self._low = -(1 << (bits - 1))
+        self._high = (1 << (bits - 1)) - 1
+        self._mask = (1 << bits) - 1
+        cpu.set_ports(self)
+
+    def __contains__(self, addr):
+        return self.base <= addr < self.base + PORT_COUNT
+
+    def position(self):
+        """Положение в потоках (часть состояния машины)"""
+        return self.consumed, self.produced
+
+    def detach(self):
+        """Сброс выхода и отключение от процессора"""
+        self.flush()
+        self.cpu.set_ports(None)
+
+    def flush(self):
+        """Передача накопленного выхода приемнику"""
+        if self._pending:
+            self._send(self._pending)
+            self._pending = []
+
+    def _refill(self):
+        self._buffer = list(islice(self._source, self.chunk))
+        self._index = 0
+        return self._buffer
+
+    def read_input(self):
+        index = self._index
+        if index == len(self._buffer):
+            if not self._refill():
+                return 0
+            index = 0
+        self._index = index + 1
+        self.consumed += 1
+        return self._buffer[index]
+
+    def read_eof(self):
+        if self._index < len(self._buffer):
+            return 0
+        return 0 if self._refill() else 1
+
+    def write_output(self, value):
+        if not self._low <= value <= self._high:
+            value &= self._mask
+            if value > self._high:
+                value -= self._mask + 1
+        pending = self._pending
+        pending.append(value)
+        self.produced += 1
+        if len(pending) >= self.chunk:
+            self.flush()
+
+    def read(self, addr):
+        """Чтение порта по адресу памяти данных"""
+        offset = addr - self.base
+        if offset == PORT_INPUT:
+            return self.read_input()
+        if offset == PORT_EOF:
+            return self.read_eof()
+        return 0
+
+    def write(self, addr, value):
+        """Запись в порт по адресу памяти данных (кроме выхода - без действия)"""
+        if addr - self.base == PORT_OUTPUT:
+            self.write_output(value)
+
+    def accessors(self, addr):
+        """Функции чтения и записи для прямой адресации порта"""
+        offset = addr - self.base
+        if offset == PORT_INPUT:
+            return self.read_input, _ignore
+        if offset == PORT_OUTPUT:
+            return _zero, self.write_output
+        return self.read_eof, _ignore
+
+    def wrap_indirect(self, regs, operand, get, put):
+        """Функции косвенной адресации через регистр operand с учетом портов"""
+        base = self.base
+        end = base + PORT_COUNT
+        read = self.read
+        write = self.write
+
+        def port_get():
+            addr = regs[operand]
+            return read(addr) if base <= addr < end else get()
+
+        def port_put(value):
+            addr = regs[operand]
+            if base <= addr < end:
+                write(addr, value)
+            else:
+                put(value)
+
+        return port_get, port_put
+
+
+def _ignore(value):
+    pass
+
+
+def _zero():
+    return 0
+
+
+def main(argv=None):
+    from assembler import assemble
+    from cpu import CPU, CODE_SIZE, DATA_SIZE
+
+    parser = argparse.ArgumentParser(description="Выполнение программы с потоковыми портами")
+    parser.add_argument("program", help="файл программы на ассемблере")
+    parser.add_argument("--input", help="входной поток (int16, int32, npy или csv)")
+    parser.add_argument("--output", help="файл выходного потока (по умолчанию stdout)")
+    parser.add_argument("--data", default="", help="начальные данные памяти")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS)
+    parser.add_argument("--code-size", type=int, default=CODE_SIZE)
+    parser.add_argument("--data-size", type=int, default=DATA_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.program, encoding="utf-8") as f:
+        result = assemble(f.read())
+    if result.errors:
+        print(result.format_errors(), file=sys.stderr)
+        return 1
+
+    cpu = CPU(args.code_size, args.data_size)
+    cpu.load_code(result.machine_code)
+    cpu.load_data(list(map(int, args.data.split())))
+    writer = StreamWriter(args.output) if args.output else None
+    if writer is None:
+        sink = lambda values: sys.stdout.write("".join(f"{value}\n" for value in values))
+    else:
+        sink = writer
+    ports = IOPorts(cpu, read_stream(args.input) if args.input else (), sink)
+    try:
+        steps = cpu.run(args.max_steps)
+    finally:
+        ports.detach()
+        if writer is not None:
+            writer.close()
+    print(f"ACC={cpu.ACC} шагов: {steps}, прочитано: {ports.consumed}, "
+          f"записано: {ports.produced}, останов: {cpu.halt_reason}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
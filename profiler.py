@@ -0,0 +1,276 @@
+"""Профилировщик выполнения программ
+
+Считает выполнения по адресам команд и обращения (чтения и записи) по
+адресам памяти данных, а по ним - выполнения по кодам операций, оценку
+числа тактов, горячие базовые блоки и циклы. Отчет выводится текстом с
+дизассемблированием команд.
+
+Использование::
+
+    python profiler.py convolution.asm --data "3 1 2 3 4 5 6"
+"""
+
+import argparse
+import sys
+
+from assembler import MNEMONICS, assemble, disassemble
+from cpu import (
+    CPU, OP_LOAD, OP_STORE, OP_ADD, OP_SUB, OP_MUL, OP_CMP,
+    OP_JMP, OP_JZ, OP_JN, OP_INC, OP_DEC, OP_EXT,
+    ADDR_IMMEDIATE, ADDR_DIRECT, ADDR_INDIRECT, NUM_REGISTERS,
+    decode_program,
+)
+from translator import find_leaders
+
+# Тактов на команду: выборка, декодирование, исполнение (автомат cpu.v)
+CYCLES_PER_INSTRUCTION = 3
+
+READS = {OP_LOAD, OP_ADD, OP_SUB, OP_MUL, OP_CMP, OP_INC, OP_DEC, OP_JMP, OP_JZ, OP_JN}
+WRITES = {OP_STORE, OP_INC, OP_DEC}
+JUMPS = (OP_JMP, OP_JZ, OP_JN)
+
+DEFAULT_MAX_STEPS = 1000000
+
+
+def _memory_access(opcode, addr_type, operand):
+    """Обращение команды к памяти данных: (адрес, регистр, чтение, запись, флаг)
+
+    Для прямой адресации известен адрес, для косвенной - регистр; флаг -
+    имя флага, от которого зависит чтение операнда условного перехода.
+    """
+    reads = opcode in READS
+    writes = opcode in WRITES
+    if not (reads or writes):
+        return None
+    if addr_type == ADDR_DIRECT:
+        address, register = operand, 0
+    elif addr_type == ADDR_INDIRECT and 1 <= operand <= NUM_REGISTERS:
+        address, register = None, operand
+    else:
+        return None
+    flag = "Z" if opcode == OP_JZ else "N" if opcode == OP_JN else None
+    return address, register, reads, writes, flag
+
+
+class Profiler:
+    """Счетчики выполнения программы на процессоре
+
+    Выполнение идет через ``run`` или ``step`` профилировщика; счетчики
+    накапливаются до ``clear``.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.counts = [0] * len(cpu.code_memory)
+        self.reads = [0] * len(cpu.data_memory)
+        self.writes = [0] * len(cpu.data_memory)
+        self._version = None
+        self._decoded = None
+        self._access = None
+
+    def clear(self):
+        """Обнуление счетчиков"""
+        self.counts[:] = [0] * len(self.counts)
+        self.reads[:] = [0] * len(self.reads)
+        self.writes[:] = [0] * len(self.writes)
+
+    def decoded(self):
+        """Декодированная программа (кэшируется до изменения памяти команд,
+        см. ``CPU.code_version``)"""
+        cpu = self.cpu
+        if cpu.code_version != self._version:
+            self._version = cpu.code_version
+            self._decoded = decode_program(cpu.code_memory)
+            self._access = [_memory_access(*entry) for entry in self._decoded]
+        return self._decoded
+
+    def _address(self, access):
+        """Адрес, к которому обратится команда (до ее выполнения), или None"""
+        cpu = self.cpu
+        address, register, reads, writes, flag = access
+        if flag is not None and not getattr(cpu, flag):
+            return None
+        if register:
+            address = cpu.registers[register]
+        return address if 0 <= address < len(self.reads) else None
+
+    def _count_access(self, access, address):
+        if access[2]:
+            self.reads[address] += 1
+        if access[3]:
+            self.writes[address] += 1
+
+    def step(self):
+        """Выполнение одной команды с подсчетом
+
+        Возвращает результат ``CPU.execute_instruction``.
+        """
+        cpu = self.cpu
+        pc = cpu.PC
+        if not 0 <= pc < len(self.counts):
+            return cpu.execute_instruction()
+        self.decoded()
+        access = self._access[pc]
+        address = None if access is None else self._address(access)
+        running = cpu.execute_instruction()
+        # Останов по точке - до выполнения команды: не считается
+        if running or cpu.halt_reason != "break":
+            self.counts[pc] += 1
+            if address is not None:
+                self._count_access(access, address)
+        return running
+
+    def run(self, max_steps):
+        """Выполнение с подсчетом, как ``CPU.run``
+
+        Возвращает количество выполненных шагов.
+        """
+        cpu = self.cpu
+        cpu.halt_reason = None
+        code = cpu.code_memory
+        size = len(code)
+        pc = cpu.PC
+        if not 0 <= pc < size:
+            cpu.halt_reason = "end"
+            return 0
+
+        self.decoded()
+        decoded = cpu.dispatch_table()
+        counts = self.counts
+        access = self._access
+        address_of = self._address
+        count_access = self._count_access
+        steps = 0
+        last = pc
+        while steps < max_steps:
+            handler, get, put = decoded[pc]
+            entry = access[pc] if pc < size else None
+            address = None if entry is None else address_of(entry)
+            next_pc = handler(cpu, pc, get, put)
+            if pc < size and (next_pc is not None or cpu.halt_reason != "break"):
+                counts[pc] += 1
+                if address is not None:
+                    count_access(entry, address)
+            if next_pc is None:
+                cpu.IR = code[pc] if pc < size else code[last]
+                return steps
+            last = pc
+            pc = next_pc
+            steps += 1
+
+        if steps:
+            cpu.IR = code[last]
+        if pc <= size:
+            cpu.PC = pc
+        cpu.halt_reason = "max_steps"
+        return steps
+
+    # ----- отчет -----
+
+    @property
+    def total(self):
+        """Всего выполнено команд (включая HALT)"""
+        return sum(self.counts)
+
+    def cycles(self):
+        """Оценка числа тактов"""
+        return self.total * CYCLES_PER_INSTRUCTION
+
+    def opcode_counts(self):
+        """Выполнения по мнемоникам, по убыванию"""
+        totals = {}
+        for (opcode, _, _), count in zip(self.decoded(), self.counts):
+            if count:
+                name = "EXT" if opcode == OP_EXT else MNEMONICS.get(opcode, f"0x{opcode:X}")
+                totals[name] = totals.get(name, 0) + count
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+    def hot_blocks(self):
+        """Базовые блоки по убыванию числа выполненных команд
+
+        Элементы - (начало, конец, входов, команд); конец не включается.
+        """
+        decoded = self.decoded()
+        bounds = find_leaders(decoded) + [len(decoded)]
+        blocks = []
+        for start, end in zip(bounds, bounds[1:]):
+            steps = sum(self.counts[start:end])
+            if steps:
+                blocks.append((start, end, self.counts[start], steps))
+        blocks.sort(key=lambda block: -block[3])
+        return blocks
+
+    def loops(self):
+        """Циклы по обратным переходам: (начало, переход, выполнений перехода, команд)"""
+        loops = []
+        for addr, (opcode, addr_type, operand) in enumerate(self.decoded()):
+            if (opcode in JUMPS and addr_type == ADDR_IMMEDIATE
+                    and 0 <= operand <= addr and self.counts[addr]):
+                steps = sum(self.counts[operand:addr + 1])
+                loops.append((operand, addr, self.counts[addr], steps))
+        loops.sort(key=lambda loop: -loop[3])
+        return loops
+
+    def report(self, top=5):
+        """Текстовый отчет профиля"""
+        code = self.cpu.code_memory
+        total = self.total
+
+        def share(count):
+            return f"{100 * count / total:5.1f}%" if total else "  0.0%"
+
+        lines = [f"Выполнено команд: {total}, оценка тактов: {self.cycles()}", ""]
+
+        lines.append("По кодам операций:")
+        for name, count in self.opcode_counts():
+            lines.append(f"  {name:<6} {count:>10} {share(count)}")
+
+        lines += ["", "Горячие блоки:"]
+        for start, end, entries, steps in self.hot_blocks()[:top]:
+            lines.append(f"  {start:03d}-{end - 1:03d}: входов {entries}, команд {steps} {share(steps)}")
+            for addr in range(start, end):
+                lines.append(f"    {addr:03d} {self.counts[addr]:>10}  {disassemble(code[addr])}")
+
+        loops = self.loops()
+        if loops:
+            lines += ["", "Циклы (обратные переходы):"]
+            for start, jump, taken, steps in loops[:top]:
+                lines.append(f"  {start:03d}-{jump:03d}: переход выполнен {taken} раз, "
+                             f"команд {steps} {share(steps)}")
+
+        memory = [(addr, r, w) for addr, (r, w) in enumerate(zip(self.reads, self.writes)) if r or w]
+        if memory:
+            memory.sort(key=lambda cell: -(cell[1] + cell[2]))
+            lines += ["", "Память данных (чтения / записи):"]
+            for addr, r, w in memory[:top * 4]:
+                lines.append(f"  [{addr:03d}] {r:>10} / {w}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Профиль выполнения программы эмулятора")
+    parser.add_argument("program", help="файл программы на ассемблере")
+    parser.add_argument("--data", default="", help="входные данные (числа через пробел)")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS,
+                        help="бюджет шагов")
+    parser.add_argument("--top", type=int, default=5, help="число блоков и циклов в отчете")
+    args = parser.parse_args(argv)
+
+    with open(args.program, encoding="utf-8") as f:
+        result = assemble(f.read())
+    if result.errors:
+        print(result.format_errors(), file=sys.stderr)
+        return 1
+
+    cpu = CPU()
+    cpu.load_code(result.machine_code)
+    cpu.load_data(list(map(int, args.data.split())))
+    profiler = Profiler(cpu)
+    steps = profiler.run(args.max_steps)
+    print(f"Шагов: {steps}, останов: {cpu.halt_reason}, ACC = {cpu.ACC}")
+    print(profiler.report(args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
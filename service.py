@@ -0,0 +1,435 @@
+"""Сервис эмуляции: JSON поверх TCP на asyncio
+
+Сервер принимает задания по TCP, по одному JSON-объекту в строке, и
+отвечает так же::
+
+    -> {"id": 1, "source": "LOAD #5\\nHALT", "data": "1 2 3", "max_steps": 100000, "timeout": 2}
+    <- {"id": 1, "acc": 5, "registers": {"R1": 0, ...}, "steps": 1, "halt_reason": "halt"}
+
+Вместо ``source`` можно передать ``image`` - готовый образ программы
+(image.py) в base64: он не ассемблируется, а его образ данных
+используется, если в запросе нет ``data``.
+``data`` - строка или список чисел; ``max_steps`` и ``timeout`` (секунды)
+не могут превышать ограничений сервера. Выполнение, не уложившееся во
+время, прерывается с причиной "timeout". Время проверяется и самим
+рабочим процессом (между порциями шагов), и сервером: процесс, не
+ответивший через KILL_GRACE секунд после срока (например, на шагах с
+огромными числами), завершается принудительно, пул заменяется, а ответ
+содержит только id и ``"halt_reason": "timeout"``. С ``"trace": true`` перед
+результатом приходят строки ``{"id": 1, "trace": [[pc, ir, acc, z, n,
+вид записи, номер, значение, усечено], ...]}`` (tracer.py). Запрос
+``{"cancel": 1}`` снимает еще не начатое задание с этим id; ответ -
+``{"cancel": 1, "cancelled": true}``. Ответы на задания одного
+соединения приходят по мере готовности, с id задания.
+
+Исходные тексты ассемблируются (а образы разбираются) один раз - кэш по
+хэшу текста или образа, задания
+выполняются пулом заранее запущенных и прогретых процессов (как в
+batch.py). Одновременно в работе не больше ``queue_size`` заданий: при
+полной очереди сервер перестает читать запросы, и клиенты ждут на
+записи в сокет.
+
+Использование::
+
+    python service.py --port 8765 --workers 4
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from assembler import assemble
+from batch import DEFAULT_MAX_STEPS, _Worker
+from cpu import CODE_SIZE, DATA_SIZE, OP_HALT
+from image import parse_image
+from tracer import Tracer, read_trace
+
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 10.0      # Секунд на задание
+PROGRAM_CACHE = 256         # Программ в кэше ассемблирования
+TRACE_MAX_STEPS = 100000    # Бюджет шагов задания с трассой
+TRACE_CHUNK = 1024          # Записей трассы в одной строке ответа
+MAX_REQUEST_BYTES = 1 << 20
+KILL_GRACE = 1.0            # Секунд сверх timeout до завершения процесса
+
+# Состояние рабочего процесса: прогретый процессор и место в общей
+# таблице выполняемых заданий (пары номер задания, pid)
+_worker = None
+_slot = None
+
+
+def _init_worker(engine, code_size, data_size, loop_check, running, counter):
+    global _worker, _slot
+    _worker = _Worker({}, engine, code_size, data_size, loop_check)
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    if 2 * index < len(running):
+        _slot = (running, 2 * index)
+
+
+def _warm_up():
+    """Прогон программы из одной команды HALT: импорт и подготовка движка"""
+    _worker.programs[""] = (OP_HALT << 12,)
+    _worker.run({"program": ""}, 1)
+    return os.getpid()
+
+
+def _run_job(token, key, machine_code, job, max_steps, timeout, trace_path):
+    programs = _worker.programs
+    if key not in programs:
+        if len(programs) >= PROGRAM_CACHE:
+            programs.clear()
+        programs[key] = machine_code
+    if _slot is not None:
+        running, index = _slot
+        running[index + 1] = os.getpid()
+        running[index] = token
+    try:
+        deadline = time.monotonic() + timeout
+        if trace_path is None:
+            return _worker.run(job, max_steps, deadline)
+        with Tracer(_worker.cpu, trace_path) as tracer:
+            return _worker.run(job, max_steps, deadline, tracer)
+    finally:
+        if _slot is not None:
+            running[index] = 0
+
+
+def _is_job_id(value):
+    """Подходит ли значение для id задания (скаляр JSON)"""
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _limit(request, name, maximum, kind):
+    """Значение поля запроса, не больше maximum (ValueError при ошибке)"""
+    value = request.get(name, maximum)
+    if (isinstance(value, bool) or not isinstance(value, (int, float))
+            or not math.isfinite(value)):
+        raise ValueError(f"Поле {name} должно быть числом")
+    try:
+        value = kind(value)
+    except OverflowError:
+        raise ValueError(f"Поле {name} слишком велико")
+    if value < 0:
+        raise ValueError(f"Поле {name} не может быть отрицательным")
+    return min(value, maximum)
+
+
+class EmulationService:
+    """Сервер эмуляции с пулом прогретых процессов
+
+    max_steps и timeout - ограничения на одно задание, queue_size -
+    заданий в работе одновременно (по умолчанию два на процесс).
+    """
+
+    def __init__(self, workers=None, engine="interp", max_steps=DEFAULT_MAX_STEPS,
+                 timeout=DEFAULT_TIMEOUT, queue_size=None, code_size=CODE_SIZE,
+                 data_size=DATA_SIZE, loop_check=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.queue_size = queue_size or 2 * self.workers
+        self.code_size = code_size
+        self.data_size = data_size
+        self.loop_check = loop_check
+        self.programs = OrderedDict()  # Хэш -> машинный код, образ или ошибка
+        self.pool = None
+        self._jobs = None  # Таблица выполняемых заданий процессов пула
+        self._slots = None
+        self._running = None
+        self._tokens = 0
+        self._killed = weakref.WeakSet()  # Пулы, процесс которых завершен по времени
+
+    def _new_pool(self):
+        self._jobs = multiprocessing.RawArray("q", 2 * self.workers)
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self.engine, self.code_size, self.data_size,
+                                             self.loop_check, self._jobs,
+                                             multiprocessing.Value("i", 0)))
+
+    def _replace_pool(self, pool):
+        """Новый пул вместо сломанного (один раз для всех его заданий)"""
+        if self.pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    async def _execute(self, job_id, key, code, job, max_steps, timeout, trace_path):
+        """Выполнение задания в пуле с принудительным ограничением времени"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        retried = False
+        while True:
+            self._tokens += 1
+            token = self._tokens
+            pool, jobs = self.pool, self._jobs
+            remaining = max(deadline - loop.time(), 0.0)
+            future = pool.submit(_run_job, token, key, code, job, max_steps, remaining,
+                                 trace_path)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future),
+                                              remaining + KILL_GRACE)
+            except asyncio.TimeoutError:
+                # Процесс не проверил время (шаг с огромными числами длится
+                # сколько угодно): он завершается, и пул создается заново
+                if _kill_job(jobs, token):
+                    self._killed.add(pool)
+                    self._replace_pool(pool)
+                return {"id": job_id, "halt_reason": "timeout"}
+            except BrokenProcessPool:
+                # Рабочий процесс упал: пул создается заново. Задания,
+                # прерванные из-за завершения чужого процесса по времени,
+                # повторяются один раз
+                self._replace_pool(pool)
+                if pool in self._killed and not retried:
+                    retried = True
+                    continue
+                return {"id": job_id, "error": "Рабочий процесс завершился аварийно"}
+
+    async def start(self):
+        """Запуск и прогрев рабочих процессов"""
+        self.pool = self._new_pool()
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._running = asyncio.Semaphore(self.workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up)
+                               for _ in range(self.workers)))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def _cached(self, key, make):
+        programs = self.programs
+        if key in programs:
+            programs.move_to_end(key)
+            return key, programs[key]
+        code = programs[key] = make()
+        if len(programs) > PROGRAM_CACHE:
+            programs.popitem(last=False)
+        return key, code
+
+    def assemble(self, source):
+        """(ключ, машинный код или текст ошибок) с кэшированием по тексту"""
+        def make():
+            result = assemble(source)
+            return result.format_errors() if result.errors else tuple(result.machine_code)
+
+        return self._cached(hashlib.sha1(source.encode("utf-8")).hexdigest(), make)
+
+    def read_image(self, encoded):
+        """(ключ, образ или текст ошибки) для образа в base64 с кэшированием"""
+        try:
+            raw = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            return None, "Поле image должно содержать образ программы в base64"
+
+        def make():
+            try:
+                return parse_image(raw)
+            except ValueError as e:
+                return str(e)
+
+        return self._cached("image:" + hashlib.sha1(raw).hexdigest(), make)
+
+    async def run(self, request, send, pending=None):
+        """Выполнение одного задания; ответы передаются ``await send(dict)``
+
+        pending - словарь id -> задача, из которого задание удаляется, как
+        только начинает выполняться (до этого его можно отменить).
+        """
+        job_id = request.get("id")
+        if not _is_job_id(job_id):
+            await send({"error": "Поле id должно быть строкой или числом"})
+            return
+        source = request.get("source")
+        encoded = request.get("image")
+        if not isinstance(source, str) and not isinstance(encoded, str):
+            await send({"id": job_id, "error": "Нет программы (поле source или image)"})
+            return
+        try:
+            max_steps = _limit(request, "max_steps", self.max_steps, int)
+            timeout = _limit(request, "timeout", self.timeout, float)
+        except ValueError as e:
+            await send({"id": job_id, "error": str(e)})
+            return
+        if isinstance(source, str):
+            key, code = self.assemble(source)
+        else:
+            key, code = self.read_image(encoded)
+        if isinstance(code, str):
+            await send({"id": job_id, "error": code})
+            return
+
+        job = {"id": job_id, "program": key}
+        if "data" in request:
+            data = request["data"]
+            job["data"] = " ".join(map(str, data)) if isinstance(data, list) else data
+        trace_path = None
+        if request.get("trace"):
+            max_steps = min(max_steps, TRACE_MAX_STEPS)
+            fd, trace_path = tempfile.mkstemp(suffix=".trc")
+            os.close(fd)
+        task = asyncio.current_task()
+        try:
+            # Процессу передается только столько заданий, сколько он
+            # может выполнять; до этого задание можно отменить
+            async with self._running:
+                if pending is not None and pending.get(job_id) is task:
+                    del pending[job_id]
+                result = await self._execute(job_id, key, code, job, max_steps, timeout,
+                                             trace_path)
+            # Без шагов (ошибка, процесс завершен по времени) трасса неполна
+            if trace_path is not None and "steps" in result and "error" not in result:
+                await self._send_trace(job_id, trace_path, send)
+            await send(result)
+        finally:
+            if trace_path is not None:
+                os.remove(trace_path)
+
+    async def _send_trace(self, job_id, path, send):
+        chunk = []
+        for record in read_trace(path):
+            chunk.append(list(record))
+            if len(chunk) == TRACE_CHUNK:
+                await send({"id": job_id, "trace": chunk})
+                chunk = []
+        if chunk:
+            await send({"id": job_id, "trace": chunk})
+
+    async def handle(self, reader, writer):
+        """Обслуживание одного соединения (для ``asyncio.start_server``)"""
+        lock = asyncio.Lock()
+        pending = {}
+        tasks = set()
+
+        async def send(message):
+            async with lock:
+                writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                # Очередь заполнена - запросы не читаются до освобождения места
+                await self._slots.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    self._slots.release()
+                    await send({"error": f"Запрос длиннее {MAX_REQUEST_BYTES} байт"})
+                    break
+                if not line:
+                    self._slots.release()
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    self._slots.release()
+                    await send({"error": "Запрос должен быть JSON-объектом"})
+                    continue
+                if "cancel" in request:
+                    self._slots.release()
+                    job_id = request["cancel"]
+                    task = pending.pop(job_id, None) if _is_job_id(job_id) else None
+                    cancelled = task is not None and task.cancel()
+                    await send({"cancel": job_id, "cancelled": cancelled})
+                    continue
+                job_id = request.get("id")
+                if not _is_job_id(job_id):
+                    self._slots.release()
+                    await send({"error": "Поле id должно быть строкой или числом"})
+                    continue
+                task = asyncio.create_task(self.run(request, send, pending))
+                if job_id is not None:
+                    pending[job_id] = task
+                    task.add_done_callback(
+                        lambda t, i=job_id: pending.pop(i) if pending.get(i) is t else None)
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: self._slots.release())
+            # Клиент закончил передачу: ответы на начатые задания досылаются
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+
+def _kill_job(jobs, token):
+    """Завершение процесса, выполняющего задание token; найден ли он"""
+    for index in range(0, len(jobs), 2):
+        if jobs[index] == token:
+            try:
+                os.kill(jobs[index + 1], getattr(signal, "SIGKILL", signal.SIGTERM))
+            except OSError:
+                return False
+            return True
+    return False
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, **options):
+    """Запуск сервера до прерывания"""
+    service = EmulationService(**options)
+    await service.start()
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_REQUEST_BYTES)
+    try:
+        async with server:
+            print(f"Сервис эмуляции: {host}:{port}, процессов: {service.workers}",
+                  file=sys.stderr)
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервис эмуляции (JSON поверх TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    parser.add_argument("--engine", choices=("interp", "translate"), default="interp",
+                        help="движок исполнения")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS,
+                        help="наибольший бюджет шагов задания")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="наибольшее время выполнения задания (секунды)")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="заданий в работе одновременно")
+    parser.add_argument("--code-size", type=int, default=CODE_SIZE,
+                        help="размер памяти команд (слов)")
+    parser.add_argument("--data-size", type=int, default=DATA_SIZE,
+                        help="размер памяти данных (слов)")
+    parser.add_argument("--no-loop-check", action="store_true",
+                        help="не искать бесконечные циклы (расходовать весь бюджет)")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, engine=args.engine,
+                          max_steps=args.max_steps, timeout=args.timeout,
+                          queue_size=args.queue_size, code_size=args.code_size,
+                          data_size=args.data_size, loop_check=not args.no_loop_check))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+START:
+    LOAD #0
+    STORE R1     ; R1 = результат
+
+LOOP:
+    LOAD 255     ; ACC = 1, если входной поток исчерпан
+    JZ NEXT
+    JMP END
+
+NEXT:
+    LOAD 253     ; ACC = следующее значение входного потока
+    ADD R1       ; Прибавление к итоговой сумме
+    STORE R1     ; Обновление результата
+    JMP LOOP
+
+END:
+    LOAD R1      ; ACC = результат
+    STORE 254    ; Запись результата в выходной поток
+    HALT
@@ -0,0 +1,147 @@
+"""Общие функции тестов"""
+
+import os
+
+from assembler import assemble_program
+from cpu import CPU
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_program(name):
+    """Машинный код программы из корня репозитория (sum.asm, convolution.asm, sum_stream.asm)"""
+    with open(os.path.join(ROOT, name), encoding="utf-8") as f:
+        return assemble_program(f.read())
+
+
+def make_cpu(machine_code, data=(), fusion=True, idioms=True, **options):
+    cpu = CPU(**options)
+    cpu.fusion = fusion
+    cpu.idioms = idioms
+    cpu.load_code(machine_code)
+    cpu.load_data(list(data))
+    return cpu
+
+
+def state(cpu):
+    """Все наблюдаемое состояние процессора"""
+    return (cpu.ACC, cpu.PC, cpu.IR, cpu.Z, cpu.N, list(cpu.registers),
+            list(cpu.data_memory), cpu.halt_reason)
+
+
+def _wrap(value, bits):
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def reference_run(code, data, max_steps, code_size=256, data_size=256, bits=32):
+    """Простейший пошаговый интерпретатор по описанию системы команд
+
+    Не использует ни одной функции cpu.py, поэтому служит эталоном для
+    таблицы диспетчеризации, суперкоманд, транслятора и оптимизатора.
+    Возвращает (число шагов, состояние как у ``state``).
+    """
+    code = list(code[:code_size]) + [0] * (code_size - len(code[:code_size]))
+    memory = [_wrap(v, bits) for v in list(data)[:data_size]]
+    memory += [0] * (data_size - len(memory))
+    regs = [0] * 9
+    acc = pc = ir = z = n = 0
+    steps = 0
+
+    def operand_of(addr):
+        # Префиксы EXT, стоящие подряд перед командой
+        start = addr
+        while start > 0 and code[start - 1] >> 12 == 0xC:
+            start -= 1
+        value = 0
+        for word in code[start:addr + 1]:
+            value = (value << 10) | (word & 0x3FF)
+        mode = (code[addr] >> 10) & 3
+        if mode == 0:
+            width = 10 * (addr - start + 1)
+            if value >> (width - 1):
+                value -= 1 << width
+        return mode, value
+
+    def read(mode, value):
+        if mode == 0:
+            return value
+        if mode == 1:
+            return memory[value] if value < data_size else 0
+        if not 1 <= value <= 8:
+            return 0
+        if mode == 2:
+            return regs[value]
+        target = regs[value]
+        return memory[target] if 0 <= target < data_size else 0
+
+    def write(mode, value, result):
+        if mode == 1:
+            if value < data_size:
+                memory[value] = _wrap(result, bits)
+        elif mode in (2, 3) and 1 <= value <= 8:
+            if mode == 2:
+                regs[value] = result
+            elif 0 <= regs[value] < data_size:
+                memory[regs[value]] = _wrap(result, bits)
+
+    halt_reason = "max_steps"
+    while steps < max_steps:
+        if not 0 <= pc < code_size:
+            halt_reason = "end"
+            break
+        word = code[pc]
+        opcode = word >> 12
+        if opcode == 0xF:
+            ir = word
+            pc += 1
+            halt_reason = "halt"
+            break
+        mode, value = operand_of(pc)
+        ir = word
+        steps += 1
+        next_pc = pc + 1
+        if opcode in (1, 3, 4, 5, 6):
+            operand = read(mode, value)
+            result = {1: operand, 3: acc + operand, 4: acc - operand,
+                      5: acc * operand, 6: acc - operand}[opcode]
+            if opcode != 6:
+                acc = result
+            z = 1 if result == 0 else 0
+            n = 1 if result < 0 else 0
+        elif opcode == 2:
+            write(mode, value, acc)
+        elif opcode in (7, 8, 9):
+            if opcode == 7 or (opcode == 8 and z) or (opcode == 9 and n):
+                next_pc = read(mode, value)
+        elif opcode in (0xA, 0xB):
+            if mode != 0:
+                write(mode, value, read(mode, value) + (1 if opcode == 0xA else -1))
+        pc = next_pc
+    return steps, (acc, pc, ir, z, n, regs, memory, halt_reason)
+
+
+def random_program(rng, length, data_size=32, ext=True):
+    """Случайная программа из слов (с переходами внутри программы и EXT)"""
+    words = []
+    while len(words) < length:
+        opcode = rng.choice((1, 1, 2, 2, 3, 4, 5, 6, 7, 8, 8, 9, 9, 0xA, 0xA, 0xB, 0xB,
+                             0xF, 0))
+        if opcode in (7, 8, 9):
+            mode = 0 if rng.random() < 0.9 else rng.choice((1, 2))
+        else:
+            mode = rng.randrange(4)
+        if mode == 0:
+            operand = rng.randrange(-8, 8) & 0x3FF
+        elif mode == 1:
+            operand = rng.randrange(data_size + 4)
+        else:
+            operand = rng.randrange(0, 10)
+        if opcode in (7, 8, 9) and mode == 0:
+            operand = rng.randrange(length + 2)
+        if ext and opcode not in (7, 8, 9) and rng.random() < 0.05:
+            # Расширенный операнд: старшие 10 бит в префиксе EXT
+            high = rng.randrange(4) if mode else rng.choice((0, 0x3FF, 1))
+            words.append((0xC << 12) | high)
+        words.append((opcode << 12) | (mode << 10) | operand)
+    return words[:length]
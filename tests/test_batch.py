@@ -0,0 +1,45 @@
+import json
+import shutil
+
+from batch import run_batch
+from helpers import ROOT
+
+
+def write_jobs(tmp_path, lines):
+    shutil.copy(f"{ROOT}/sum.asm", tmp_path / "sum.asm")
+    path = tmp_path / "jobs.jsonl"
+    path.write_text("\n".join(line if isinstance(line, str) else json.dumps(line)
+                              for line in lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_results_in_order(tmp_path):
+    jobs = [{"id": i, "program": "sum.asm", "data": f"3 {i} {i} {i}"} for i in range(20)]
+    results = list(run_batch(write_jobs(tmp_path, jobs), workers=2, chunksize=3))
+    assert [result["id"] for result in results] == list(range(20))
+    assert [result["acc"] for result in results] == [3 * i for i in range(20)]
+
+
+def test_malformed_jobs_do_not_abort_batch(tmp_path):
+    lines = [
+        {"id": 1, "data": "1 2"},
+        {"id": 2, "program": "missing.asm"},
+        {"id": 3, "program": "sum.asm", "max_steps": "many"},
+        {"id": 4, "program": "sum.asm", "data": {"a": 1}},
+        "{not json",
+        [1, 2],
+        {"id": 7, "program": 5},
+        {"id": 8, "program": "sum.asm", "data_file": 3},
+        '{"id": 9, "program": "sum.asm", "data": [Infinity]}',
+        '{"id": 10, "program": "sum.asm", "data": [1e400]}',
+        {"id": 11, "program": "sum.asm", "data": [1.5, 2.7]},
+        {"id": 12, "program": "sum.asm", "data": [True]},
+        {"id": 13, "program": "sum.asm", "data": [2, 4, 5]},
+    ]
+    results = list(run_batch(write_jobs(tmp_path, lines), workers=1))
+    assert len(results) == len(lines)
+    assert all("error" in result for result in results[:-1])
+    assert results[1]["id"] == 2
+    assert results[4]["id"] is None and "Строка 5" in results[4]["error"]
+    assert [result["id"] for result in results[8:]] == [9, 10, 11, 12, 13]
+    assert results[-1]["acc"] == 9
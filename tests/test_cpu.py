@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from assembler import assemble_program
+from cpu import CPU, ChangeTracker, decode_program
+from helpers import make_cpu, random_program, read_program, reference_run, state
+
+
+@pytest.mark.parametrize("name, data, acc", [
+    ("sum.asm", [10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 55),
+    ("convolution.asm", [3, 1, 2, 3, 4, 5, 6], 32),
+])
+def test_bundled_programs(name, data, acc):
+    cpu = make_cpu(read_program(name), data)
+    cpu.run(100000)
+    assert cpu.halt_reason == "halt"
+    assert cpu.ACC == acc
+
+
+def test_dispatch_matches_reference():
+    # Таблица диспетчеризации без суперкоманд против эталонного интерпретатора
+    for seed in range(500):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        max_steps = rng.choice((5, 50, 500))
+        cpu = make_cpu(code, data, fusion=False, code_size=64, data_size=32)
+        steps = cpu.run(max_steps)
+        assert (steps, state(cpu)) == reference_run(code, data, max_steps, 64, 32), seed
+
+
+def test_single_steps_match_run():
+    for seed in range(200):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 30))
+        data = [rng.randrange(-50, 50) for _ in range(8)]
+        whole = make_cpu(code, data, fusion=False, code_size=64, data_size=32)
+        steps = whole.run(200)
+        stepped = make_cpu(code, data, code_size=64, data_size=32)
+        count = 0
+        while count < 200 and stepped.execute_instruction():
+            count += 1
+        assert count == steps, seed
+        assert state(stepped)[:7] == state(whole)[:7], seed
+
+
+def test_ext_operands():
+    code = assemble_program("""
+        LOAD #5000
+        STORE 3000
+        LOAD #-3000
+        ADD 3000
+        STORE R1
+        LOAD #2999
+        STORE R2
+        INC [R2]
+        INC R2
+        LOAD [R2]
+        HALT
+    """)
+    assert any(word >> 12 == 0xC for word in code)
+    cpu = make_cpu(code, code_size=256, data_size=4096)
+    cpu.run(1000)
+    assert cpu.halt_reason == "halt"
+    assert cpu.registers[1] == 2000
+    assert cpu.data_memory[2999] == 1
+    assert cpu.ACC == 5000
+
+
+def test_ext_decoding():
+    # EXT 0x3FF + непосредственный 0x3FF = -1 в 20 битах
+    code = [(0xC << 12) | 0x3FF, (0x1 << 12) | 0x3FF, 0xF000]
+    assert decode_program(code)[1] == (0x1, 0, -1)
+    cpu = make_cpu(code)
+    cpu.run(10)
+    assert cpu.ACC == -1 and cpu.N == 1
+
+
+def test_memory_wraps_to_cell_width():
+    cpu = CPU(word_type="h")
+    cpu.load_code(assemble_program("LOAD #511\nMUL #511\nMUL #511\nSTORE 0\nHALT"))
+    cpu.run(10)
+    assert cpu.data_memory[0] == ((511 ** 3 + 2 ** 15) % 2 ** 16) - 2 ** 15
+
+
+def test_code_change_invalidates_decode():
+    cpu = make_cpu(assemble_program("LOAD #1\nHALT"))
+    cpu.run(10)
+    cpu.load_code(assemble_program("LOAD #2\nHALT"))
+    cpu.restart([])
+    cpu.run(10)
+    assert cpu.ACC == 2
+
+
+def test_change_tracker_matches_snapshots():
+    for seed in range(100):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 30))
+        cpu = make_cpu(code, [rng.randrange(-9, 9) for _ in range(8)],
+                       code_size=64, data_size=200)
+        tracker = ChangeTracker(cpu)
+        tracker.collect()
+        assert cpu.fused_table() is not None
+        registers, memory = list(cpu.registers), list(cpu.data_memory)
+        cpu.run(rng.randrange(1, 100))
+        _, changed_registers, changed_cells = tracker.collect()
+        assert changed_registers == {i for i, value in enumerate(cpu.registers)
+                                     if value != registers[i]}, seed
+        assert changed_cells == {i for i, value in enumerate(cpu.data_memory)
+                                 if value != memory[i]}, seed
@@ -0,0 +1,23 @@
+import pytest
+
+from cpu import CPU
+from debugger import compile_condition
+
+
+def test_condition_values():
+    cpu = CPU()
+    cpu.ACC = -3
+    cpu.registers[1] = 5
+    cpu.data_memory[5] = 40
+    assert compile_condition("ACC < 0 and [R1] == 40")(cpu)
+    assert compile_condition("(R1 << 3) + (ACC >> 1) == 38")(cpu)
+    assert not compile_condition("[300] != 0")(cpu)
+
+
+@pytest.mark.parametrize("text", [
+    "ACC << 10**9", "ACC << 1000000000", "ACC << 65", "ACC << R1", "ACC >> -1",
+    "ACC ** 2", "cpu.ACC", "[1, 2]",
+])
+def test_rejected_conditions(text):
+    with pytest.raises(ValueError):
+        compile_condition(text)
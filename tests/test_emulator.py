@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import emulator
+from helpers import ROOT
+
+SUM = f"{ROOT}/sum.asm"
+
+
+def test_run_json(capsys):
+    assert emulator.main(["run", SUM, "--data", "3 1 2 3", "--json"]) == 0
+    state = json.loads(capsys.readouterr().out)
+    assert state["ACC"] == 6 and state["halt_reason"] == "halt"
+
+
+def test_image_round_trip(tmp_path, capsys):
+    image = str(tmp_path / "sum.emi")
+    assert emulator.main(["assemble", SUM, "-o", image, "--data", "2 20 22"]) == 0
+    assert emulator.main(["run", image, "--json"]) == 0
+    assert json.loads(capsys.readouterr().out)["ACC"] == 42
+
+
+@pytest.mark.parametrize("argv", [
+    ["run", "missing.asm"],
+    ["run", SUM, "--code-size", "0"],
+    ["run", SUM, "--data-size", "100000"],
+    ["run", SUM, "--data", "1 x"],
+    ["run", SUM, "--data", "1 1", "--dump", "/nonexistent/dir/out.csv"],
+    ["assemble", SUM, "-o", "/nonexistent/dir/sum.emi"],
+    ["assemble", SUM, "-o", "sum.emi", "--data", "1 x"],
+    ["disasm", "missing.mem"],
+])
+def test_errors_exit_with_code_1(argv, capsys):
+    assert emulator.main(argv) == 1
+    assert capsys.readouterr().err
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from cpu import MAX_FUSED
+from helpers import make_cpu, random_program, read_program, reference_run, state
+from ports import IOPorts
+
+
+def loop_program(rng, length):
+    """Случайное тело цикла со счетчиком в R8: суперкоманды строятся всегда"""
+    body = random_program(rng, length, ext=False)
+    body = [word for word in body if word >> 12 not in (0x7, 0x8, 0x9, 0xF, 0xC)]
+    return ([0x1000 | 50, 0x2808]  # LOAD #50, STORE R8
+            + body
+            # DEC R8, LOAD R8, JZ на HALT, JMP на начало тела, HALT
+            + [0xB808, 0x1808, 0x8000 | (len(body) + 6), 0x7002, 0xF000])
+
+
+@pytest.mark.parametrize("name, data", [
+    ("sum.asm", [10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    ("convolution.asm", [3, 1, 2, 3, 4, 5, 6]),
+])
+def test_every_budget_matches_plain_dispatch(name, data):
+    code = read_program(name)
+    assert make_cpu(code, data, idioms=False).fused_table() is not None
+    for max_steps in range(MAX_FUSED * 2, 300):
+        fused = make_cpu(code, data, idioms=False)
+        plain = make_cpu(code, data, fusion=False)
+        assert (fused.run(max_steps), state(fused)) == (plain.run(max_steps), state(plain)), \
+            max_steps
+
+
+def test_loops_match_reference():
+    fused_blocks = 0
+    for seed in range(300):
+        rng = random.Random(seed)
+        code = loop_program(rng, rng.randrange(1, 2 * MAX_FUSED))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        max_steps = rng.choice((MAX_FUSED + 1, 50, 333, 5000))
+        cpu = make_cpu(code, data, idioms=False, code_size=64, data_size=32)
+        fused_blocks += sum(entry[3] > 1 for entry in cpu.fused_table())
+        steps = cpu.run(max_steps)
+        assert (steps, state(cpu)) == reference_run(code, data, max_steps, 64, 32), seed
+    assert fused_blocks > 300
+
+
+def test_random_programs_match_reference():
+    for seed in range(500):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        max_steps = rng.choice((MAX_FUSED + 1, 50, 500))
+        cpu = make_cpu(code, data, idioms=False, code_size=64, data_size=32)
+        steps = cpu.run(max_steps)
+        assert (steps, state(cpu)) == reference_run(code, data, max_steps, 64, 32), seed
+
+
+def test_disabled_with_hooks_and_ports():
+    code = read_program("sum.asm")
+    cpu = make_cpu(code)
+    assert cpu.fused_table() is not None
+    hook = lambda kind, index, old, new: None
+    cpu.add_write_hook(hook)
+    assert cpu.fused_table() is None
+    cpu.remove_write_hook(hook)
+    ports = IOPorts(cpu)
+    assert cpu.fused_table() is None
+    ports.detach()
+    assert cpu.fused_table() is not None
+
+
+def test_rebuilt_after_code_reload():
+    cpu = make_cpu(read_program("sum.asm"), [3, 1, 2, 3])
+    table = cpu.fused_table()
+    cpu.load_code(read_program("convolution.asm"))
+    assert cpu.fused_table() is not table
+    cpu.load_data([3, 1, 2, 3, 4, 5, 6])
+    cpu.run(100000)
+    assert cpu.ACC == 32
@@ -0,0 +1,88 @@
+import pytest
+
+from assembler import assemble_program
+from helpers import make_cpu, read_program, state
+
+np = pytest.importorskip("numpy")
+
+# Проверка счетчика в конце тела
+BOTTOM_TEST = """
+        LOAD #1
+        STORE R1
+        LOAD 0
+        STORE R3
+        LOAD #0
+        STORE R2
+LOOP:   LOAD [R1]
+        ADD R2
+        STORE R2
+        INC R1
+        DEC R3
+        LOAD R3
+        CMP #0
+        JZ END
+        JMP LOOP
+END:    LOAD R2
+        HALT
+"""
+
+
+def run_both(machine_code, data, max_steps=100000, **options):
+    """Состояния после выполнения с распознаванием циклов и без него"""
+    results = []
+    for idioms in (True, False):
+        cpu = make_cpu(machine_code, data, idioms=idioms, **options)
+        steps = cpu.run(max_steps)
+        results.append((steps, state(cpu)))
+    return results
+
+
+def test_reductions_found():
+    import idioms
+    from cpu import decode_program
+
+    for name in ("sum.asm", "convolution.asm"):
+        code = read_program(name)
+        assert idioms.find_reductions(decode_program(code), code)
+
+
+@pytest.mark.parametrize("name, data", [
+    ("sum.asm", [10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    ("sum.asm", [0]),
+    ("sum.asm", [1, -7]),
+    ("convolution.asm", [3, 1, 2, 3, 4, 5, 6]),
+    ("convolution.asm", [5, -1, 2, -3, 4, -5, 6, -7, 8, -9, 10]),
+])
+def test_matches_stepwise(name, data):
+    with_idioms, without = run_both(read_program(name), data)
+    assert with_idioms == without
+
+
+def test_bottom_test_loop():
+    code = assemble_program(BOTTOM_TEST)
+    data = [6, 4, -8, 15, 16, 23, 42]
+    with_idioms, without = run_both(code, data)
+    assert with_idioms == without
+    assert with_idioms[1][0] == sum(data[1:])
+
+
+@pytest.mark.parametrize("max_steps", [1, 7, 30, 57, 99])
+def test_step_budget(max_steps):
+    # Бюджет заканчивается посреди цикла: те же шаги и состояние
+    data = [10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    with_idioms, without = run_both(read_program("sum.asm"), data, max_steps)
+    assert with_idioms == without
+
+
+def test_int64_min_does_not_overflow():
+    # np.abs(INT64_MIN) отрицателен: сумма должна считаться точно
+    data = [3, -2 ** 63, -2 ** 63, 5]
+    with_idioms, without = run_both(read_program("sum.asm"), data, word_type="q")
+    assert with_idioms == without
+    assert with_idioms[1][0] == -2 ** 64 + 5
+
+
+def test_int64_min_dot_product():
+    data = [2, -2 ** 63, 3, -2 ** 63, 2]
+    with_idioms, without = run_both(read_program("convolution.asm"), data, word_type="q")
+    assert with_idioms == without
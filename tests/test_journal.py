@@ -0,0 +1,66 @@
+import random
+
+from assembler import assemble_program
+from debugger import Debugger
+from helpers import make_cpu, random_program, read_program, state
+from journal import Journal
+
+
+def test_back_restores_every_step():
+    for seed in range(100):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 30))
+        cpu = make_cpu(code, [rng.randrange(-9, 9) for _ in range(16)],
+                       code_size=64, data_size=32)
+        journal = Journal(cpu)
+        history = []
+        for _ in range(60):
+            before = state(cpu)[:7]
+            running = journal.step()
+            if len(journal) > len(history):
+                history.append(before)
+            if not running:
+                break
+        assert history, seed
+        while history:
+            assert journal.back(), seed
+            assert state(cpu)[:7] == history.pop(), seed
+
+
+def test_breakpoint_is_not_recorded():
+    cpu = make_cpu(read_program("sum.asm"), [3, 1, 2, 3])
+    journal = Journal(cpu)
+    debugger = Debugger(cpu)
+    debugger.add_breakpoint(6)
+    steps = journal.run(1000)
+    assert cpu.halt_reason == "break" and cpu.PC == 6
+    assert len(journal) == steps
+    # Шаг на точке останова тоже не записывается
+    assert not journal.step()
+    assert len(journal) == steps
+    journal.back()
+    assert cpu.PC == 5
+
+
+def test_run_back_to_start():
+    cpu = make_cpu(assemble_program("LOAD #3\nSTORE 0\nDEC 0\nLOAD 0\nJZ 6\nJMP 2\nHALT"))
+    journal = Journal(cpu)
+    start = state(cpu)
+    journal.run(100)
+    assert cpu.halt_reason == "halt"
+    while journal.back():
+        pass
+    assert state(cpu)[:7] == start[:7]
+
+
+def test_write_hook_only_while_recording():
+    cpu = make_cpu(read_program("sum.asm"), [3, 1, 2, 3])
+    journal = Journal(cpu)
+    assert cpu.fused_table() is not None
+    journal.step()
+    journal.step()
+    assert cpu.fused_table() is None
+    journal.detach()
+    assert cpu.fused_table() is not None
+    assert journal.back() and journal.back()
+    assert cpu.PC == 0
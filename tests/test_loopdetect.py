@@ -0,0 +1,75 @@
+import random
+
+from assembler import assemble_program
+from helpers import make_cpu, random_program, state
+from loopdetect import LoopDetector, SliceLoopDetector
+
+
+def run_detector(detector_type, code, data, max_steps, **options):
+    cpu = make_cpu(code, data, code_size=64, data_size=32)
+    detector = detector_type(cpu, **options)
+    detector.start()
+    steps = detector.run(max_steps)
+    if isinstance(detector, LoopDetector):
+        detector.detach()
+    return cpu, steps, detector.loop
+
+
+def test_slices_agree_with_steps():
+    loops = 0
+    for seed in range(300):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        stepped, steps, loop = run_detector(LoopDetector, code, data, 100000)
+        sliced, sliced_steps, sliced_loop = run_detector(SliceLoopDetector, code, data, 100000,
+                                                         slice_steps=rng.choice((7, 64, 1000)))
+        if loop is None:
+            assert (sliced_steps, state(sliced)) == (steps, state(stepped)), seed
+        else:
+            loops += 1
+            assert sliced.halt_reason == "loop", seed
+            assert sliced_loop[1] == loop[1], seed
+    assert loops > 30
+
+
+def test_long_period_found_between_slices():
+    # Период 5 * 2000 + 3 шагов (CMP с префиксом EXT): длиннее первых
+    # пошаговых проверок
+    code = assemble_program("""
+        L: INC R1
+           LOAD R1
+           CMP #2000
+           JN L
+           LOAD #0
+           STORE R1
+           JMP L
+    """)
+    cpu, steps, loop = run_detector(SliceLoopDetector, code, [], 10 ** 8)
+    assert cpu.halt_reason == "loop"
+    assert loop[1] == 5 * 2000 + 3
+    assert steps < 2 * 10 ** 7
+
+
+def test_halting_program_keeps_fast_engine():
+    code = assemble_program("""
+           LOAD #100000
+           STORE R1
+        L: DEC R1
+           LOAD R1
+           JZ E
+           JMP L
+        E: HALT
+    """)
+    cpu = make_cpu(code)
+    calls = []
+
+    def execute(max_steps):
+        calls.append(max_steps)
+        return cpu.run(max_steps)
+
+    detector = SliceLoopDetector(cpu, execute, slice_steps=1000)
+    detector.start()
+    assert detector.run(10 ** 6) == 4 * 100000 + 2
+    assert cpu.halt_reason == "halt"
+    assert sum(calls) > 0.9 * 4 * 100000
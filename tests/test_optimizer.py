@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from assembler import assemble_program
+from helpers import random_program, read_program, reference_run
+from optimizer import measure, optimize
+
+
+def final_state(code, data, max_steps=5000):
+    """Результат выполнения без PC и IR: адреса команд меняются
+
+    Память команд - ровно программа: переход за ее конец останавливает
+    обе версии, а не выполняет разное число пустых ячеек.
+    """
+    steps, (acc, pc, ir, z, n, regs, memory, halt_reason) = reference_run(
+        code, data, max_steps, len(code), 32)
+    return steps, (acc, z, n, regs, memory, halt_reason)
+
+
+@pytest.mark.parametrize("name, data", [
+    ("sum.asm", [10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    ("convolution.asm", [3, 1, 2, 3, 4, 5, 6]),
+])
+def test_bundled_programs(name, data):
+    code = read_program(name)
+    result = optimize(code)
+    assert result.skipped is None
+    before, after, same = measure(code, result.machine_code, data)
+    assert same
+    assert after <= before
+
+
+def test_sum_loses_redundant_compare():
+    code = read_program("sum.asm")
+    result = optimize(code)
+    assert [text for _, text in result.removed] == ["CMP #0"]
+    before, after, _ = measure(code, result.machine_code, [10] + [1] * 10)
+    assert before - after == 11
+
+
+def test_random_programs_keep_behaviour():
+    optimized = 0
+    for seed in range(500):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        result = optimize(code)
+        if result.skipped:
+            assert result.machine_code == tuple(code), seed
+            continue
+        optimized += 1
+        before, expected = final_state(code, data)
+        if expected[-1] == "max_steps":
+            continue
+        after, actual = final_state(result.machine_code, data)
+        assert actual == expected, seed
+        assert after <= before, seed
+    assert optimized > 100
+
+
+def test_jumps_are_threaded():
+    code = assemble_program("""
+        JMP A
+        HALT
+    A:  JMP 4
+        HALT
+        JMP B
+    B:  LOAD #7
+        HALT
+    """)
+    result = optimize(code)
+    assert result.threaded >= 1
+    assert result.machine_code[0] == assemble_program(f"JMP {result.address_map[5]}")[0]
+    assert final_state(result.machine_code, [])[1] == final_state(code, [])[1]
+
+
+def test_computed_jump_is_skipped():
+    code = (0x7801, 0xF000)  # JMP R1
+    result = optimize(code)
+    assert result.skipped
+    assert result.machine_code == code
+    assert result.address_map == [0, 1, 2]
@@ -0,0 +1,52 @@
+import os
+
+from assembler import assemble_program
+from helpers import ROOT, make_cpu, read_program
+from ports import IOPorts, main
+
+
+def test_sum_stream():
+    values = list(range(-50, 1000))
+    for chunk in (1, 7, 65536):
+        cpu = make_cpu(read_program("sum_stream.asm"))
+        ports = IOPorts(cpu, iter(values), chunk=chunk)
+        cpu.run(10 ** 6)
+        ports.detach()
+        assert cpu.halt_reason == "halt"
+        assert ports.output == [sum(values)]
+        assert ports.position() == (len(values), 1)
+
+
+def test_sum_stream_empty_input():
+    cpu = make_cpu(read_program("sum_stream.asm"))
+    ports = IOPorts(cpu)
+    cpu.run(1000)
+    ports.detach()
+    assert ports.output == [0]
+
+
+def test_indirect_access_and_output_wrap():
+    code = assemble_program("""
+        LOAD #253
+        STORE R1
+        LOAD [R1]
+        ADD [R1]
+        INC R1
+        STORE [R1]
+        HALT
+    """)
+    cpu = make_cpu(code)
+    ports = IOPorts(cpu, [2 ** 31 - 1, 1])
+    cpu.run(100)
+    ports.detach()
+    assert ports.output == [-2 ** 31]
+
+
+def test_main(tmp_path, capsys):
+    path = tmp_path / "values.csv"
+    path.write_text("1 2 3\n4, 5\n", encoding="utf-8")
+    output = tmp_path / "out.csv"
+    program = os.path.join(ROOT, "sum_stream.asm")
+    assert main([program, "--input", str(path), "--output", str(output)]) == 0
+    assert output.read_text(encoding="utf-8") == "15\n"
+    assert "прочитано: 5" in capsys.readouterr().err
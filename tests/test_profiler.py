@@ -0,0 +1,50 @@
+from assembler import assemble_program
+from debugger import Debugger
+from helpers import make_cpu, read_program
+from profiler import Profiler
+
+DATA = [4, 1, 2, 3, 4]
+
+
+def test_run_and_step_agree():
+    code = read_program("sum.asm")
+    ran = Profiler(make_cpu(code, DATA))
+    steps = ran.run(1000)
+    assert ran.total == steps + 1  # HALT тоже считается
+    stepped = Profiler(make_cpu(code, DATA))
+    while stepped.step():
+        pass
+    assert stepped.counts == ran.counts
+    assert stepped.reads == ran.reads and stepped.writes == ran.writes
+    assert ran.reads[1:5] == [1, 1, 1, 1]
+
+
+def test_breakpoint_counted_once():
+    for use_run in (True, False):
+        cpu = make_cpu(read_program("sum.asm"), DATA)
+        profiler = Profiler(cpu)
+        debugger = Debugger(cpu)
+        debugger.add_breakpoint(6)
+        if use_run:
+            profiler.run(1000)
+        else:
+            while profiler.step():
+                pass
+        assert cpu.halt_reason == "break" and profiler.counts[6] == 0
+        debugger.resume()
+        if use_run:
+            profiler.run(1)
+        else:
+            profiler.step()
+        assert profiler.counts[6] == 1
+
+
+def test_decode_cache_follows_code_changes():
+    cpu = make_cpu(assemble_program("LOAD 0\nHALT"))
+    profiler = Profiler(cpu)
+    profiler.step()
+    assert profiler.reads[0] == 1
+    cpu.load_code(assemble_program("LOAD 1\nHALT"))
+    cpu.restart([])
+    profiler.step()
+    assert profiler.reads[1] == 1
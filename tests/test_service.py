@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+from service import EmulationService
+
+
+async def _exchange(requests, replies):
+    service = EmulationService(workers=1)
+    await service.start()
+    server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+    try:
+        reader, writer = await asyncio.open_connection(
+            "127.0.0.1", server.sockets[0].getsockname()[1])
+        for request in requests:
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        result = [json.loads(await asyncio.wait_for(reader.readline(), 10))
+                  for _ in range(replies)]
+        writer.close()
+        return result
+    finally:
+        server.close()
+        service.close()
+
+
+@pytest.mark.parametrize("job_id", [[4], {"a": 1}])
+def test_unhashable_id_gets_error(job_id):
+    replies = asyncio.run(_exchange([{"id": job_id, "source": "HALT"},
+                                     {"id": 2, "source": "LOAD #5\nHALT"}], 2))
+    assert replies[0] == {"error": "Поле id должно быть строкой или числом"}
+    assert replies[1]["id"] == 2 and replies[1]["acc"] == 5
+
+
+def test_run_and_errors():
+    replies = asyncio.run(_exchange([
+        {"id": 1, "source": "LOAD 0\nADD 1\nHALT", "data": [2, 3]},
+        {"id": 2, "source": "BAD"},
+        {"id": 3, "source": "JMP 0", "max_steps": 50000, "timeout": 5},
+    ], 3))
+    by_id = {reply["id"]: reply for reply in replies}
+    assert by_id[1]["acc"] == 5 and by_id[1]["halt_reason"] == "halt"
+    assert "error" in by_id[2]
+    assert by_id[3]["halt_reason"] in ("loop", "max_steps")
+
+
+SQUARING = "LOAD #3\nSTORE R1\nL: LOAD R1\nMUL R1\nSTORE R1\nJMP L"
+
+
+def test_hung_worker_is_killed():
+    replies = asyncio.run(_exchange([
+        {"id": 1, "source": SQUARING, "timeout": 0.5},
+        {"id": 2, "source": "LOAD #5\nHALT"},
+    ], 2))
+    by_id = {reply["id"]: reply for reply in replies}
+    assert by_id[1] == {"id": 1, "halt_reason": "timeout"}
+    assert by_id[2]["acc"] == 5
+
+
+@pytest.mark.parametrize("field, value", [
+    ("timeout", float("nan")), ("timeout", float("inf")),
+    ("max_steps", float("inf")), ("max_steps", 1e400),
+])
+def test_non_finite_limits_rejected(field, value):
+    replies = asyncio.run(_exchange([{"id": 1, "source": "HALT", field: value}], 1))
+    assert replies[0]["id"] == 1 and "error" in replies[0]
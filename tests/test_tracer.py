@@ -0,0 +1,125 @@
+import io
+import random
+
+from assembler import assemble_program
+from debugger import Debugger
+from helpers import make_cpu, random_program, state
+from tracer import Tracer, TraceRecord, diff_traces, read_trace, replay
+
+
+def _wrap64(value):
+    return (value + (1 << 63)) % (1 << 64) - (1 << 63)
+
+
+def reference_records(cpu, max_steps):
+    """Записи трассы по одному шагу ``CPU.run(1)`` с наблюдателем записи"""
+    records = []
+    writes = []
+    cpu.add_write_hook(lambda kind, index, old, new: writes.append((kind, index, new)))
+    for _ in range(max_steps + 1):
+        pc = cpu.PC
+        del writes[:]
+        done = cpu.run(1)
+        executed = done or (pc < len(cpu.code_memory) and cpu.halt_reason != "break")
+        if executed:
+            kind, index, value = writes[-1] if writes else (None, 0, 0)
+            truncated = _wrap64(cpu.ACC) != cpu.ACC or _wrap64(value) != value
+            records.append(TraceRecord(pc, cpu.IR, _wrap64(cpu.ACC), cpu.Z, cpu.N, kind, index,
+                                       _wrap64(value), truncated))
+        if not done:
+            break
+    return records
+
+
+def traced(code, data, max_steps, rng=None, chunk_records=4):
+    """Трасса программы: run порциями и отдельные step (при rng)"""
+    cpu = make_cpu(code, data, code_size=64, data_size=32)
+    out = io.BytesIO()
+    with Tracer(cpu, out, chunk_records) as tracer:
+        steps = 0
+        while steps < max_steps:
+            if rng is not None and rng.random() < 0.3:
+                if not tracer.step():
+                    break
+                steps += 1
+                continue
+            budget = min(max_steps - steps, rng.randrange(1, 20) if rng else max_steps)
+            steps += tracer.run(budget)
+            if cpu.halt_reason != "max_steps":
+                break
+    out.seek(0)
+    return cpu, list(read_trace(out))
+
+
+def test_trace_matches_steps():
+    for seed in range(300):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        expected = reference_records(make_cpu(code, data, code_size=64, data_size=32), 300)
+        cpu, records = traced(code, data, 300, rng, rng.choice((1, 3, 64)))
+        assert records == expected[:len(records)], seed
+        assert len(records) in (len(expected), len(expected) - 1), seed
+
+
+def test_trace_leaves_cpu_as_run():
+    for seed in range(100):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(8)]
+        plain = make_cpu(code, data, code_size=64, data_size=32)
+        steps = plain.run(500)
+        cpu, records = traced(code, data, 500)
+        assert state(cpu) == state(plain), seed
+        assert len(records) == steps + (plain.halt_reason == "halt"), seed
+
+
+def test_breakpoint_trap_not_recorded():
+    code = assemble_program("LOAD #1\nADD #2\nCMP #3\nADD #4\nHALT")
+    cpu = make_cpu(code)
+    debugger = Debugger(cpu)
+    debugger.add_breakpoint(3)
+    out = io.BytesIO()
+    with Tracer(cpu, out) as tracer:
+        assert tracer.run(100) == 3
+        assert cpu.halt_reason == "break"
+        debugger.resume()
+        tracer.run(100)
+    out.seek(0)
+    records = list(read_trace(out))
+    assert [record.pc for record in records] == [0, 1, 2, 3, 4]
+    assert (records[2].z, records[2].n) == (1, 0)
+    assert records[3].acc == 7
+
+
+def test_wide_acc_truncated():
+    # -1000 ** 7 не помещается в 64 бита
+    code = assemble_program("LOAD #-1000\nSTORE R1\n" + "MUL R1\n" * 6 + "CMP #1\nHALT")
+    cpu, records = traced(code, [], 100)
+    assert cpu.ACC == -1000 ** 7
+    # Первая команда - префикс EXT операнда -1000
+    assert [record.truncated for record in records] == [False] * 8 + [True] * 3
+    wide = records[8]
+    assert wide.acc == _wrap64(-1000 ** 7)
+    assert (wide.z, wide.n) == (0, 1)
+    assert (records[9].z, records[9].n) == (0, 1)
+    assert (records[7].acc, records[7].n) == (1000 ** 6, 0)
+
+
+def test_replay_and_diff():
+    code = assemble_program("LOAD 0\nL: ADD 1\nSTORE 1\nDEC 0\nLOAD 0\nJZ E\nJMP L\nE: HALT")
+    traces = []
+    for data in ([3, 1], [3, 1], [3, 2]):
+        cpu = make_cpu(code, data)
+        out = io.BytesIO()
+        with Tracer(cpu, out, chunk_records=5) as tracer:
+            tracer.run(1000)
+        traces.append(out.getvalue())
+    assert diff_traces(io.BytesIO(traces[0]), io.BytesIO(traces[1])) is None
+    step, a, b = diff_traces(io.BytesIO(traces[0]), io.BytesIO(traces[2]))
+    assert (step, a.acc, b.acc) == (1, 4, 5)
+
+    target = make_cpu(code, [3, 1])
+    records = list(replay(io.BytesIO(traces[0]), target))
+    assert len(records) == 19
+    assert (target.ACC, target.Z, target.data_memory[0], target.data_memory[1]) == (0, 1, 0, 7)
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from helpers import make_cpu, random_program, read_program, reference_run, state
+from translator import translate
+
+
+def run_translated(code, data, max_steps, code_size=256, data_size=256):
+    cpu = make_cpu(code, data, code_size=code_size, data_size=data_size)
+    steps = translate(code, code_size, data_size).run(cpu, max_steps)
+    return steps, state(cpu)
+
+
+@pytest.mark.parametrize("name, data", [
+    ("sum.asm", [10, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    ("convolution.asm", [3, 1, 2, 3, 4, 5, 6]),
+])
+@pytest.mark.parametrize("max_steps", [3, 40, 100000])
+def test_bundled_programs(name, data, max_steps):
+    code = read_program(name)
+    cpu = make_cpu(code, data)
+    steps = cpu.run(max_steps)
+    assert run_translated(code, data, max_steps) == (steps, state(cpu))
+
+
+def test_random_programs_match_reference():
+    for seed in range(500):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 40))
+        data = [rng.randrange(-50, 50) for _ in range(rng.randrange(32))]
+        max_steps = rng.choice((5, 50, 500))
+        expected = reference_run(code, data, max_steps, 64, 32)
+        assert run_translated(code, data, max_steps, 64, 32) == expected, seed
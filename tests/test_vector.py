@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from assembler import assemble_program
+from helpers import make_cpu, random_program
+
+np = pytest.importorskip("numpy")
+vector = pytest.importorskip("vector")
+
+
+def lane_state(vcpu, lane):
+    return (int(vcpu.ACC[lane]), int(vcpu.PC[lane]), int(vcpu.Z[lane]), int(vcpu.N[lane]),
+            vcpu.registers[:, lane].tolist(), vcpu.data_memory[lane].tolist(),
+            vcpu.halt_reason[lane])
+
+
+def cpu_state(cpu):
+    return (cpu.ACC, cpu.PC, cpu.Z, cpu.N, list(cpu.registers), list(cpu.data_memory),
+            cpu.halt_reason)
+
+
+def test_lanes_match_cpu():
+    for seed in range(100):
+        rng = random.Random(seed)
+        code = random_program(rng, rng.randrange(3, 30))
+        data = [[rng.randrange(-50, 50) for _ in range(8)] for _ in range(6)]
+        vcpu = vector.run_lanes(code, data, 200, data_size=32, code_size=64)
+        for lane, values in enumerate(data):
+            cpu = make_cpu(code, values, fusion=False, code_size=64, data_size=32)
+            steps = cpu.run(200)
+            assert int(vcpu.steps[lane]) == steps, seed
+            assert lane_state(vcpu, lane) == cpu_state(cpu), seed
+
+
+def test_overflow_stops_lane():
+    code = assemble_program("LOAD 0\nSTORE R1\nL: MUL R1\nJMP L")
+    vcpu = vector.run_lanes(code, [[1000], [1], [0]], 40, word_type="q")
+    assert vcpu.halt_reason == ["overflow", "max_steps", "max_steps"]
+    # Перед седьмым умножением: 1000 ** 6 помещается в int64, 1000 ** 7 - нет
+    assert int(vcpu.ACC[0]) == 1000 ** 6 and int(vcpu.PC[0]) == 2
+
+    cpu = vcpu.lane_cpu(0)
+    cpu.run(40 - int(vcpu.steps[0]))
+    reference = make_cpu(code, [1000], word_type="q")
+    reference.run(40)
+    assert cpu_state(cpu) == cpu_state(reference)
+
+
+@pytest.mark.parametrize("source, values", [
+    ("LOAD 0\nADD 0\nHALT", [2 ** 62]),
+    ("LOAD 0\nSUB 1\nHALT", [-2 ** 62, 2 ** 62 + 1]),
+    ("LOAD 0\nCMP 1\nHALT", [2 ** 62, -2 ** 62 - 1]),
+    ("LOAD 0\nSTORE R1\nINC R1\nHALT", [2 ** 63 - 1]),
+    ("LOAD 0\nSTORE R1\nMUL 1\nHALT", [-1, -2 ** 63]),
+])
+def test_overflow_detected(source, values):
+    code = assemble_program(source)
+    vcpu = vector.run_lanes(code, [values], 10, word_type="q")
+    assert vcpu.halt_reason == ["overflow"]
+    cpu = vcpu.lane_cpu(0)
+    cpu.run(10)
+    reference = make_cpu(code, values, word_type="q")
+    reference.run(10)
+    assert cpu_state(cpu) == cpu_state(reference)
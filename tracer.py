@@ -0,0 +1,432 @@
+"""Двоичная трасса выполнения
+
+Трассировщик записывает каждую выполненную команду: адрес команды,
+слово команды, ACC и флаги после выполнения и запись в регистр или
+ячейку памяти (номер и новое значение). Команды накапливаются по
+``chunk_records`` и сбрасываются в файл пачкой, так что память не
+растет с длиной трассы. Пачка хранится по столбцам::
+
+    заголовок  числа команд n, записей w, отметок флагов f и
+               усечений t (u32 * 4)
+    команды    pc u16 * n, ir u16 * n, acc i64 * n
+    записи     номер команды в пачке u32 * w, вид u8 * w,
+               номер регистра или ячейки u16 * w, значение i64 * w
+    флаги      номер команды в пачке u32 * f, флаги u8 * f
+    усечения   номера команд с ACC, усеченным до 64 бит, u32 * t
+
+Команда занимает 12 байт. На каждом шаге цикл выполнения только
+дописывает PC и ACC в два списка, слова команд добавляются одним map на
+отрезок, а в array столбцы переводятся при сбросе пачки. Флаги по
+каждой команде не пишутся: после LOAD, ADD, SUB и MUL они следуют из
+ACC, после остальных команд, кроме CMP, не меняются. Явно отмечаются
+только флаги после CMP (обертка ее записи в таблице диспетчеризации),
+после команд с ACC шире 64 бит (ACC в трассе усечен) и перед первой
+командой каждого ``run`` (процессор могли изменить извне); записи
+добавляет наблюдатель записи.
+
+Без трассировщика процессор работает без каких-либо проверок.
+
+Использование::
+
+    with Tracer(cpu, "run.trc") as tracer:
+        tracer.run(10**7)
+
+    python tracer.py dump run.trc
+    python tracer.py diff a.trc b.trc
+"""
+
+import argparse
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+from cpu import OP_ADD, OP_CMP, OP_LOAD, OP_MUL, OP_SUB, WRITE_REGISTER, WRITE_MEMORY
+
+MAGIC = b"EMUTRC02"
+CHUNK_HEADER = struct.Struct("<IIII")  # Числа команд, записей, отметок флагов и усечений
+DEFAULT_CHUNK_RECORDS = 65536
+
+# Биты флагов (отметки флагов и вид записи)
+FLAG_Z = 0x01
+FLAG_N = 0x02
+FLAG_WRITE_REGISTER = 0x04
+FLAG_WRITE_MEMORY = 0x08
+FLAG_TRUNCATED = 0x10  # ACC или значение усечены до 64 бит
+FLAG_BEFORE = 0x20     # Флаги до команды, а не после нее
+
+_WRITE_FLAGS = {WRITE_REGISTER: FLAG_WRITE_REGISTER, WRITE_MEMORY: FLAG_WRITE_MEMORY}
+_FLAGS_FROM_ACC = (OP_LOAD, OP_ADD, OP_SUB, OP_MUL)
+_LITTLE = sys.byteorder == "little"
+
+# Типы столбцов пачки: pc, ir, acc; записи: команда, вид, номер,
+# значение; отметки флагов: команда, флаги
+COLUMN_TYPES = "HHqIBHqIB"
+
+TraceRecord = namedtuple("TraceRecord", "pc ir acc z n kind index value truncated")
+
+
+class TraceFormatError(ValueError):
+    """Файл не является трассой"""
+
+
+def _wrap64(value):
+    value &= (1 << 64) - 1
+    return value - (1 << 64) if value >> 63 else value
+
+
+def _flags(cpu):
+    return cpu.Z | (cpu.N << 1)
+
+
+class Tracer:
+    """Запись трассы выполнения процессора в файл
+
+    file - путь или двоичный файл, открытый на запись.
+    """
+
+    def __init__(self, cpu, file, chunk_records=DEFAULT_CHUNK_RECORDS):
+        self.cpu = cpu
+        if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+            self.file = open(file, "wb")
+            self._owns_file = True
+        else:
+            self.file = file
+            self._owns_file = False
+        self.file.write(MAGIC)
+        self.chunk_records = chunk_records
+        # Столбцы пачки (pc, ir, acc; записи: команда, вид, номер,
+        # значение; отметки флагов: команда, флаги). Это списки: append
+        # в них дешевле, чем в array. Они очищаются на месте, так что
+        # ссылки на них в замыканиях не устаревают
+        self.columns = tuple([] for _ in COLUMN_TYPES)
+        self.records = 0  # Команд сброшено в файл
+        self._source = None  # Таблица процессора, по которой построена _decoded
+        self._decoded = None
+        self._hook = self._make_hook()
+        cpu.add_write_hook(self._hook)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.records + len(self.columns[0])
+
+    def _make_hook(self):
+        pcs = self.columns[0]
+        add_step, add_kind, add_index, add_value = (column.append
+                                                    for column in self.columns[3:7])
+
+        def on_write(kind, index, old, new):
+            # Запись относится к команде, которая еще не дописана в столбцы
+            add_step(len(pcs))
+            add_kind(_WRITE_FLAGS[kind])
+            add_index(index)
+            add_value(new)
+
+        return on_write
+
+    def _mark_flags(self, step, flags):
+        """Явная отметка флагов для команды step пачки"""
+        self.columns[7].append(step)
+        self.columns[8].append(flags)
+
+    def _traced_cmp(self, handler):
+        """Обертка CMP: флаги после нее не следуют из ACC"""
+        cpu = self.cpu
+        pcs = self.columns[0]
+        add_step, add_flags = self.columns[7].append, self.columns[8].append
+
+        def traced(cpu_, pc, get, put):
+            next_pc = handler(cpu_, pc, get, put)
+            # Ловушка точки останова команду не выполняет
+            if next_pc is not None or cpu.halt_reason != "break":
+                add_step(len(pcs))
+                add_flags(cpu.Z | (cpu.N << 1))
+            return next_pc
+
+        return traced
+
+    def dispatch_table(self):
+        """Таблица диспетчеризации процессора с обертками CMP"""
+        source = self.cpu.dispatch_table()
+        if source is not self._source:
+            decoded = list(source)
+            for addr, word in enumerate(self.cpu.code_memory):
+                if word >> 12 == OP_CMP:
+                    handler, get, put = decoded[addr]
+                    decoded[addr] = (self._traced_cmp(handler), get, put)
+            self._source = source
+            self._decoded = decoded
+        return self._decoded
+
+    def _pack(self):
+        """Столбцы пачки в array; значения шире 64 бит усекаются"""
+        pcs, irs, accs, steps, kinds, indexes, values, marks, flags = self.columns
+        truncated = array("I")
+        try:
+            acc_column = array("q", accs)
+        except OverflowError:
+            acc_column = array("q")
+            for step, acc in enumerate(accs):
+                if -(1 << 63) <= acc < 1 << 63:
+                    acc_column.append(acc)
+                    continue
+                acc_column.append(_wrap64(acc))
+                truncated.append(step)
+                if irs[step] >> 12 in _FLAGS_FROM_ACC:
+                    # Флаги по ACC до усечения
+                    self._mark_flags(step, FLAG_N if acc < 0 else 0)
+        try:
+            value_column = array("q", values)
+        except OverflowError:
+            value_column = array("q")
+            for i, value in enumerate(values):
+                if -(1 << 63) <= value < 1 << 63:
+                    value_column.append(value)
+                else:
+                    value_column.append(_wrap64(value))
+                    kinds[i] |= FLAG_TRUNCATED
+        packed = [acc_column if i == 2 else value_column if i == 6 else array(typecode, column)
+                  for i, (typecode, column) in enumerate(zip(COLUMN_TYPES, self.columns))]
+        packed.append(truncated)
+        return packed
+
+    def flush(self):
+        """Сброс накопленных команд в файл"""
+        count = len(self.columns[0])
+        if count:
+            packed = self._pack()
+            parts = [CHUNK_HEADER.pack(count, len(packed[3]), len(packed[7]), len(packed[9]))]
+            for column in packed:
+                if not _LITTLE:
+                    column.byteswap()
+                parts.append(column.tobytes())
+            self.file.write(b"".join(parts))
+            self.records += count
+            for column in self.columns:
+                del column[:]
+        self.file.flush()
+
+    def close(self):
+        """Сброс буфера, отключение от процессора и закрытие файла"""
+        if self.file is None:
+            return
+        self.flush()
+        self.cpu.remove_write_hook(self._hook)
+        if self._owns_file:
+            self.file.close()
+        self.file = None
+
+    def step(self):
+        """Выполнение одной команды с записью в трассу
+
+        Возвращает результат ``CPU.execute_instruction``.
+        """
+        cpu = self.cpu
+        pc = cpu.PC
+        running = cpu.execute_instruction()
+        # Ловушка точки останова команду не выполняет
+        if 0 <= pc < len(cpu.code_memory) and (running or cpu.halt_reason != "break"):
+            pcs = self.columns[0]
+            self._mark_flags(len(pcs), _flags(cpu))
+            pcs.append(pc)
+            self.columns[1].append(cpu.code_memory[pc])
+            self.columns[2].append(cpu.ACC)
+            if len(pcs) >= self.chunk_records:
+                self.flush()
+        return running
+
+    def run(self, max_steps):
+        """Выполнение с записью в трассу, как ``CPU.run``
+
+        Возвращает количество выполненных шагов.
+        """
+        cpu = self.cpu
+        cpu.halt_reason = None
+        code = cpu.code_memory
+        size = len(code)
+        pc = cpu.PC
+        if not 0 <= pc < size:
+            cpu.halt_reason = "end"
+            return 0
+
+        decoded = self.dispatch_table()
+        pcs, irs, accs = self.columns[:3]
+        add_pc, add_acc = pcs.append, accs.append
+        self._mark_flags(len(pcs), _flags(cpu) | FLAG_BEFORE)
+        steps = 0
+        last = pc
+        while steps < max_steps:
+            # Отрезок до заполнения пачки: внутри него только выполнение
+            # и дописывание PC и ACC, слова команд - одним map в конце
+            start = len(pcs)
+            end = steps + min(max_steps - steps, self.chunk_records - start)
+            try:
+                while steps < end:
+                    handler, get, put = decoded[pc]
+                    next_pc = handler(cpu, pc, get, put)
+                    if next_pc is None:
+                        if pc < size and cpu.halt_reason != "break":
+                            add_pc(pc)
+                            add_acc(cpu.ACC)
+                        cpu.IR = code[pc] if pc < size else code[last]
+                        return steps
+                    add_pc(pc)
+                    add_acc(cpu.ACC)
+                    last = pc
+                    pc = next_pc
+                    steps += 1
+            finally:
+                irs.extend(map(code.__getitem__, pcs[start:]))
+            if len(pcs) >= self.chunk_records:
+                self.flush()
+
+        if steps:
+            cpu.IR = code[last]
+        if pc <= size:
+            cpu.PC = pc
+        cpu.halt_reason = "max_steps"
+        return steps
+
+
+def _read_column(file, typecode, count):
+    column = array(typecode)
+    data = file.read(count * column.itemsize)
+    if len(data) != count * column.itemsize:
+        raise TraceFormatError("Трасса обрезана")
+    column.frombytes(data)
+    if not _LITTLE:
+        column.byteswap()
+    return column
+
+
+def read_trace(file):
+    """Чтение трассы: генератор TraceRecord
+
+    kind записи - WRITE_REGISTER, WRITE_MEMORY или None.
+    """
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        with open(file, "rb") as f:
+            yield from read_trace(f)
+        return
+
+    if file.read(len(MAGIC)) != MAGIC:
+        raise TraceFormatError("Файл не является трассой эмулятора")
+    flags = 0  # Флаги после предыдущей команды
+    while True:
+        header = file.read(CHUNK_HEADER.size)
+        if not header:
+            return
+        if len(header) != CHUNK_HEADER.size:
+            raise TraceFormatError("Трасса обрезана")
+        count, writes, marks, truncations = CHUNK_HEADER.unpack(header)
+        counts = (count,) * 3 + (writes,) * 4 + (marks,) * 2
+        pcs, irs, accs, *write_columns, mark_steps, mark_flags = (
+            _read_column(file, typecode, n) for typecode, n in zip(COLUMN_TYPES, counts))
+        truncated = set(_read_column(file, "I", truncations))
+        written = {step: write for step, *write in zip(*write_columns)}
+        before = {}
+        after = {}
+        for step, mark in zip(mark_steps, mark_flags):
+            (before if mark & FLAG_BEFORE else after)[step] = mark & (FLAG_Z | FLAG_N)
+        for step, (pc, ir, acc) in enumerate(zip(pcs, irs, accs)):
+            flags = before.get(step, flags)
+            if ir >> 12 in _FLAGS_FROM_ACC:
+                flags = (FLAG_Z if acc == 0 else 0) | (FLAG_N if acc < 0 else 0)
+            flags = after.get(step, flags)
+            kind, index, value = written.get(step, (0, 0, 0))
+            if kind & FLAG_WRITE_REGISTER:
+                write = WRITE_REGISTER
+            elif kind & FLAG_WRITE_MEMORY:
+                write = WRITE_MEMORY
+            else:
+                write = None
+            yield TraceRecord(pc, ir, acc, flags & FLAG_Z, flags >> 1, write, index, value,
+                              step in truncated or bool(kind & FLAG_TRUNCATED))
+
+
+def replay(file, cpu):
+    """Воспроизведение трассы на процессоре без выполнения команд
+
+    После каждой записи состояние процессора (ACC, флаги, IR, измененный
+    регистр или ячейка) соответствует моменту сразу после команды, PC -
+    адресу этой команды. Генератор возвращает записи по одной.
+    """
+    for record in read_trace(file):
+        cpu.PC = record.pc
+        cpu.IR = record.ir
+        cpu.ACC = record.acc
+        cpu.Z = record.z
+        cpu.N = record.n
+        if record.kind is not None:
+            cpu.write(record.kind, record.index, record.value)
+        yield record
+
+
+def diff_traces(file_a, file_b):
+    """Первое расхождение двух трасс
+
+    Возвращает (номер шага, запись a, запись b) или None, если трассы
+    совпадают. Если одна трасса короче, вместо ее записи - None.
+    """
+    trace_a = read_trace(file_a)
+    trace_b = read_trace(file_b)
+    step = 0
+    while True:
+        a = next(trace_a, None)
+        b = next(trace_b, None)
+        if a is None and b is None:
+            return None
+        if a != b:
+            return step, a, b
+        step += 1
+
+
+def format_record(record):
+    """Строка трассы для вывода"""
+    if record is None:
+        return "<конец трассы>"
+    text = (f"PC={record.pc:5d} IR=0x{record.ir:04X} ACC={record.acc} "
+            f"Z={record.z} N={record.n}")
+    if record.kind == WRITE_REGISTER:
+        text += f" R{record.index}={record.value}"
+    elif record.kind == WRITE_MEMORY:
+        text += f" [{record.index}]={record.value}"
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Просмотр и сравнение трасс эмулятора")
+    commands = parser.add_subparsers(dest="command", required=True)
+    dump = commands.add_parser("dump", help="вывод трассы")
+    dump.add_argument("trace")
+    dump.add_argument("--limit", type=int, default=None, help="не больше N записей")
+    diff = commands.add_parser("diff", help="первое расхождение двух трасс")
+    diff.add_argument("trace_a")
+    diff.add_argument("trace_b")
+    args = parser.parse_args(argv)
+
+    if args.command == "dump":
+        for step, record in enumerate(read_trace(args.trace)):
+            if args.limit is not None and step >= args.limit:
+                break
+            print(f"{step:8d}: {format_record(record)}")
+        return 0
+
+    result = diff_traces(args.trace_a, args.trace_b)
+    if result is None:
+        print("Трассы совпадают")
+        return 0
+    step, a, b = result
+    print(f"Расхождение на шаге {step}:")
+    print(f"  {args.trace_a}: {format_record(a)}")
+    print(f"  {args.trace_b}: {format_record(b)}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Трансляция машинного кода в функции Python (ahead-of-time)
+
+Программа разбивается на базовые блоки (по целям переходов и после
+команд перехода/останова), для каждого блока генерируется исходный код
+Python, и вся программа компилируется один раз через ``compile()``.
+ACC, флаги и регистры внутри сгенерированной функции - локальные
+переменные, поэтому накладные расходы на диспетчеризацию каждой
+команды исчезают.
+
+Результат (состояние процессора и число шагов) совпадает с ``CPU.run``.
+Операнды декодируются с учетом префиксов EXT (``cpu.decode_program``).
+
+Суперкоманды и циклы-редукции ``CPU.run`` транслированный код не
+использует, поэтому на программах вроде sum.asm и convolution.asm
+интерпретатор быстрее; трансляция выигрывает на долгих циклах без
+редукций. batch.py и service.py по умолчанию используют интерпретатор
+(``--engine translate`` включает трансляцию).
+"""
+
+from functools import lru_cache
+
+from cpu import (
+    OP_HALT, OP_LOAD, OP_STORE, OP_ADD, OP_SUB, OP_MUL, OP_CMP,
+    OP_JMP, OP_JZ, OP_JN, OP_INC, OP_DEC,
+    ADDR_IMMEDIATE, ADDR_DIRECT, ADDR_REGISTER, ADDR_INDIRECT,
+    CODE_SIZE, DATA_SIZE, NUM_REGISTERS,
+    decode_program, wrap_value,
+)
+
+JUMPS = (OP_JMP, OP_JZ, OP_JN)
+# Команды, выставляющие флаги Z и N
+FLAG_SETTERS = (OP_LOAD, OP_ADD, OP_SUB, OP_MUL, OP_CMP)
+
+
+def find_leaders(decoded):
+    """Адреса начал базовых блоков (decoded - результат decode_program)"""
+    leaders = {0}
+    for addr, (opcode, addr_type, operand) in enumerate(decoded):
+        if opcode in JUMPS:
+            if addr_type == ADDR_IMMEDIATE and 0 <= operand < len(decoded):
+                leaders.add(operand)
+            leaders.add(addr + 1)
+        elif opcode == OP_HALT:
+            leaders.add(addr + 1)
+    return sorted(a for a in leaders if a < len(decoded))
+
+
+class _Generator:
+    """Генератор исходного кода функции для одной программы"""
+
+    def __init__(self, code, data_size):
+        self.code = code
+        self.decoded = decode_program(code)
+        self.data_size = data_size
+        self.lines = []
+
+    def emit(self, indent, text):
+        self.lines.append("    " * indent + text)
+
+    # ----- операнды -----
+
+    def read(self, addr_type, operand):
+        """Выражение для чтения операнда"""
+        if addr_type == ADDR_IMMEDIATE:
+            return repr(operand)
+        if addr_type == ADDR_DIRECT:
+            return f"mem[{operand}]" if operand < self.data_size else "0"
+        if not 1 <= operand <= NUM_REGISTERS:
+            return "0"
+        if addr_type == ADDR_REGISTER:
+            return f"R{operand}"
+        return f"(mem[R{operand}] if 0 <= R{operand} < SIZE else 0)"
+
+    def write(self, indent, addr_type, operand, op, value):
+        """Оператор записи в операнд (op - '=', '+=' или '-=')"""
+        if addr_type == ADDR_DIRECT:
+            if operand < self.data_size:
+                self.store(indent, f"mem[{operand}]", op, value)
+        elif 1 <= operand <= NUM_REGISTERS:
+            if addr_type == ADDR_REGISTER:
+                self.emit(indent, f"R{operand} {op} {value}")
+            elif addr_type == ADDR_INDIRECT:
+                self.emit(indent, f"if 0 <= R{operand} < SIZE:")
+                self.store(indent + 1, f"mem[R{operand}]", op, value)
+
+    def store(self, indent, target, op, value):
+        """Запись в ячейку памяти с усечением до ее разрядности"""
+        new = value if op == "=" else f"{target} {op[0]} {value}"
+        self.emit(indent, f"try: {target} {op} {value}")
+        self.emit(indent, f"except OverflowError: {target} = wrap(mem, {new})")
+
+    # ----- блоки -----
+
+    def live_flags(self, start, end):
+        """Для каждой команды блока - флаги, которые нужно вычислять"""
+        live = {"Z", "N"}  # После блока флаги считаются живыми
+        needed = {}
+        for addr in range(end - 1, start - 1, -1):
+            opcode = self.decoded[addr][0]
+            if opcode in FLAG_SETTERS:
+                needed[addr] = set(live)
+                live = set()
+            elif opcode == OP_JZ:
+                live.add("Z")
+            elif opcode == OP_JN:
+                live.add("N")
+        return needed
+
+    def jump_to(self, indent, target_expr, target):
+        """Переход на адрес (target - None для вычисляемого адреса)"""
+        if target is None or 0 <= target < len(self.code):
+            self.emit(indent, f"pc = {target_expr}")
+        else:
+            self.emit(indent, f"pc = {target_expr}")
+            self.emit(indent, 'status = "end"')
+            self.emit(indent, "break")
+
+    def block(self, indent, start, end):
+        code = self.code
+        decoded = self.decoded
+        needed = self.live_flags(start, end)
+        ends_with_halt = decoded[end - 1][0] == OP_HALT
+        counted = end - start - (1 if ends_with_halt else 0)
+        need = counted + (1 if ends_with_halt else 0)
+
+        # Бюджет шагов: блок выполняется целиком или передается интерпретатору
+        self.emit(indent, f"if steps + {need} > max_steps:")
+        self.emit(indent + 1, 'status = "budget"')
+        self.emit(indent + 1, "break")
+
+        for addr in range(start, end):
+            word = code[addr]
+            opcode, addr_type, operand = decoded[addr]
+            value = self.read(addr_type, operand)
+
+            if opcode == OP_HALT:
+                self.emit(indent, f"steps += {counted}")
+                self.emit(indent, f"ir = {word}")
+                self.emit(indent, f"pc = {addr + 1}")
+                self.emit(indent, 'status = "halt"')
+                self.emit(indent, "break")
+                return
+            elif opcode == OP_LOAD:
+                self.emit(indent, f"ACC = {value}")
+            elif opcode == OP_STORE:
+                self.write(indent, addr_type, operand, "=", "ACC")
+            elif opcode == OP_ADD:
+                self.emit(indent, f"ACC += {value}")
+            elif opcode == OP_SUB:
+                self.emit(indent, f"ACC -= {value}")
+            elif opcode == OP_MUL:
+                self.emit(indent, f"ACC *= {value}")
+            elif opcode == OP_INC:
+                self.write(indent, addr_type, operand, "+=", "1")
+            elif opcode == OP_DEC:
+                self.write(indent, addr_type, operand, "-=", "1")
+
+            flags = needed.get(addr, ())
+            if opcode == OP_CMP:
+                if "Z" in flags:
+                    self.emit(indent, f"Z = 1 if ACC == {value} else 0")
+                if "N" in flags:
+                    self.emit(indent, f"N = 1 if ACC < {value} else 0")
+            elif flags:
+                if "Z" in flags:
+                    self.emit(indent, "Z = 1 if ACC == 0 else 0")
+                if "N" in flags:
+                    self.emit(indent, "N = 1 if ACC < 0 else 0")
+
+        self.emit(indent, f"steps += {counted}")
+        last = code[end - 1]
+        self.emit(indent, f"ir = {last}")
+        opcode, addr_type, operand = decoded[end - 1]
+        target = operand if addr_type == ADDR_IMMEDIATE else None
+        target_expr = self.read(addr_type, operand)
+
+        if opcode == OP_JMP:
+            self.jump_to(indent, target_expr, target)
+        elif opcode in (OP_JZ, OP_JN):
+            self.emit(indent, f"if {'Z' if opcode == OP_JZ else 'N'}:")
+            self.jump_to(indent + 1, target_expr, target)
+            self.emit(indent, "else:")
+            self.emit(indent + 1, f"pc = {end}")
+        else:
+            self.emit(indent, f"pc = {end}")
+
+    def dispatch(self, indent, blocks):
+        """Сбалансированное дерево сравнений по PC"""
+        if len(blocks) == 1:
+            start, end = blocks[0]
+            self.emit(indent, f"if pc == {start}:")
+            self.block(indent + 1, start, end)
+            self.emit(indent, "else:")
+            self.emit(indent + 1, f'status = "interp" if 0 <= pc < {len(self.code)} else "end"')
+            self.emit(indent + 1, "break")
+            return
+        mid = len(blocks) // 2
+        self.emit(indent, f"if pc < {blocks[mid][0]}:")
+        self.dispatch(indent + 1, blocks[:mid])
+        self.emit(indent, "else:")
+        self.dispatch(indent + 1, blocks[mid:])
+
+    def generate(self):
+        leaders = find_leaders(self.decoded)
+        bounds = leaders + [len(self.code)]
+        blocks = list(zip(bounds, bounds[1:]))
+        regs = [f"R{i}" for i in range(1, NUM_REGISTERS + 1)]
+
+        self.emit(0, "def run(cpu, max_steps):")
+        self.emit(1, "regs = cpu.registers")
+        self.emit(1, "mem = cpu.data_memory")
+        self.emit(1, "SIZE = len(mem)")
+        self.emit(1, "ACC = cpu.ACC; Z = cpu.Z; N = cpu.N")
+        self.emit(1, f"{', '.join(regs)} = regs[1:]")
+        self.emit(1, "pc = cpu.PC; ir = cpu.IR")
+        self.emit(1, "steps = 0")
+        self.emit(1, "status = None")
+        self.emit(1, "while True:")
+        self.dispatch(2, blocks)
+        self.emit(1, "cpu.ACC = ACC; cpu.Z = Z; cpu.N = N")
+        self.emit(1, f"regs[1:] = [{', '.join(regs)}]")
+        self.emit(1, "cpu.PC = pc; cpu.IR = ir")
+        self.emit(1, "return steps, status")
+        return "\n".join(self.lines) + "\n"
+
+
+class TranslatedProgram:
+    """Программа, транслированная в функцию Python
+
+    Процессор, передаваемый в ``run``, должен содержать тот же машинный
+    код в памяти команд: остаток бюджета шагов, не кратный блоку, и входы
+    в середину блока выполняются интерпретатором ``CPU``.
+    """
+
+    def __init__(self, machine_code, code_size=CODE_SIZE, data_size=DATA_SIZE):
+        code = list(machine_code[:code_size])
+        code += [0] * (code_size - len(code))
+        self.source = _Generator(code, data_size).generate()
+        namespace = {"wrap": wrap_value}
+        exec(compile(self.source, "<translated>", "exec"), namespace)
+        self._run = namespace["run"]
+
+    def run(self, cpu, max_steps):
+        """Выполнение до останова, но не более max_steps команд
+
+        Возвращает количество выполненных шагов, как ``CPU.run``.
+        """
+        cpu.halt_reason = None
+        steps = 0
+        while True:
+            done, status = self._run(cpu, max_steps - steps)
+            steps += done
+            if status == "end" and steps >= max_steps:
+                # Как и в CPU.run, исчерпание бюджета проверяется раньше
+                cpu.halt_reason = "max_steps"
+                return steps
+            if status in ("halt", "end"):
+                cpu.halt_reason = status
+                return steps
+            if status == "budget":
+                return steps + cpu.run(max_steps - steps)
+            # Вход в середину блока: одна команда интерпретатором
+            if steps >= max_steps:
+                cpu.halt_reason = "max_steps"
+                return steps
+            if not cpu.execute_instruction():
+                return steps
+            steps += 1
+
+
+@lru_cache(maxsize=64)
+def _translate_cached(machine_code, code_size, data_size):
+    return TranslatedProgram(machine_code, code_size, data_size)
+
+
+def translate(machine_code, code_size=CODE_SIZE, data_size=DATA_SIZE):
+    """Трансляция результата assemble_program (с кэшированием)"""
+    return _translate_cached(tuple(machine_code), code_size, data_size)
@@ -0,0 +1,273 @@
+"""Векторное исполнение одной программы над множеством наборов данных
+
+Каждая "дорожка" (lane) - отдельная копия процессора со своими данными.
+Память данных хранится в массиве NumPy размером (дорожки x DATA_SIZE),
+ACC, флаги, PC и регистры - векторы по дорожкам. Все активные дорожки
+делают по одному шагу за итерацию; дорожки с разным PC (после
+расходящихся JZ/JN) группируются по адресу команды, так что одна команда
+исполняется сразу над всеми дорожками группы.
+
+ACC и регистры хранятся в int64 (в отличие от целых Python в ``CPU``),
+ячейки памяти данных - в целом типе той же разрядности, что и ``word_type``
+у ``CPU``. Дорожка, на которой результат ADD, SUB, MUL, CMP или INC/DEC
+регистра не помещается в int64, останавливается перед этой командой с
+причиной "overflow"; ``lane_cpu`` переносит ее состояние в ``CPU``, где
+она продолжается на целых Python. Требуется NumPy.
+"""
+
+import numpy as np
+
+from cpu import (
+    OP_HALT, OP_LOAD, OP_STORE, OP_ADD, OP_SUB, OP_MUL, OP_CMP,
+    OP_JMP, OP_JZ, OP_JN, OP_INC, OP_DEC,
+    ADDR_IMMEDIATE, ADDR_DIRECT, ADDR_REGISTER,
+    CODE_SIZE, DATA_SIZE, NUM_REGISTERS, WORD_TYPE,
+    CPU, decode_program,
+)
+
+# Типы элементов памяти данных по коду типа array
+WORD_DTYPES = {"h": np.int16, "i": np.int32, "l": np.int64, "q": np.int64}
+
+# Коды причин останова дорожки
+RUNNING, HALTED, END, MAX_STEPS, OVERFLOW = 0, 1, 2, 3, 4
+HALT_REASONS = (None, "halt", "end", "max_steps", "overflow")
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def _overflowed(opcode, a, b, result):
+    """Дорожки, на которых result = a op b (int64) вышел за разрядность"""
+    b = np.asarray(b, dtype=np.int64)
+    if opcode == OP_ADD:
+        return ((a ^ result) & (b ^ result)) < 0
+    if opcode == OP_MUL:
+        # Без переполнения произведение делится на a нацело и дает b
+        nonzero = a != 0
+        divisor = np.where(nonzero, a, 1)
+        with np.errstate(over="ignore"):
+            wrong = (result % divisor != 0) | (result // divisor != b)
+        return nonzero & (wrong | ((a == -1) & (b == INT64_MIN)))
+    # SUB и CMP
+    return ((a ^ b) & (a ^ result)) < 0
+
+
+class VectorCPU:
+    """Процессор, исполняющий одну программу на многих дорожках
+
+    ``data`` - двумерный массив (или список списков разной длины)
+    начальных образов памяти данных, по одному на дорожку.
+    """
+
+    def __init__(self, machine_code, data, code_size=CODE_SIZE, data_size=DATA_SIZE,
+                 word_type=WORD_TYPE):
+        code = list(machine_code[:code_size])
+        self.code_memory = code + [0] * (code_size - len(code))
+        self.data_size = data_size
+
+        lanes = len(data)
+        self.word_type = word_type
+        dtype = WORD_DTYPES[word_type]
+        self.data_memory = np.zeros((lanes, data_size), dtype=dtype)
+        for lane, values in enumerate(data):
+            values = np.asarray(values, dtype=np.int64)[:data_size]
+            if len(values) and (values.min() < np.iinfo(dtype).min
+                                or values.max() > np.iinfo(dtype).max):
+                raise ValueError(f"Значение не помещается в ячейку типа '{word_type}'")
+            self.data_memory[lane, :len(values)] = values
+
+        self.lanes = lanes
+        self.ACC = np.zeros(lanes, dtype=np.int64)
+        self.PC = np.zeros(lanes, dtype=np.int64)
+        self.IR = np.zeros(lanes, dtype=np.int64)
+        self.Z = np.zeros(lanes, dtype=np.int8)
+        self.N = np.zeros(lanes, dtype=np.int8)
+        # registers[r] - вектор значений регистра Rr по дорожкам
+        self.registers = np.zeros((NUM_REGISTERS + 1, lanes), dtype=np.int64)
+        self.steps = np.zeros(lanes, dtype=np.int64)
+        self.status = np.full(lanes, RUNNING, dtype=np.int8)
+        self._rows = np.arange(lanes)
+
+        # Предекодирование: (код операции, тип адресации, операнд)
+        self._decoded = decode_program(self.code_memory)
+
+    @property
+    def halt_reason(self):
+        """Причины останова по дорожкам"""
+        return [HALT_REASONS[s] for s in self.status]
+
+    def lane_cpu(self, lane):
+        """Процессор ``CPU`` в текущем состоянии дорожки lane
+
+        Дорожку, остановленную с причиной "overflow", можно продолжить на
+        нем с оставшимся бюджетом шагов.
+        """
+        cpu = CPU(len(self.code_memory), self.data_size, self.word_type)
+        cpu.load_code(self.code_memory)
+        cpu.load_data(self.data_memory[lane].tolist())
+        cpu.registers[1:] = self.registers[1:, lane].tolist()
+        cpu.ACC = int(self.ACC[lane])
+        cpu.PC = int(self.PC[lane])
+        cpu.IR = int(self.IR[lane])
+        cpu.Z = int(self.Z[lane])
+        cpu.N = int(self.N[lane])
+        return cpu
+
+    # ----- операнды -----
+
+    def _read(self, rows, addr_type, operand):
+        if addr_type == ADDR_IMMEDIATE:
+            return operand
+        if addr_type == ADDR_DIRECT:
+            if operand < self.data_size:
+                return self.data_memory[rows, operand]
+            return 0
+        if not 1 <= operand <= NUM_REGISTERS:
+            return 0
+        if addr_type == ADDR_REGISTER:
+            return self.registers[operand, rows]
+        addr = self.registers[operand, rows]
+        ok = (addr >= 0) & (addr < self.data_size)
+        return np.where(ok, self.data_memory[rows, np.where(ok, addr, 0)], 0)
+
+    def _write(self, rows, addr_type, operand, value):
+        if addr_type == ADDR_IMMEDIATE:
+            return
+        if addr_type == ADDR_DIRECT:
+            if operand < self.data_size:
+                self.data_memory[rows, operand] = self._wrap(value)
+            return
+        if not 1 <= operand <= NUM_REGISTERS:
+            return
+        if addr_type == ADDR_REGISTER:
+            self.registers[operand, rows] = value
+            return
+        addr = self.registers[operand, rows]
+        ok = (addr >= 0) & (addr < self.data_size)
+        value = np.broadcast_to(self._wrap(value), addr.shape)
+        self.data_memory[rows[ok], addr[ok]] = value[ok]
+
+    def _wrap(self, value):
+        """Усечение значения до разрядности ячейки памяти, как в CPU"""
+        return np.asarray(value).astype(self.data_memory.dtype)
+
+    def _set_flags(self, rows, result):
+        self.Z[rows] = result == 0
+        self.N[rows] = result < 0
+
+    def _stop_overflowed(self, rows, overflowed, *values):
+        """Останов дорожек с переполнением перед командой
+
+        Возвращает оставшиеся дорожки и значения (массивы по rows) для них.
+        """
+        if not overflowed.any():
+            return (rows,) + values
+        self.status[rows[overflowed]] = OVERFLOW
+        keep = ~overflowed
+        return (rows[keep],) + tuple(value[keep] for value in values)
+
+    # ----- исполнение -----
+
+    def _execute(self, rows, pc):
+        """Выполнение команды по адресу pc на дорожках rows"""
+        word = self.code_memory[pc]
+        opcode, addr_type, operand = self._decoded[pc]
+        self.IR[rows] = word
+        next_pc = pc + 1
+
+        if opcode == OP_HALT:
+            self.PC[rows] = next_pc
+            self.status[rows] = HALTED
+            return
+
+        elif opcode == OP_LOAD:
+            self.ACC[rows] = self._read(rows, addr_type, operand)
+            self._set_flags(rows, self.ACC[rows])
+
+        elif opcode == OP_STORE:
+            self._write(rows, addr_type, operand, self.ACC[rows])
+
+        elif opcode in (OP_ADD, OP_SUB, OP_MUL, OP_CMP):
+            acc = self.ACC[rows]
+            value = self._read(rows, addr_type, operand)
+            if opcode == OP_ADD:
+                result = acc + value
+            elif opcode == OP_MUL:
+                result = acc * value
+            else:
+                result = acc - value
+            rows, result = self._stop_overflowed(
+                rows, _overflowed(opcode, acc, value, result), result)
+            if opcode != OP_CMP:
+                self.ACC[rows] = result
+            self._set_flags(rows, result)
+
+        elif opcode == OP_JMP:
+            self.PC[rows] = self._read(rows, addr_type, operand)
+            self.steps[rows] += 1
+            return
+
+        elif opcode in (OP_JZ, OP_JN):
+            flag = self.Z if opcode == OP_JZ else self.N
+            taken = flag[rows] != 0
+            self.PC[rows] = np.where(taken, self._read(rows, addr_type, operand), next_pc)
+            self.steps[rows] += 1
+            return
+
+        elif opcode in (OP_INC, OP_DEC):
+            delta = 1 if opcode == OP_INC else -1
+            value = self._read(rows, addr_type, operand)
+            if addr_type == ADDR_REGISTER and 1 <= operand <= NUM_REGISTERS:
+                # Ячейки памяти усекаются, как в CPU, а регистры - нет
+                limit = INT64_MAX if opcode == OP_INC else INT64_MIN
+                rows, value = self._stop_overflowed(rows, value == limit, value)
+            self._write(rows, addr_type, operand, value + delta)
+
+        self.PC[rows] = next_pc
+        self.steps[rows] += 1
+
+    def run(self, max_steps):
+        """Выполнение всех дорожек до останова, но не более max_steps шагов
+
+        Возвращает массив количества шагов по дорожкам (как ``CPU.run``).
+        """
+        size = len(self.code_memory)
+        for step in range(max_steps + 1):
+            active = np.flatnonzero(self.status == RUNNING)
+            if not len(active):
+                break
+            if step == max_steps:
+                self.status[active] = MAX_STEPS
+                break
+
+            pcs = self.PC[active]
+            out = (pcs < 0) | (pcs >= size)
+            if out.any():
+                self.status[active[out]] = END
+                active = active[~out]
+                pcs = pcs[~out]
+                if not len(active):
+                    break
+
+            first = pcs[0]
+            if (pcs == first).all():
+                # Все дорожки идут в ногу
+                rows = self._rows if len(active) == self.lanes else active
+                self._execute(rows, int(first))
+            else:
+                # Дорожки разошлись: группировка по адресу команды
+                for pc in np.unique(pcs):
+                    self._execute(active[pcs == pc], int(pc))
+        return self.steps
+
+
+def run_lanes(machine_code, data, max_steps, data_size=DATA_SIZE, code_size=CODE_SIZE,
+              word_type=WORD_TYPE):
+    """Запуск программы над набором образов памяти данных
+
+    Возвращает процессор с итоговым состоянием (ACC, registers,
+    data_memory, steps, halt_reason - по дорожкам).
+    """
+    vcpu = VectorCPU(machine_code, data, code_size, data_size, word_type)
+    vcpu.run(max_steps)
+    return vcpu